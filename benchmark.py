@@ -0,0 +1,293 @@
+"""Micro-benchmarks for the data path.
+
+Usage: python benchmark.py [stream] [parse] [backtest] [cache] [search] [scheduler] [archive]
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from polygon_stub import make_bars, make_trade_messages, start_ws_replay
+
+
+def bench_stream(events=500_000, per_message=100):
+    """Tick-to-bar aggregation throughput, in-process and over a local WebSocket"""
+    from streaming import PolygonStream, TickAggregator
+
+    messages = make_trade_messages(events, per_message=per_message)
+    expected_volume = sum(e["s"] for m in messages for e in json.loads(m))
+
+    # Aggregation alone: decode, buffer, flush every 50 messages
+    aggregator = TickAggregator(interval_seconds=60)
+    start = time.perf_counter()
+    for i, message in enumerate(messages):
+        aggregator.add_events(json.loads(message))
+        if i % 50 == 49:
+            aggregator.flush()
+    aggregator.flush()
+    elapsed = time.perf_counter() - start
+    volume = sum(aggregator.bars_frame(s)["volume"].sum() for s in aggregator.symbols())
+    assert volume == expected_volume, (volume, expected_volume)
+    print(f"aggregator: {len(messages) / elapsed:,.0f} msg/s, {events / elapsed:,.0f} ticks/s")
+
+    # End to end through the WebSocket client against the replay server
+    stop, url = start_ws_replay(messages)
+    stream = PolygonStream("bench-key", "stock", url=url, flush_interval=0.05)
+    stream.subscribe(["AAPL", "MSFT", "NVDA"])
+    start = time.perf_counter()
+    stream.start()
+    while stream.stats["messages"] < len(messages):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    stream.stop()
+    stop()
+    stream.aggregator.flush()
+    volume = sum(stream.bars_frame(s)["volume"].sum() for s in stream.aggregator.symbols())
+    assert volume == expected_volume, (volume, expected_volume)
+    print(f"websocket:  {len(messages) / elapsed:,.0f} msg/s, {events / elapsed:,.0f} ticks/s "
+          f"({per_message} ticks per message)")
+
+
+def legacy_aggregates_to_dataframe(aggregates_data):
+    """The dict-based parser aggregates_to_dataframe used to have"""
+    import pandas as pd
+
+    df = pd.DataFrame(aggregates_data["results"])
+    df["datetime"] = pd.to_datetime(df["t"], unit="ms")
+    df = df.rename(columns={"o": "open", "h": "high", "l": "low", "c": "close",
+                            "v": "volume", "vw": "vwap", "n": "transactions"})
+    df = df.set_index("datetime")
+    return df[["open", "high", "low", "close", "volume", "vwap", "transactions"]]
+
+
+def bench_parse(bars=50_000, repeat=5):
+    """Aggregate response parsing: time, peak memory and frame size per parser"""
+    from aggregate_bars import AggregateBars
+
+    raw = json.dumps({"status": "OK", "resultsCount": bars, "results": make_bars(bars)})
+    data = json.loads(raw)
+    parsers = {
+        "legacy": legacy_aggregates_to_dataframe,
+        "columnar": lambda d: AggregateBars.from_response(d).to_dataframe(),
+        "compact": lambda d: AggregateBars.from_response(d, compact=True).to_dataframe(),
+    }
+    print(f"{bars:,} bars; timings exclude JSON decoding, which all parsers share")
+    reference = None
+    for name, parse in parsers.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            df = parse(data)
+            best = min(best, time.perf_counter() - start)
+        tracemalloc.start()
+        df = parse(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if reference is None:
+            reference = df
+        assert df.index.equals(reference.index)
+        assert (df["close"].astype(float) - reference["close"]).abs().max() < 1e-3
+        frame = df.memory_usage(index=True).sum()
+        print(f"{name:9s} {best * 1000:7.1f} ms  peak {peak / 1e6:6.1f} MB  frame {frame / 1e6:5.1f} MB")
+
+
+def bench_backtest(bars=2520, processes=0):
+    """Grid-sweep throughput per strategy, reported per 1M bar-evaluations"""
+    import numpy as np
+    from backtest import sweep
+
+    rng = np.random.default_rng(11)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    grids = {
+        "sma_cross": {"fast": range(5, 201), "slow": range(5, 201)},
+        "macd": None,
+        "rsi": None,
+        "bollinger": None,
+    }
+    for strategy, grid in grids.items():
+        stats = sweep(close, strategy, grid=grid, processes=processes).stats
+        print(f"{strategy:10s} {stats['parameter_sets']:6,d} sets x {bars:,} bars  "
+              f"{stats['seconds']:6.2f} s  {stats['seconds_per_million'] * 1000:6.1f} ms per 1M bar-evaluations")
+
+
+def bench_cache(entries=100_000, reads=20_000, payload_bars=10):
+    """File vs SQLite cache backends: writes, hit reads, expiry sweep, invalidation"""
+    import random
+    import shutil
+    import tempfile
+    from polygon_client import CacheManager
+
+    payload = {"status": "OK", "results": make_bars(payload_bars)}
+    tickers = [f"T{i:03d}" for i in range(500)]
+    urls = [f"https://api.polygon.io/v2/aggs/ticker/{tickers[i % len(tickers)]}/range/1/minute/"
+            f"2024-01-01/2024-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}{i // 336:04d}"
+            for i in range(entries)]
+    params = {"adjusted": "true", "sort": "asc", "limit": 50000}
+    order = random.Random(3).sample(range(entries), reads)
+
+    for backend in ("file", "sqlite"):
+        cache_dir = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+        try:
+            cache = CacheManager(cache_dir=cache_dir, backend=backend)
+            start = time.perf_counter()
+            for i, url in enumerate(urls):
+                cache.set(url, params, payload)
+            write = time.perf_counter() - start
+
+            start = time.perf_counter()
+            hits = sum(cache.get(urls[i], params) is not None for i in order)
+            read = time.perf_counter() - start
+            assert hits == reads
+
+            start = time.perf_counter()
+            invalidated = cache.invalidate("T007")
+            invalidate = time.perf_counter() - start
+
+            # Nothing is expired yet, so this measures the cost of the scan itself
+            start = time.perf_counter()
+            cache.sweep()
+            sweep_time = time.perf_counter() - start
+
+            size = sum(os.path.getsize(os.path.join(root, f))
+                       for root, _, files in os.walk(cache_dir) for f in files)
+            print(f"{backend:6s} write {entries / write:8,.0f}/s  read {reads / read:8,.0f}/s  "
+                  f"invalidate {invalidated} in {invalidate * 1000:6.1f} ms  "
+                  f"sweep {sweep_time * 1000:6.1f} ms  disk {size / 1e6:5.0f} MB")
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def bench_search(tickers=30_000, queries=20_000):
+    """Ticker typeahead: index build time and per-query latency over a full market"""
+    import random
+    from reference_data import _AssetIndex
+
+    rng = random.Random(7)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    rows = [("".join(rng.choice(letters) for _ in range(rng.randint(1, 5))),
+             " ".join(rng.choice(words).title() for _ in range(3)) + " Inc.", "CS", "XNAS", "usd")
+            for _ in range(tickers)]
+
+    start = time.perf_counter()
+    index = _AssetIndex(rows)
+    build = time.perf_counter() - start
+
+    prefixes = [rng.choice(rows)[0][:rng.randint(1, 3)] for _ in range(queries // 2)]
+    prefixes += [rng.choice(words)[:rng.randint(2, 5)] for _ in range(queries // 2)]
+    latencies = []
+    for query in prefixes:
+        start = time.perf_counter()
+        index.search(query, 20)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"{len(index.rows):,} tickers, {len(index.words):,} name words: build {build * 1000:.0f} ms")
+    print(f"search p50 {latencies[len(latencies) // 2] * 1e6:.1f} us  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us  "
+          f"max {latencies[-1] * 1e6:.1f} us")
+
+
+def bench_scheduler(keys=4, interval=0.02, flood_threads=16, seconds=3.0, interactive_every=0.05):
+    """Interactive wait for a key while backfill floods the pool, with and without priorities"""
+    import threading
+    from key_scheduler import KeyScheduler
+    from request_scheduler import RequestScheduler
+
+    def run(acquire):
+        stop = time.time() + seconds
+        counts = {"backfill": 0}
+
+        def flood():
+            while time.time() < stop:
+                slot = acquire("backfill", stop)
+                if slot is not None:
+                    time.sleep(slot[1])
+                    counts["backfill"] += 1
+
+        threads = [threading.Thread(target=flood) for _ in range(flood_threads)]
+        for thread in threads:
+            thread.start()
+        waits = []
+        while time.time() < stop - 0.5:
+            start = time.perf_counter()
+            slot = acquire("interactive", None)
+            time.sleep(slot[1])
+            waits.append(time.perf_counter() - start)
+            time.sleep(interactive_every)
+        for thread in threads:
+            thread.join()
+        waits.sort()
+        return waits, counts["backfill"]
+
+    pool = KeyScheduler(keys, interval)
+    fifo = run(lambda priority, deadline: pool.acquire(deadline))
+    requests = RequestScheduler(KeyScheduler(keys, interval))
+    ranked = run(lambda priority, deadline: requests.acquire(deadline, priority))
+    capacity = keys * seconds / interval
+    for name, (waits, bulk) in (("first come", fifo), ("by priority", ranked)):
+        print(f"{name:>11}: interactive p50 {waits[len(waits) // 2] * 1000:6.1f} ms  "
+              f"p99 {waits[int(len(waits) * 0.99)] * 1000:6.1f} ms  "
+              f"backfill used {bulk / capacity:.0%} of the quota")
+
+
+def bench_archive(years=3, windows=(1, 30, 365, 1000), reads=200):
+    """Minute-bar archive: append throughput and days_back window latency"""
+    import shutil
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    from bar_archive import BarArchive
+
+    minutes = years * 365 * 1440
+    index = pd.date_range("2022-01-01", periods=minutes, freq="min", unit="ms", name="datetime")
+    close = 100 + np.cumsum(np.random.default_rng(3).normal(0, 0.05, minutes))
+    df = pd.DataFrame({"open": close, "high": close + 0.1, "low": close - 0.1, "close": close,
+                       "volume": 1000.0, "vwap": close, "transactions": 12}, index=index)
+    last = index[-1].strftime("%Y-%m-%d")
+    archive_dir = tempfile.mkdtemp(prefix="bench-archive-")
+    try:
+        archive = BarArchive(archive_dir)
+
+        start = time.perf_counter()
+        for year in range(years):
+            first, end = f"{2022 + year}-01-01", f"{2022 + year}-12-31"
+            archive.store("X:BTCUSD", "minute", df.loc[first:end], first, min(end, last))
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(archive._path("X:BTCUSD", "minute"))
+        print(f"{minutes:,} bars appended in {elapsed * 1000:.0f} ms ({size / 1e6:.0f} MB)")
+
+        for days in windows:
+            first = (index[-1] - pd.Timedelta(days=days - 1)).strftime("%Y-%m-%d")
+            timings = []
+            for _ in range(reads):
+                start = time.perf_counter()
+                bars, _ = archive.read("X:BTCUSD", "minute", first, last)
+                frame = bars.to_dataframe()
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(f"{days:>5} days ({len(frame):>9,} bars): p50 {timings[len(timings) // 2] * 1e6:6.0f} us  "
+                  f"p99 {timings[int(len(timings) * 0.99)] * 1e6:6.0f} us")
+    finally:
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "stream": bench_stream,
+    "parse": bench_parse,
+    "backtest": bench_backtest,
+    "cache": bench_cache,
+    "search": bench_search,
+    "scheduler": bench_scheduler,
+    "archive": bench_archive,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
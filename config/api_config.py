@@ -10,7 +10,7 @@ POLYGON_CONFIG = {
     "cache_ttl_minutes": 5,      # Cache data for 5 minutes
     "live_refresh_seconds": 10,   # Live mode refresh interval
     "max_retries": 3,            # Max retries for failed requests
-    "retry_delay_base": 5,       # Base delay for exponential backoff
+    "retry_delay_base": 1,       # Base delay for jittered exponential key backoff
 }
 
 # Timeframe configurations
@@ -0,0 +1,36 @@
+"""Fixtures shared by the test modules: DataFetchers wired to the local Polygon stub."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from data_fetcher import DataFetcher
+from polygon_client import CacheManager
+from polygon_stub import start_stub
+
+
+@pytest.fixture
+def make_stub_fetcher(tmp_path):
+    """make(bars=50, **DataFetcher kwargs) -> (fetcher, server): a fetcher on a fresh
+    stub, unthrottled, with its response cache under tmp_path"""
+    servers = []
+
+    def make(bars=50, **kwargs):
+        server, url = start_stub(bars=bars)
+        servers.append(server)
+        fetcher = DataFetcher(["key"], cache=CacheManager(cache_dir=str(tmp_path / "cache"), snapshot=False),
+                              **kwargs)
+        fetcher.client.base_url = url
+        fetcher.client.scheduler.min_interval = 0
+        return fetcher, server
+
+    yield make
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def stub_fetcher(make_stub_fetcher):
+    return make_stub_fetcher()
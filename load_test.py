@@ -0,0 +1,376 @@
+"""Load test for the dashboard, driven through Dash's own callback endpoint.
+
+Starts the Polygon stub and N app workers (separate server processes
+sharing one working directory, like gunicorn workers on one host), then
+simulates browser sessions against /_dash-update-component:
+
+    fetch users  pick a selection, click Fetch and poll the background job
+                 the way the renderer does, then think for a while
+    live users   switch to Live and post the interval tick every --tick seconds
+
+Reports throughput and p50/p95/p99 latency per callback, CPU and RSS per
+worker (including child processes such as the screener pool) and Polygon
+calls per user. With --keep, the workers' logs stay in the printed
+directory; send SIGUSR1 to a hung worker to dump its threads there, the
+background job threads among them.
+
+Usage:
+    python load_test.py [--users 20] [--live-fraction 0.5] [--duration 60] [--workers 2]
+                        [--tick 10] [--think 5] [--latency 0.05] [--keys 4] [--rate-limit 600]
+                        [--json OUT]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import psutil
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from polygon_stub import start_stub
+
+FETCH_SELECTIONS = {
+    "stock": ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "TSLA"],
+    "crypto": ["BTCUSD", "ETHUSD", "SOLUSD"],
+    "forex": ["EURUSD", "GBPUSD"],
+}
+TIMEFRAMES = ["minute", "5minute", "15minute", "hour", "day", "week"]
+DAYS = [7, 30, 90, 365]
+CHART_TYPES = ["candlestick", "technical", "volume_profile"]
+LIVE_TICKERS = ["BTCUSD", "ETHUSD"]  # Crypto trades around the clock
+
+
+class DashSession:
+    """One browser session: the page's end_id, the callback map and a connection"""
+
+    def __init__(self, base_url, timeout=60.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.http = requests.Session()
+        page = self.http.get(base_url + "/", timeout=timeout)
+        page.raise_for_status()
+        config = re.search(r'<script id="_dash-config" type="application/json">(.*?)</script>', page.text, re.S)
+        self.end_id = json.loads(config.group(1)).get("end_id")
+        self.dependencies = self.http.get(base_url + "/_dash-dependencies", timeout=timeout).json()
+
+    def find(self, input_id, output=None):
+        """The callback triggered by input_id whose output mentions `output`
+        (None: the one without outputs)"""
+        for dependency in self.dependencies:
+            if dependency["inputs"][0]["id"] != input_id:
+                continue
+            if output is None and dependency.get("no_output") or output and output in dependency["output"]:
+                return dependency
+        raise LookupError(f"No callback on {input_id} with output {output}")
+
+    @staticmethod
+    def _outputs(dependency):
+        if dependency.get("no_output"):
+            return []
+        output = dependency["output"]
+        if output.startswith(".."):
+            return [dict(zip(("id", "property"), spec.rsplit(".", 1))) for spec in output[2:-2].split("...")]
+        return dict(zip(("id", "property"), output.rsplit(".", 1)))
+
+    def post(self, dependency, values, changed, query=None):
+        """Call a callback with component values (by id); returns the decoded
+        response, or None for 204 No Content"""
+        body = {
+            "output": dependency["output"],
+            "outputs": self._outputs(dependency),
+            "inputs": [dict(spec, value=values.get(spec["id"])) for spec in dependency["inputs"]],
+            "state": [dict(spec, value=values.get(spec["id"])) for spec in dependency["state"]],
+            "changedPropIds": [changed],
+        }
+        params = dict(query or {}, endId=self.end_id) if self.end_id else query
+        response = self.http.post(self.base_url + "/_dash-update-component", json=body,
+                                  params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json() if response.status_code != 204 else None
+
+    def post_background(self, dependency, values, changed):
+        """Call a background callback and poll its job, as the renderer does,
+        until the outputs arrive"""
+        result = self.post(dependency, values, changed)
+        interval = dependency["background"].get("interval", 1000) / 1000
+        deadline = time.time() + self.timeout
+        handle = None
+        while result is None or "response" not in result:
+            if time.time() > deadline:
+                raise TimeoutError(f"Background callback did not finish in {self.timeout:.0f}s")
+            if result is not None and "cacheKey" in result:
+                handle = {"cacheKey": result["cacheKey"], "job": result["job"]}
+            time.sleep(interval)
+            result = self.post(dependency, values, changed, handle)
+        return result
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.first_error = {}
+
+    def timed(self, name, call, *args):
+        start = time.perf_counter()
+        try:
+            result = call(*args)
+        except Exception as e:
+            with self.lock:
+                self.errors[name] += 1
+                self.first_error.setdefault(name, f"{type(e).__name__}: {e}")
+            return None
+        with self.lock:
+            self.latencies[name].append(time.perf_counter() - start)
+        return result
+
+
+def fetch_user(base_url, args, metrics, stop_at, rng):
+    session = metrics.timed("page load", DashSession, base_url)
+    if session is None:
+        return
+    dashboard = session.find("fetch-button", "data-store.data")
+    record_use = session.find("fetch-button")
+    select = session.find("asset-type")
+    clicks = 0
+    time.sleep(rng.uniform(0, args.think))
+    while time.time() < stop_at:
+        asset_type = rng.choice(list(FETCH_SELECTIONS))
+        values = {"asset-type": asset_type, "ticker-input": rng.choice(FETCH_SELECTIONS[asset_type]),
+                  "days-input": rng.choice(DAYS), "timeframe-select": rng.choice(TIMEFRAMES),
+                  "chart-type": rng.choice(CHART_TYPES)}
+        metrics.timed("prefetch_selection", session.post, select, values, "ticker-input.value")
+        clicks += 1
+        values["fetch-button"] = clicks
+        metrics.timed("record_prefetch_use", session.post, record_use, values, "fetch-button.n_clicks")
+        if "background" in dashboard and dashboard["background"]:
+            metrics.timed("update_dashboard", session.post_background, dashboard, values, "fetch-button.n_clicks")
+        else:
+            metrics.timed("update_dashboard", session.post, dashboard, values, "fetch-button.n_clicks")
+        time.sleep(rng.expovariate(1 / args.think) if args.think else 0)
+
+
+def live_user(base_url, args, metrics, stop_at, rng):
+    session = metrics.timed("page load", DashSession, base_url)
+    if session is None:
+        return
+    tick = session.find("interval-component", "live-data-store.data")
+    values = {"asset-type": "crypto", "ticker-input": rng.choice(LIVE_TICKERS),
+              "timeframe-select": "live", "chart-type": rng.choice(["candlestick", "line"]),
+              "live-data-store": None}
+    n_intervals = 0
+    next_tick = time.time() + rng.uniform(0, args.tick)  # Sessions don't open in lockstep
+    while True:
+        time.sleep(max(0.0, next_tick - time.time()))
+        if time.time() >= stop_at:
+            return
+        n_intervals += 1
+        values["interval-component"] = n_intervals
+        result = metrics.timed("update_live_data", session.post, tick, values, "interval-component.n_intervals")
+        state = ((result or {}).get("response") or {}).get("live-data-store")
+        if state:
+            values["live-data-store"] = state["data"]
+        next_tick += args.tick
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_workers(count, workdir, stub_url, args):
+    env = dict(os.environ, POLYGON_API_KEYS=",".join(f"load-key-{i}" for i in range(args.keys)),
+               POLYGON_BASE_URL=stub_url, POLYGON_RATE_LIMIT=str(args.rate_limit))
+    for name in ("CACHE_SNAPSHOT", "BAR_ARCHIVE_DIR", "POLYGON_STREAMING", "VERCEL"):
+        env.pop(name, None)
+    workers = []
+    for i in range(count):
+        port = free_port()
+        log = open(os.path.join(workdir, f"worker-{i}.log"), "w")
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+                                   cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        workers.append((process, f"http://127.0.0.1:{port}", log))
+    deadline = time.time() + 120
+    for process, url, _ in workers:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Worker {url} exited; see {workdir}/worker-*.log")
+            try:
+                if requests.get(url + "/_dash-dependencies", timeout=5).ok:
+                    break
+            except requests.RequestException:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"Worker {url} did not start")
+            time.sleep(0.5)
+    return workers
+
+
+def serve(port):
+    import faulthandler
+    import logging
+    import signal
+    # kill -USR1 a worker to dump its threads, background jobs included, to worker-N.log
+    faulthandler.register(signal.SIGUSR1, all_threads=True)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    from app import app
+    app.server.run(host="127.0.0.1", port=port, threaded=True)
+
+
+class ResourceSampler:
+    """CPU seconds and RSS per worker, counting its child processes (the
+    screener pool); sampled twice a second, so short-lived children are partly missed"""
+
+    def __init__(self, processes, interval=0.5):
+        self.processes = [psutil.Process(p.pid) for p in processes]
+        self.interval = interval
+        self.start_cpu = [self._cpu(p) for p in self.processes]
+        self.child_cpu = [dict() for _ in self.processes]
+        self.rss = [[] for _ in self.processes]
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _cpu(process):
+        times = process.cpu_times()
+        return times.user + times.system
+
+    def _run(self):
+        while self.running:
+            for i, process in enumerate(self.processes):
+                try:
+                    rss = process.memory_info().rss
+                    for child in process.children(recursive=True):
+                        try:
+                            rss += child.memory_info().rss
+                            self.child_cpu[i][child.pid] = self._cpu(child)
+                        except psutil.Error:
+                            pass
+                    self.rss[i].append(rss)
+                except psutil.Error:
+                    pass
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        return [{"cpu_seconds": self._cpu(process) - start + sum(children.values()),
+                 "rss_mb": np.mean(rss) / 1e6 if rss else 0.0,
+                 "peak_rss_mb": max(rss) / 1e6 if rss else 0.0}
+                for process, start, children, rss in zip(self.processes, self.start_cpu, self.child_cpu, self.rss)]
+
+
+def run(args):
+    server, stub_url = start_stub(latency=args.latency, bars=args.bars)
+    workdir = tempfile.mkdtemp(prefix="alcioneo-load-")
+    workers = []
+    try:
+        print(f"Starting {args.workers} workers in {workdir}...")
+        workers = start_workers(args.workers, workdir, stub_url, args)
+        baseline = server.state.total_requests()  # Reference lists loaded at startup
+
+        metrics = Metrics()
+        rng = random.Random(args.seed)
+        live_users = round(args.users * args.live_fraction)
+        sampler = ResourceSampler([process for process, _, _ in workers])
+        start = time.time()
+        stop_at = start + args.duration
+        threads = []
+        for i in range(args.users):
+            user = live_user if i < live_users else fetch_user
+            url = workers[i % len(workers)][1]  # Sticky sessions, round-robin
+            threads.append(threading.Thread(target=user, args=(url, args, metrics, stop_at,
+                                                               random.Random(rng.random())), daemon=True))
+        print(f"Running {args.users} users ({args.users - live_users} fetch, {live_users} live) "
+              f"for {args.duration:.0f}s...")
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+        resources = sampler.stop()
+        calls = server.state.total_requests() - baseline
+    finally:
+        server.handle_error = lambda request, address: None  # Workers drop requests in flight
+        for process, _, log in workers:
+            for child in psutil.Process(process.pid).children(recursive=True):
+                child.kill()
+            process.terminate()
+            process.wait()
+            log.close()
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"users": args.users, "live_users": live_users, "workers": args.workers,
+              "elapsed": elapsed, "callbacks": {}, "resources": resources,
+              "api_calls": calls, "api_calls_per_user": calls / args.users if args.users else 0.0}
+    print(f"\n{'callback':<22}{'ok':>7}{'errors':>8}{'per s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    total = 0
+    for name in sorted(set(metrics.latencies) | set(metrics.errors)):
+        latencies = np.array(metrics.latencies[name]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+        total += len(latencies)
+        report["callbacks"][name] = {"ok": len(latencies), "errors": metrics.errors[name],
+                                     "per_second": len(latencies) / elapsed, "p50_ms": p50, "p95_ms": p95,
+                                     "p99_ms": p99, "first_error": metrics.first_error.get(name)}
+        print(f"{name:<22}{len(latencies):>7}{metrics.errors[name]:>8}{len(latencies) / elapsed:>8.1f}"
+              f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+    report["per_second"] = total / elapsed
+    print(f"{'total':<22}{total:>7}{sum(metrics.errors.values()):>8}{total / elapsed:>8.1f}")
+    for name, error in metrics.first_error.items():
+        print(f"  first {name} error: {error}")
+
+    print(f"\n{'worker':<10}{'cpu %':>8}{'cpu s':>8}{'rss MB':>9}{'peak MB':>9}")
+    for i, usage in enumerate(resources):
+        print(f"{i:<10}{100 * usage['cpu_seconds'] / elapsed:>8.1f}{usage['cpu_seconds']:>8.1f}"
+              f"{usage['rss_mb']:>9.0f}{usage['peak_rss_mb']:>9.0f}")
+    print(f"\nPolygon API calls: {calls} ({report['api_calls_per_user']:.1f} per user)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=float)
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="load_test.py", description="Dashboard load test against the Polygon stub")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--live-fraction", type=float, default=0.5, help="Share of users watching Live")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of load after the workers start")
+    parser.add_argument("--workers", type=int, default=2, help="App server processes")
+    parser.add_argument("--tick", type=float, default=10.0, help="Live refresh interval (the app's dcc.Interval)")
+    parser.add_argument("--think", type=float, default=5.0, help="Mean seconds between a fetch user's clicks")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub response latency, seconds")
+    parser.add_argument("--bars", type=int, default=5000, help="Bars per stub aggregates page")
+    parser.add_argument("--keys", type=int, default=4, help="API keys given to the workers")
+    parser.add_argument("--rate-limit", type=int, default=600, help="Requests per minute per key")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the workers' directory (logs, cache)")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)  # Worker process entry point
+    args = parser.parse_args(argv)
+    if args.serve:
+        serve(args.serve)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,253 @@
+"""Local stand-in for the Polygon REST and WebSocket APIs used by tests.
+
+Serves synthetic aggregate bars for any /v2/aggs path (starting at the
+requested from date, one per multiplier * timespan), paginated
+/v3/reference/tickers listings, and counts every request per API key, so
+callers can check the client's own bookkeeping against what actually
+reached the server; state.statuses makes chosen tickers or API keys fail instead.
+start_ws_replay plays recorded (or generated) WebSocket messages to any
+client that authenticates.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubState:
+    def __init__(self, latency=0.0, bars=100, reference_tickers=2500):
+        self.latency = latency
+        self.bars = bars
+        self.reference_tickers = reference_tickers
+        self.lock = threading.Lock()
+        self.requests_per_key = defaultdict(int)
+        self.in_flight_per_key = defaultdict(int)
+        self.max_in_flight_per_key = defaultdict(int)
+        self.connections = 0
+        self.statuses = {}  # ticker or API key -> HTTP status its requests fail with
+
+    def enter(self, key):
+        with self.lock:
+            self.requests_per_key[key] += 1
+            self.in_flight_per_key[key] += 1
+            self.max_in_flight_per_key[key] = max(
+                self.max_in_flight_per_key[key], self.in_flight_per_key[key]
+            )
+
+    def leave(self, key):
+        with self.lock:
+            self.in_flight_per_key[key] -= 1
+
+    def total_requests(self):
+        with self.lock:
+            return sum(self.requests_per_key.values())
+
+
+def make_bars(count, start_ms=1_700_000_000_000, step_ms=60_000, price=100.0):
+    bars = []
+    for i in range(count):
+        close = price + (i % 20) * 0.5
+        bars.append({
+            "o": close - 0.25, "h": close + 1.0, "l": close - 1.0, "c": close,
+            "v": 1000 + i, "vw": close, "n": 10 + i % 5, "t": start_ms + i * step_ms
+        })
+    return bars
+
+
+SPAN_MS = {"second": 1_000, "minute": 60_000, "hour": 3_600_000, "day": 86_400_000,
+           "week": 7 * 86_400_000, "month": 30 * 86_400_000}
+
+
+def parse_aggs_path(path, max_bars):
+    """/v2/aggs/ticker/T/range/M/SPAN/FROM/TO -> (ticker, start ms, step ms, bar count).
+
+    Bars start at FROM and never run past the end of TO, capped at max_bars.
+    Unparseable dates (used to force cache misses) get max_bars minute bars.
+    """
+    parts = path.split("/")
+    ticker, multiplier, span = parts[4], int(parts[6]), parts[7]
+    try:
+        start = datetime.fromisoformat(parts[8]).replace(tzinfo=timezone.utc)
+        end = datetime.fromisoformat(parts[9]).replace(tzinfo=timezone.utc) + timedelta(days=1)
+    except ValueError:
+        return ticker, 1_700_000_000_000, 60_000, max_bars
+    step_ms = multiplier * SPAN_MS.get(span, 86_400_000)
+    start_ms = int(start.timestamp() * 1000)
+    span_count = max(0, (int(end.timestamp() * 1000) - start_ms) // step_ms)
+    return ticker, start_ms, step_ms, min(max_bars, span_count)
+
+
+def make_snapshot(ticker, price=100.0):
+    now_ms = int(time.time() * 1000)
+    minute_ms = now_ms // 60_000 * 60_000
+    drift = (now_ms % 60_000) / 60_000
+    return {
+        "ticker": ticker,
+        "min": {"o": price, "h": price + 1.0, "l": price - 1.0, "c": price + drift,
+                "v": 500, "vw": price, "n": 5, "t": minute_ms},
+        "lastTrade": {"p": price + drift, "s": 10, "t": now_ms * 1_000_000},
+        "updated": now_ms * 1_000_000
+    }
+
+
+REFERENCE_PREFIXES = {"fx": "C:", "crypto": "X:"}
+
+
+def make_reference_page(market, count, cursor, limit, base_url):
+    """One page of synthetic /v3/reference/tickers results, sorted by ticker"""
+    start = int(cursor or 0)
+    prefix = REFERENCE_PREFIXES.get(market, "")
+    results = []
+    for i in range(start, min(start + limit, count)):
+        symbol = "".join(chr(65 + (i // 26 ** p) % 26) for p in (3, 2, 1, 0))
+        results.append({"ticker": f"{prefix}{symbol}", "name": f"{symbol.title()} Holdings {i}",
+                        "market": market, "type": "CS", "active": True,
+                        "primary_exchange": "XNAS", "currency_name": "usd"})
+    body = {"status": "OK", "count": len(results), "results": results}
+    if start + limit < count:
+        body["next_url"] = f"{base_url}/v3/reference/tickers?cursor={start + limit}&market={market}&limit={limit}"
+    return body
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def do_GET(self):
+        state = self.server.state
+        key = self.headers.get("Authorization", "").replace("Bearer ", "")
+        state.enter(key)
+        status = 200
+        try:
+            if state.latency:
+                time.sleep(state.latency)
+            url = urlparse(self.path)
+            path = url.path
+            if path == "/v3/reference/tickers":
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = make_reference_page(query.get("market", "stocks"), state.reference_tickers,
+                                           query.get("cursor"), int(query.get("limit", 100)),
+                                           f"http://{self.headers.get('Host')}")
+            elif path.startswith("/v2/snapshot/"):
+                body = {"status": "OK", "ticker": make_snapshot(path.rsplit("/", 1)[-1])}
+            elif path.startswith("/v2/aggs/"):
+                ticker, start_ms, step_ms, count = parse_aggs_path(path, state.bars)
+                results = make_bars(count, start_ms=start_ms, step_ms=step_ms)
+                body = {"ticker": ticker, "status": "OK",
+                        "resultsCount": count, "results": results}
+                if ticker in state.statuses:
+                    status = state.statuses[ticker]
+                    body = {"status": "ERROR", "error": f"Stubbed {status}"}
+            else:
+                body = {"status": "OK", "results": {}}
+            if key in state.statuses:
+                status = state.statuses[key]
+                body = {"status": "ERROR", "error": f"Stubbed {status}"}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            state.leave(key)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency=0.0, bars=100):
+    """Start the stub on a background thread and return (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(latency=latency, bars=bars)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_trade_messages(count, symbols=("AAPL", "MSFT", "NVDA"), per_message=100,
+                        start_ms=1_700_000_000_000, channel="T", seed=7):
+    """Generate `count` trade events, packed per_message to a frame, as JSON strings"""
+    rng = random.Random(seed)
+    key = "pair" if channel == "XT" else "sym"
+    prices = {symbol: 100.0 for symbol in symbols}
+    messages, frame = [], []
+    for i in range(count):
+        symbol = symbols[i % len(symbols)]
+        prices[symbol] += rng.uniform(-0.05, 0.05)
+        frame.append({"ev": channel, key: symbol, "p": round(prices[symbol], 4),
+                      "s": rng.randint(1, 500), "t": start_ms + i * 10})
+        if len(frame) == per_message:
+            messages.append(json.dumps(frame))
+            frame = []
+    if frame:
+        messages.append(json.dumps(frame))
+    return messages
+
+
+def load_recorded_messages(path):
+    """One raw WebSocket frame per line, as captured from the real feed"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def start_ws_replay(messages, port=0):
+    """Serve a Polygon-like WebSocket that replays `messages` after subscribe.
+
+    Returns (stop, url); call stop() to shut the server down.
+    """
+    import websockets
+
+    ready = threading.Event()
+    holder = {}
+
+    async def handler(ws):
+        await ws.send(json.dumps([{"ev": "status", "status": "connected",
+                                   "message": "Connected Successfully"}]))
+        await ws.recv()  # auth
+        await ws.send(json.dumps([{"ev": "status", "status": "auth_success",
+                                   "message": "authenticated"}]))
+        subscription = json.loads(await ws.recv())
+        await ws.send(json.dumps([{"ev": "status", "status": "success",
+                                   "message": f"subscribed to: {subscription.get('params')}"}]))
+        for message in messages:
+            await ws.send(message)
+        await ws.wait_closed()
+
+    async def main():
+        holder["stop"] = asyncio.get_running_loop().create_future()
+        async with websockets.serve(handler, "127.0.0.1", port, max_size=None) as server:
+            holder["port"] = server.sockets[0].getsockname()[1]
+            ready.set()
+            await holder["stop"]
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(main(),), daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(holder["stop"].set_result, None)
+        thread.join(5)
+
+    return stop, f"ws://127.0.0.1:{holder['port']}"
+
+
+if __name__ == "__main__":
+    server, url = start_stub(port=8765)
+    print(f"Polygon stub listening on {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
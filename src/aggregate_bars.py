@@ -0,0 +1,104 @@
+import json
+from operator import itemgetter
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Polygon aggregate field -> DataFrame column, in output order
+BAR_FIELDS = {
+    "o": "open",
+    "h": "high",
+    "l": "low",
+    "c": "close",
+    "v": "volume",
+    "vw": "vwap",
+    "n": "transactions",
+}
+
+COLUMN_DTYPES = {
+    "default": {"open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64,
+                "volume": np.float64, "vwap": np.float64, "transactions": np.int64},
+    # Half the bytes per bar; volume stays float64 when it has fractional
+    # units (crypto), since truncating it would change the data
+    "compact": {"open": np.float32, "high": np.float32, "low": np.float32, "close": np.float32,
+                "volume": np.int64, "vwap": np.float32, "transactions": np.int32},
+}
+
+
+def _column(results: List[Dict], key: str, dtype) -> np.ndarray:
+    """One C-level pass over the bar dicts straight into a typed array.
+
+    Bars that omit a field (forex bars often have no vwap or transactions)
+    get NaN for it, as the old DataFrame parser gave them, which makes an
+    integer column float64.
+    """
+    try:
+        return np.fromiter(map(itemgetter(key), results), dtype, len(results))
+    except KeyError:
+        if np.issubdtype(dtype, np.integer):
+            dtype = np.float64
+        return np.fromiter((bar.get(key, np.nan) for bar in results), dtype, len(results))
+
+
+class AggregateBars:
+    """Aggregate bars as typed NumPy columns with an int64 epoch-ms index.
+
+    By default the arrays are read-only, so one instance can be handed to
+    any number of consumers, and to_dataframe() wraps them without copying.
+    pandas writes in place to arrays a frame was built on, copy-on-write or
+    not, so writes to such a frame raise instead of reaching the shared
+    arrays. readonly=False is for single-use instances whose frame may be
+    written to (the arrays then belong to that frame).
+    """
+
+    def __init__(self, t: np.ndarray, columns: Dict[str, np.ndarray], readonly: bool = True):
+        self.t = t
+        self.columns = columns
+        if readonly:
+            self.t.flags.writeable = False
+            for values in self.columns.values():
+                values.flags.writeable = False
+
+    @classmethod
+    def from_results(cls, results: List[Dict], compact: bool = False,
+                     readonly: bool = True) -> "AggregateBars":
+        dtypes = COLUMN_DTYPES["compact" if compact else "default"]
+        columns = {}
+        for key, name in BAR_FIELDS.items():
+            if name == "volume" and compact:
+                volume = _column(results, key, np.float64)
+                integral = np.array_equal(volume, np.floor(volume))
+                columns[name] = volume.astype(np.int64) if integral else volume
+            else:
+                columns[name] = _column(results, key, dtypes[name])
+        return cls(_column(results, "t", np.int64), columns, readonly=readonly)
+
+    @classmethod
+    def from_response(cls, aggregates_data: Dict, compact: bool = False,
+                      readonly: bool = True) -> Optional["AggregateBars"]:
+        """Parse a decoded /v2/aggs response; None when it has no bars"""
+        if not aggregates_data or not aggregates_data.get("results"):
+            return None
+        return cls.from_results(aggregates_data["results"], compact=compact, readonly=readonly)
+
+    @classmethod
+    def from_json(cls, raw: Union[bytes, str], compact: bool = False) -> Optional["AggregateBars"]:
+        """Parse a raw /v2/aggs response body"""
+        return cls.from_response(json.loads(raw), compact=compact)
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def nbytes(self) -> int:
+        return self.t.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    def to_dataframe(self, copy: bool = False) -> pd.DataFrame:
+        """DataFrame in the same shape as the original dict-based parser;
+        a zero-copy view unless copy=True"""
+        index = pd.DatetimeIndex(self.t.view("datetime64[ms]"), copy=False, name="datetime")
+        return pd.DataFrame(self.columns, index=index, copy=copy)
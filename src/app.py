@@ -1,14 +1,33 @@
 import dash
 from dash import dcc, html, Input, Output, State, no_update
+from dash.exceptions import MissingCallbackContextException
 import dash_bootstrap_components as dbc
 from data_fetcher import DataFetcher
 from visualization import ChartVisualizer
+from multi_ticker import align_closes, CorrelationCache
+from bars_api import create_bars_api
+from streaming import PolygonStream, websockets
+from live_hub import LiveHub, create_live_blueprint
+from screener import Screener, SCREENER_PRESETS, parse_rule
+from reference_data import TickerIndex
+from render_pipeline import RenderPipeline, STAGE_PROGRESS
+from prefetcher import Prefetcher
+from request_scheduler import request_priority
+from profiling import Profiler, create_profiles_blueprint
+from job_manager import ThreadedJobManager
+import flask
 import os
+import uuid
 from datetime import datetime
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Run directly (python app.py), this script is imported again as __mp_main__
+# in each screener pool worker. Those only need screener.py, so they start
+# none of the long-lived services below
+SERVER_PROCESS = __name__ != "__mp_main__"
+
 # Try to get API keys from environment variable first (for Vercel)
 if os.environ.get('POLYGON_API_KEYS'):
     # In Vercel, store multiple keys separated by commas
@@ -33,10 +52,68 @@ else:
 # Use the first key as default for backward compatibility
 API_KEY = API_KEYS[0] if API_KEYS else ""
 
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY])
+# Run the fetch/render pipeline as a background job so it doesn't hold a
+# server worker while waiting on rate limits. Jobs run on threads in this
+# process, sharing the key scheduler and caches with everything else.
+# Serverless instances can't keep jobs running between requests, so
+# callbacks stay synchronous there.
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+if diskcache is not None and not os.environ.get('VERCEL'):
+    background_callback_manager = ThreadedJobManager(
+        diskcache.Cache(os.path.join('cache', 'jobs')),
+        max_workers=int(os.environ.get('BACKGROUND_JOB_THREADS', 8)))
+else:
+    background_callback_manager = None
+
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY],
+                background_callback_manager=background_callback_manager)
+
+# Opt-in profiling of the callbacks below (PROFILE_SAMPLE_RATE or PROFILE_TOKEN);
+# the /_profiles routes are only mounted behind a token
+profiler = Profiler.from_env(os.path.join('/tmp/cache' if os.environ.get('VERCEL') else 'cache', 'profiles'))
+if profiler.token is not None:
+    app.server.register_blueprint(create_profiles_blueprint(profiler))
 
-fetcher = DataFetcher(API_KEYS)  # Pass all API keys for rotation
+# Pass all API keys for rotation; closed sessions go to the memory-mapped bar archive
+fetcher = DataFetcher(API_KEYS, archive_dir=os.environ.get('BAR_ARCHIVE_DIR') or
+                      os.path.join('/tmp/cache' if os.environ.get('VERCEL') else 'cache', 'bars'))
 visualizer = ChartVisualizer()
+if SERVER_PROCESS and not os.environ.get('VERCEL'):
+    # Plotly's lazy figure imports happen now rather than in the first fetch
+    visualizer.warm_up()
+correlation_cache = CorrelationCache()
+# Shared by the dashboard and live callbacks; stages are cached per data version
+pipeline = RenderPipeline(fetcher, visualizer)
+# Serverless instances get one CPU and no long-lived worker processes
+screener = Screener(fetcher, processes=0 if os.environ.get('VERCEL') or not SERVER_PROCESS else None)
+
+# Every active ticker for the typeahead dropdowns, reloaded daily in the
+# background; serverless instances serve the persisted copy or the seeds
+ticker_index = TickerIndex(fetcher.client)
+if API_KEYS and SERVER_PROCESS and not os.environ.get('VERCEL'):
+    ticker_index.start_scheduler()
+
+# Warms the cache while the user is still choosing; needs a long-lived
+# process, so it is off on serverless instances
+prefetcher = Prefetcher(fetcher).start() \
+    if API_KEYS and SERVER_PROCESS and not os.environ.get('VERCEL') else None
+
+# Opt-in WebSocket streaming for live mode; serverless instances can't hold
+# the connections open, so it stays off on Vercel
+if os.environ.get('POLYGON_STREAMING') and API_KEYS and websockets is not None \
+        and SERVER_PROCESS and not os.environ.get('VERCEL'):
+    for stream_asset_type in ("stock", "forex", "crypto"):
+        fetcher.attach_stream(PolygonStream(API_KEYS[0], stream_asset_type).start())
+
+# Columnar bar/indicator endpoints for other services, sharing the same cache
+app.server.register_blueprint(create_bars_api(fetcher))
+
+# Slow, fetch-heavy callbacks run as background jobs when a manager is available
+background_kwargs = {"background": True} if background_callback_manager is not None else {}
 
 app.layout = dbc.Container([
     dbc.Row([
@@ -77,37 +154,13 @@ app.layout = dbc.Container([
                         ], md=4),
                         dbc.Col([
                             dbc.Label("Ticker Symbol"),
-                            dbc.Select(
+                            dcc.Dropdown(
                                 id="ticker-input",
-                                options=[
-                                    {"label": "--- Stocks ---", "value": "", "disabled": True},
-                                    {"label": "AAPL (Apple Inc.)", "value": "AAPL"},
-                                    {"label": "MSFT (Microsoft Corporation)", "value": "MSFT"},
-                                    {"label": "GOOGL (Alphabet Inc.)", "value": "GOOGL"},
-                                    {"label": "AMZN (Amazon.com Inc.)", "value": "AMZN"},
-                                    {"label": "TSLA (Tesla Inc.)", "value": "TSLA"},
-                                    {"label": "META (Meta Platforms Inc.)", "value": "META"},
-                                    {"label": "NVDA (NVIDIA Corporation)", "value": "NVDA"},
-                                    {"label": "JPM (JPMorgan Chase & Co.)", "value": "JPM"},
-                                    {"label": "V (Visa Inc.)", "value": "V"},
-                                    {"label": "WMT (Walmart Inc.)", "value": "WMT"},
-                                    {"label": "--- Forex ---", "value": "", "disabled": True},
-                                    {"label": "EURUSD (Euro/US Dollar)", "value": "EURUSD"},
-                                    {"label": "GBPUSD (British Pound/US Dollar)", "value": "GBPUSD"},
-                                    {"label": "USDJPY (US Dollar/Japanese Yen)", "value": "USDJPY"},
-                                    {"label": "AUDUSD (Australian Dollar/US Dollar)", "value": "AUDUSD"},
-                                    {"label": "USDCAD (US Dollar/Canadian Dollar)", "value": "USDCAD"},
-                                    {"label": "USDCHF (US Dollar/Swiss Franc)", "value": "USDCHF"},
-                                    {"label": "--- Crypto ---", "value": "", "disabled": True},
-                                    {"label": "BTCUSD (Bitcoin/US Dollar)", "value": "BTCUSD"},
-                                    {"label": "ETHUSD (Ethereum/US Dollar)", "value": "ETHUSD"},
-                                    {"label": "BNBUSD (Binance Coin/US Dollar)", "value": "BNBUSD"},
-                                    {"label": "XRPUSD (Ripple/US Dollar)", "value": "XRPUSD"},
-                                    {"label": "ADAUSD (Cardano/US Dollar)", "value": "ADAUSD"},
-                                    {"label": "DOGEUSD (Dogecoin/US Dollar)", "value": "DOGEUSD"},
-                                    {"label": "SOLUSD (Solana/US Dollar)", "value": "SOLUSD"}
-                                ],
-                                value="AAPL"
+                                options=ticker_index.options("stock", include=["AAPL"]),
+                                value="AAPL",
+                                clearable=False,
+                                placeholder="Search symbol or name",
+                                className="text-dark"
                             )
                         ], md=4),
                         dbc.Col([
@@ -166,7 +219,15 @@ app.layout = dbc.Container([
                                 )
                             ], className="w-100 mt-4")
                         ], md=4)
-                    ], className="mt-3")
+                    ], className="mt-3"),
+                    dbc.Progress(
+                        id="fetch-progress",
+                        value=0,
+                        striped=True,
+                        animated=True,
+                        className="mt-3",
+                        style={"visibility": "hidden"}
+                    )
                 ])
             ])
         ], md=12)
@@ -199,8 +260,105 @@ app.layout = dbc.Container([
         ], md=12, className="mt-4")
     ]),
     
+    dbc.Row([
+        dbc.Col([
+            dbc.Card([
+                dbc.CardBody([
+                    html.H4("Multi-Ticker Comparison", className="card-title"),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Tickers"),
+                            dcc.Dropdown(
+                                id="compare-tickers",
+                                multi=True,
+                                placeholder="Select tickers to compare",
+                                className="text-dark"
+                            )
+                        ], md=6),
+                        dbc.Col([
+                            dbc.Label("Correlation Window (bars)"),
+                            dbc.Input(
+                                id="correlation-window",
+                                type="number",
+                                min=2,
+                                max=1000,
+                                value=20
+                            )
+                        ], md=3),
+                        dbc.Col([
+                            dbc.Button(
+                                "Compare",
+                                id="compare-button",
+                                color="primary",
+                                className="w-100 mt-4"
+                            )
+                        ], md=3)
+                    ]),
+                    dcc.Loading(
+                        id="comparison-loading",
+                        type="default",
+                        children=[
+                            html.Div(id="comparison-container", className="mt-3")
+                        ]
+                    )
+                ])
+            ])
+        ], md=12, className="mt-4")
+    ]),
+    
+    dbc.Row([
+        dbc.Col([
+            dbc.Card([
+                dbc.CardBody([
+                    html.H4("Indicator Screener", className="card-title"),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Preset"),
+                            dbc.Select(
+                                id="screener-preset",
+                                options=[{"label": preset["label"], "value": key}
+                                         for key, preset in SCREENER_PRESETS.items()],
+                                value="rsi_oversold"
+                            )
+                        ], md=3),
+                        dbc.Col([
+                            dbc.Label("Rule"),
+                            dbc.Input(
+                                id="screener-rule",
+                                type="text",
+                                value=SCREENER_PRESETS["rsi_oversold"]["rule"]
+                            ),
+                            dbc.FormText("Conditions joined by 'and', e.g. RSI < 30 and close > SMA_50")
+                        ], md=6),
+                        dbc.Col([
+                            dbc.Button(
+                                "Run Screener",
+                                id="screener-button",
+                                color="primary",
+                                className="w-100 mt-4"
+                            )
+                        ], md=3)
+                    ]),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Universe (comma-separated tickers)"),
+                            dbc.Textarea(id="screener-universe", rows=2)
+                        ], md=12)
+                    ], className="mt-2"),
+                    dcc.Loading(
+                        id="screener-loading",
+                        type="default",
+                        children=[
+                            html.Div(id="screener-container", className="mt-3")
+                        ]
+                    )
+                ])
+            ])
+        ], md=12, className="mt-4")
+    ]),
+    
     dcc.Store(id="data-store"),
-    dcc.Store(id="live-data-store"),  # Store for live mode data
+    dcc.Store(id="live-data-store"),  # Live session id and last rendered feed version
     dcc.Interval(
         id='interval-component',
         interval=10000,  # 10 seconds in milliseconds (reduced from 1 second)
@@ -214,68 +372,52 @@ app.layout = dbc.Container([
 
 @app.callback(
     Output("ticker-input", "options"),
-    Input("asset-type", "value")
+    [Input("asset-type", "value"),
+     Input("ticker-input", "search_value")],
+    State("ticker-input", "value")
 )
-def update_ticker_options(asset_type):
-    if asset_type == "stock":
-        return [
-            {"label": "AAPL (Apple Inc.)", "value": "AAPL"},
-            {"label": "MSFT (Microsoft Corporation)", "value": "MSFT"},
-            {"label": "GOOGL (Alphabet Inc.)", "value": "GOOGL"},
-            {"label": "AMZN (Amazon.com Inc.)", "value": "AMZN"},
-            {"label": "TSLA (Tesla Inc.)", "value": "TSLA"},
-            {"label": "META (Meta Platforms Inc.)", "value": "META"},
-            {"label": "NVDA (NVIDIA Corporation)", "value": "NVDA"},
-            {"label": "JPM (JPMorgan Chase & Co.)", "value": "JPM"},
-            {"label": "V (Visa Inc.)", "value": "V"},
-            {"label": "WMT (Walmart Inc.)", "value": "WMT"},
-            {"label": "BA (Boeing Company)", "value": "BA"},
-            {"label": "DIS (Walt Disney Company)", "value": "DIS"}
-        ]
-    elif asset_type == "forex":
-        return [
-            {"label": "EURUSD (Euro/US Dollar)", "value": "EURUSD"},
-            {"label": "GBPUSD (British Pound/US Dollar)", "value": "GBPUSD"},
-            {"label": "USDJPY (US Dollar/Japanese Yen)", "value": "USDJPY"},
-            {"label": "AUDUSD (Australian Dollar/US Dollar)", "value": "AUDUSD"},
-            {"label": "USDCAD (US Dollar/Canadian Dollar)", "value": "USDCAD"},
-            {"label": "USDCHF (US Dollar/Swiss Franc)", "value": "USDCHF"},
-            {"label": "NZDUSD (New Zealand Dollar/US Dollar)", "value": "NZDUSD"},
-            {"label": "EURGBP (Euro/British Pound)", "value": "EURGBP"}
-        ]
-    elif asset_type == "crypto":
-        return [
-            {"label": "BTCUSD (Bitcoin/US Dollar)", "value": "BTCUSD"},
-            {"label": "ETHUSD (Ethereum/US Dollar)", "value": "ETHUSD"},
-            {"label": "BNBUSD (Binance Coin/US Dollar)", "value": "BNBUSD"},
-            {"label": "XRPUSD (Ripple/US Dollar)", "value": "XRPUSD"},
-            {"label": "ADAUSD (Cardano/US Dollar)", "value": "ADAUSD"},
-            {"label": "DOGEUSD (Dogecoin/US Dollar)", "value": "DOGEUSD"},
-            {"label": "SOLUSD (Solana/US Dollar)", "value": "SOLUSD"},
-            {"label": "MATICUSD (Polygon/US Dollar)", "value": "MATICUSD"}
-        ]
-    else:
-        return []
+@profiler.callback
+def update_ticker_options(asset_type, search_value, value):
+    # Searches the local reference index; the selection stays listed so the
+    # dropdown keeps showing it while the user types
+    return ticker_index.options(asset_type, search_value, include=[value])
 
 
 @app.callback(
-    [Output("data-store", "data"),
-     Output("chart-container", "children"),
-     Output("stats-container", "children")],
-    [Input("fetch-button", "n_clicks")],
-    [State("asset-type", "value"),
-     State("ticker-input", "value"),
-     State("days-input", "value"),
-     State("timeframe-select", "value"),
-     State("chart-type", "value")]
+    Output("ticker-input", "value"),
+    Input("asset-type", "value"),
+    State("ticker-input", "value"),
+    prevent_initial_call=True
 )
-def update_dashboard(n_clicks, asset_type, ticker, days, timeframe, chart_type):
+def reset_ticker_for_asset_type(asset_type, value):
+    if value and ticker_index.details(asset_type, value):
+        return no_update
+    popular = ticker_index.popular(asset_type)
+    return popular[0] if popular else no_update
+
+
+def request_session():
+    """Client address for fair queuing of API requests. Background jobs run
+    outside the Flask request, but Dash hands them the callback's context."""
+    if flask.has_request_context():
+        return flask.request.remote_addr
+    try:
+        return dash.callback_context.remote or None
+    except MissingCallbackContextException:
+        return None
+
+
+@profiler.callback
+def update_dashboard(set_progress, n_clicks, asset_type, ticker, days, timeframe, chart_type):
     if n_clicks is None:
         return None, html.Div("Click 'Fetch Data' to load market data"), html.Div()
     
     if not ticker:
         return None, html.Div("Please enter a ticker symbol"), html.Div()
     
+    if asset_type not in ("stock", "forex", "crypto"):
+        return None, html.Div("Invalid asset type"), html.Div()
+    
     try:
         # Handle live mode differently
         if timeframe == "live":
@@ -285,91 +427,216 @@ def update_dashboard(n_clicks, asset_type, ticker, days, timeframe, chart_type):
             timeframe_actual = timeframe
             days_actual = days
             
-        if asset_type == "stock":
-            df = fetcher.fetch_stock_data(ticker.upper(), days_actual, timeframe_actual)
-        elif asset_type == "forex":
-            df = fetcher.fetch_forex_data(ticker.upper(), days_actual, timeframe_actual)
-        elif asset_type == "crypto":
-            df = fetcher.fetch_crypto_data(ticker.upper(), days_actual, timeframe_actual)
-        else:
-            return None, html.Div("Invalid asset type"), html.Div()
+        wait_time = fetcher.client.estimated_wait()
+        if wait_time > 0:
+            set_progress((10, f"Waiting for an API key (~{wait_time:.0f}s)"))
         
-        if df is None or df.empty:
+        def progress(stage):
+            if stage in STAGE_PROGRESS:
+                set_progress(STAGE_PROGRESS[stage])
+        
+        with request_priority("interactive", session=request_session()):
+            rendered = pipeline.run(asset_type, ticker.upper(), days_actual, timeframe_actual,
+                                    chart_type, progress)
+        if rendered is None:
             return None, html.Div(f"No data found for {ticker}"), html.Div()
         
-        df_with_indicators = fetcher.calculate_technical_indicators(df)
+        return rendered.store_data(), rendered.chart, rendered.stats
         
-        if chart_type == "candlestick":
-            fig = visualizer.create_candlestick_chart(df_with_indicators, ticker.upper())
-        elif chart_type == "technical":
-            fig = visualizer.create_technical_indicators_chart(df_with_indicators, ticker.upper())
-        elif chart_type == "volume_profile":
-            fig = visualizer.create_volume_profile_chart(df_with_indicators, ticker.upper())
+    except Exception as e:
+        error_msg = f"Error fetching data: {str(e)}"
+        return None, html.Div(error_msg, className="text-danger"), html.Div()
+
+
+dashboard_outputs = [Output("data-store", "data"),
+                     Output("chart-container", "children"),
+                     Output("stats-container", "children")]
+dashboard_inputs = [Input("fetch-button", "n_clicks")]
+dashboard_states = [State("asset-type", "value"),
+                    State("ticker-input", "value"),
+                    State("days-input", "value"),
+                    State("timeframe-select", "value"),
+                    State("chart-type", "value")]
+
+if background_callback_manager is not None:
+    # Clicking Fetch again while a job runs makes Dash terminate the old job
+    # before starting the new one, so superseded fetches don't keep running
+    @app.callback(
+        dashboard_outputs,
+        dashboard_inputs,
+        dashboard_states,
+        background=True,
+        progress=[Output("fetch-progress", "value"),
+                  Output("fetch-progress", "label")],
+        progress_default=[0, ""],
+        running=[(Output("fetch-progress", "style"),
+                  {"visibility": "visible"}, {"visibility": "hidden"})],
+        cancel=[Input("asset-type", "value")]
+    )
+    def update_dashboard_job(set_progress, *args):
+        return update_dashboard(set_progress, *args)
+else:
+    @app.callback(dashboard_outputs, dashboard_inputs, dashboard_states)
+    def update_dashboard_sync(*args):
+        # No job manager: progress has nowhere to go
+        return update_dashboard(lambda progress: None, *args)
+
+
+@app.callback(
+    [Input("asset-type", "value"),
+     Input("ticker-input", "value"),
+     Input("days-input", "value"),
+     Input("timeframe-select", "value")],
+    prevent_initial_call=True  # Only selections the user makes, not each page load's defaults
+)
+def prefetch_selection(asset_type, ticker, days, timeframe):
+    if prefetcher is not None and ticker and days:
+        prefetcher.select(asset_type, ticker, int(days), timeframe)
+
+
+# Background jobs run on server threads (see job_manager.py), so the fetch
+# job reads the cache the prefetcher warmed and this sees its bookkeeping
+@app.callback(
+    Input("fetch-button", "n_clicks"),
+    [State("asset-type", "value"),
+     State("ticker-input", "value"),
+     State("days-input", "value"),
+     State("timeframe-select", "value")],
+    prevent_initial_call=True
+)
+def record_prefetch_use(n_clicks, asset_type, ticker, days, timeframe):
+    if prefetcher is not None and ticker and days and timeframe != "live":
+        outcome = prefetcher.record_use(asset_type, ticker, int(days), timeframe)
+        print(f"Prefetch {outcome} for {ticker} {timeframe}; hit rate {prefetcher.hit_rate():.0%}, "
+              f"{prefetcher.stats['wasted_calls']} wasted calls")
+
+
+@app.callback(
+    Output("compare-tickers", "options"),
+    [Input("asset-type", "value"),
+     Input("compare-tickers", "search_value")],
+    State("compare-tickers", "value")
+)
+@profiler.callback
+def update_compare_options(asset_type, search_value, selected):
+    return ticker_index.options(asset_type, search_value, include=selected or [])
+
+
+# Jobs run on server threads (see job_manager.py), so the correlation
+# cache carries over from one click to the next
+@app.callback(
+    Output("comparison-container", "children"),
+    Input("compare-button", "n_clicks"),
+    [State("asset-type", "value"),
+     State("compare-tickers", "value"),
+     State("days-input", "value"),
+     State("timeframe-select", "value"),
+     State("correlation-window", "value")],
+    prevent_initial_call=True,
+    **background_kwargs
+)
+@profiler.callback
+def update_comparison(n_clicks, asset_type, tickers, days, timeframe, window):
+    if not tickers or len(tickers) < 2:
+        return html.Div("Select at least two tickers to compare")
+    
+    try:
+        if timeframe == "live":
+            timeframe_actual, days_actual = "minute", 1
         else:
-            fig = visualizer.create_candlestick_chart(df_with_indicators, ticker.upper())
+            timeframe_actual, days_actual = timeframe, days
         
-        chart = dcc.Graph(figure=fig, style={'height': '800px'})
+        with request_priority("interactive", session=request_session()):
+            data_dict = fetcher.fetch_multiple(asset_type, [t.upper() for t in tickers],
+                                               days_actual, timeframe_actual)
+        if len(data_dict) < 2:
+            return html.Div("Not enough data to compare these tickers")
         
-        latest_price = df_with_indicators['close'].iloc[-1]
-        price_change = df_with_indicators['close'].iloc[-1] - df_with_indicators['close'].iloc[0]
-        price_change_pct = (price_change / df_with_indicators['close'].iloc[0]) * 100
+        panel = align_closes(data_dict)
+        if len(panel) < 2:
+            return html.Div("These tickers have no overlapping bars")
         
-        total_volume = df_with_indicators['volume'].sum()
-        avg_volume = df_with_indicators['volume'].mean()
+        # Rolling state is cached per (ticker set, timeframe, window), so a
+        # refresh with one new bar only pushes that bar
+        window = max(2, min(int(window or 20), len(panel)))
+        correlation_matrix = correlation_cache.get(panel, timeframe_actual, window)
         
-        high = df_with_indicators['high'].max()
-        low = df_with_indicators['low'].min()
+        comparison_fig = visualizer.create_comparison_chart(data_dict)
+        heatmap_fig = visualizer.create_correlation_heatmap(data_dict, correlation_matrix)
+        heatmap_fig.update_layout(title=f'Price Correlation Matrix (last {window} bars)')
         
-        latest_rsi = df_with_indicators['RSI'].iloc[-1] if 'RSI' in df_with_indicators.columns else None
-        
-        stats = dbc.Row([
-            dbc.Col([
-                html.H6("Latest Price"),
-                html.H4(f"${latest_price:.2f}", className="text-primary")
-            ], md=2),
-            dbc.Col([
-                html.H6("Change"),
-                html.H4(
-                    f"{price_change:+.2f} ({price_change_pct:+.2f}%)",
-                    className="text-success" if price_change >= 0 else "text-danger"
-                )
-            ], md=2),
-            dbc.Col([
-                html.H6("Period High"),
-                html.H4(f"${high:.2f}", className="text-info")
-            ], md=2),
-            dbc.Col([
-                html.H6("Period Low"),
-                html.H4(f"${low:.2f}", className="text-info")
-            ], md=2),
-            dbc.Col([
-                html.H6("Average Volume"),
-                html.H4(f"{avg_volume:,.0f}")
-            ], md=2),
-            dbc.Col([
-                html.H6("RSI (14)"),
-                html.H4(
-                    f"{latest_rsi:.2f}" if latest_rsi else "N/A",
-                    className="text-warning" if latest_rsi and (latest_rsi > 70 or latest_rsi < 30) else ""
-                )
-            ], md=2)
+        return dbc.Row([
+            dbc.Col([dcc.Graph(figure=comparison_fig)], md=7),
+            dbc.Col([dcc.Graph(figure=heatmap_fig)], md=5)
         ])
         
-        # Convert DataFrame to JSON-serializable format
-        data_dict = {
-            'dates': df_with_indicators.index.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-            'open': df_with_indicators['open'].tolist(),
-            'high': df_with_indicators['high'].tolist(),
-            'low': df_with_indicators['low'].tolist(),
-            'close': df_with_indicators['close'].tolist(),
-            'volume': df_with_indicators['volume'].tolist()
-        }
+    except Exception as e:
+        return html.Div(f"Error comparing tickers: {str(e)}", className="text-danger")
+
+
+@app.callback(
+    Output("screener-rule", "value"),
+    Input("screener-preset", "value"),
+    prevent_initial_call=True
+)
+def update_screener_rule(preset):
+    return SCREENER_PRESETS[preset]["rule"] if preset in SCREENER_PRESETS else no_update
+
+
+@app.callback(
+    Output("screener-universe", "value"),
+    Input("asset-type", "value")
+)
+def update_screener_universe(asset_type):
+    return ", ".join(ticker_index.popular(asset_type))
+
+
+@app.callback(
+    Output("screener-container", "children"),
+    Input("screener-button", "n_clicks"),
+    [State("asset-type", "value"),
+     State("screener-rule", "value"),
+     State("screener-universe", "value"),
+     State("days-input", "value"),
+     State("timeframe-select", "value")],
+    prevent_initial_call=True,
+    **background_kwargs
+)
+@profiler.callback
+def update_screener(n_clicks, asset_type, rule_text, universe, days, timeframe):
+    tickers = list(dict.fromkeys(t.strip().upper() for t in (universe or "").split(",") if t.strip()))
+    if not tickers:
+        return html.Div("Add at least one ticker to the universe")
+    
+    try:
+        rule = parse_rule(rule_text or "")
+    except ValueError as e:
+        return html.Div(f"Invalid rule: {str(e)}", className="text-danger")
+    
+    try:
+        if timeframe == "live":
+            timeframe_actual, days_actual = "minute", 1
+        else:
+            timeframe_actual, days_actual = timeframe, days
+        
+        # A universe is many fetches: they queue behind dashboard and live requests
+        with request_priority("backfill", session=request_session()):
+            matches = screener.scan(asset_type, tickers, rule, days_actual, timeframe_actual)
+        summary = html.P(f"{len(matches)} of {len(tickers)} tickers match {rule}", className="text-muted")
+        if matches.empty:
+            return summary
         
-        return data_dict, chart, stats
+        header = html.Thead(html.Tr([html.Th(column) for column in matches.columns]))
+        body = html.Tbody([
+            html.Tr([html.Td(row["ticker"])] +
+                    [html.Td(f"{row[column]:,.2f}") for column in matches.columns[1:]])
+            for _, row in matches.iterrows()
+        ])
+        return html.Div([summary, dbc.Table([header, body], bordered=True, hover=True,
+                                            size="sm", color="dark")])
         
     except Exception as e:
-        error_msg = f"Error fetching data: {str(e)}"
-        return None, html.Div(error_msg, className="text-danger"), html.Div()
+        return html.Div(f"Error running screener: {str(e)}", className="text-danger")
 
 
 # Callback to control interval component
@@ -391,118 +658,100 @@ def toggle_interval(timeframe):
         return True, ""  # Disable interval
 
 
-# Callback for live updates
+def compute_live(asset_type, ticker):
+    """Fetch and compute one live update; runs once per feed, not per session"""
+    # Snapshot-driven: only the forming candle is fetched on most ticks.
+    # Each feed is its own session, so one busy ticker can't starve the rest
+    with request_priority("live", session=f"live:{asset_type}:{ticker}"):
+        df_full = fetcher.fetch_live_bars(asset_type, ticker)
+    if df_full is None or df_full.empty:
+        return None
+    # Indicators and stats are computed here, once per feed update; charts
+    # are rendered lazily, once per chart type, by whichever session asks first
+    version, _, summary = pipeline.prepare(df_full, (asset_type, ticker, "minute"))
+    return {"df": df_full, "summary": summary, "version": version}
+
+
+# One poller per watched ticker, shared by every session in live mode.
+# Serverless instances refresh inline on read instead of running threads.
+# Ticks that bring the same bars (e.g. while the market is closed) keep the
+# current version, so sessions don't re-render.
+live_hub = LiveHub(compute_live, interval_seconds=10, threaded=not os.environ.get('VERCEL'),
+                   unchanged=lambda old, new: old["version"] == new["version"])
+app.server.register_blueprint(create_live_blueprint(live_hub, lambda payload: payload["summary"]))
+
+
+def push_stream_bars(asset_type):
+    """Stream listener: recompute the live feeds whose bars just changed"""
+    def listener(touched):
+        for ticker in touched:
+            live_hub.refresh((asset_type, ticker))
+    return listener
+
+
+# Streamed bars reach the shared feeds (and the render pipeline's cache
+# behind them) as they arrive instead of on the next 10-second poll
+for stream in fetcher.streams.values():
+    stream.add_listener(push_stream_bars(stream.asset_type))
+
+
+def render_live(payload, asset_type, ticker, chart_type, version):
+    """Chart and stats for one feed version, built once and shared by all sessions"""
+    rendered = pipeline.render(payload["df"], (asset_type, ticker, "minute"), ticker, chart_type,
+                               annotation=f"Live Update #{version}")
+    return rendered.chart, rendered.stats
+
+
+# Callback for live updates: read the hub's latest version for this ticker
 @app.callback(
     [Output("chart-container", "children", allow_duplicate=True),
-     Output("stats-container", "children", allow_duplicate=True)],
+     Output("stats-container", "children", allow_duplicate=True),
+     Output("live-data-store", "data")],
     [Input("interval-component", "n_intervals")],
     [State("asset-type", "value"),
      State("ticker-input", "value"),
      State("timeframe-select", "value"),
-     State("chart-type", "value")],
+     State("chart-type", "value"),
+     State("live-data-store", "data")],
     prevent_initial_call=True
 )
-def update_live_data(n_intervals, asset_type, ticker, timeframe, chart_type):
-    if timeframe != "live" or not ticker:
-        return no_update, no_update
+@profiler.callback
+def update_live_data(n_intervals, asset_type, ticker, timeframe, chart_type, live_state):
+    live_state = live_state or {}
+    session_id = live_state.get("session") or uuid.uuid4().hex
+    previous_key = tuple(live_state["key"]) if live_state.get("key") else None
+    
+    if timeframe != "live" or not ticker or asset_type not in ("stock", "forex", "crypto"):
+        if previous_key:
+            live_hub.unsubscribe(previous_key, session_id)
+            return no_update, no_update, {"session": session_id}
+        return no_update, no_update, no_update
     
     try:
-        # Fetch latest minute data for live view
-        if asset_type == "stock":
-            df = fetcher.fetch_stock_data(ticker.upper(), 1, "minute")
-        elif asset_type == "forex":
-            df = fetcher.fetch_forex_data(ticker.upper(), 1, "minute")
-        elif asset_type == "crypto":
-            df = fetcher.fetch_crypto_data(ticker.upper(), 1, "minute")
-        else:
-            return no_update, no_update
+        key = (asset_type, ticker.upper())
+        if previous_key and previous_key != key:
+            live_hub.unsubscribe(previous_key, session_id)
+        live_hub.subscribe(key, session_id)  # Renews this session's lease
         
-        if df is None or df.empty:
-            return no_update, no_update
+        version, payload = live_hub.latest(key)
+        if payload is None:
+            # First viewer of this ticker: give the new poller a moment
+            version, payload = live_hub.wait_for_update(key, 0, timeout=5)
         
-        # Get last 100 data points for better visualization
-        if asset_type == "stock":
-            df_full = fetcher.fetch_stock_data(ticker.upper(), 1, "minute")
-        elif asset_type == "forex":
-            df_full = fetcher.fetch_forex_data(ticker.upper(), 1, "minute") 
-        elif asset_type == "crypto":
-            df_full = fetcher.fetch_crypto_data(ticker.upper(), 1, "minute")
-            
-        if df_full is not None and not df_full.empty:
-            df_with_indicators = fetcher.calculate_technical_indicators(df_full)
-            
-            # Create chart with live annotation
-            if chart_type == "candlestick":
-                fig = visualizer.create_candlestick_chart(df_with_indicators, ticker.upper())
-            elif chart_type == "technical":
-                fig = visualizer.create_technical_indicators_chart(df_with_indicators, ticker.upper())
-            elif chart_type == "volume_profile":
-                fig = visualizer.create_volume_profile_chart(df_with_indicators, ticker.upper())
-            else:
-                fig = visualizer.create_candlestick_chart(df_with_indicators, ticker.upper())
-            
-            # Add live annotation
-            fig.add_annotation(
-                text=f"Live Update #{n_intervals}",
-                xref="paper", yref="paper",
-                x=0.02, y=0.98,
-                showarrow=False,
-                font=dict(size=12, color="red"),
-                bgcolor="rgba(0,0,0,0.5)"
-            )
-            
-            chart = dcc.Graph(figure=fig, style={'height': '800px'})
-            
-            # Update stats
-            latest_price = df_with_indicators['close'].iloc[-1]
-            price_change = df_with_indicators['close'].iloc[-1] - df_with_indicators['close'].iloc[0]
-            price_change_pct = (price_change / df_with_indicators['close'].iloc[0]) * 100
-            
-            avg_volume = df_with_indicators['volume'].mean()
-            high = df_with_indicators['high'].max()
-            low = df_with_indicators['low'].min()
-            latest_rsi = df_with_indicators['RSI'].iloc[-1] if 'RSI' in df_with_indicators.columns else None
-            
-            stats = dbc.Row([
-                dbc.Col([
-                    html.H6("Latest Price"),
-                    html.H4(f"${latest_price:.2f}", className="text-primary")
-                ], md=2),
-                dbc.Col([
-                    html.H6("Change"),
-                    html.H4(
-                        f"{price_change:+.2f} ({price_change_pct:+.2f}%)",
-                        className="text-success" if price_change >= 0 else "text-danger"
-                    )
-                ], md=2),
-                dbc.Col([
-                    html.H6("Period High"),
-                    html.H4(f"${high:.2f}", className="text-info")
-                ], md=2),
-                dbc.Col([
-                    html.H6("Period Low"),
-                    html.H4(f"${low:.2f}", className="text-info")
-                ], md=2),
-                dbc.Col([
-                    html.H6("Average Volume"),
-                    html.H4(f"{avg_volume:,.0f}")
-                ], md=2),
-                dbc.Col([
-                    html.H6("RSI (14)"),
-                    html.H4(
-                        f"{latest_rsi:.2f}" if latest_rsi else "N/A",
-                        className="text-warning" if latest_rsi and (latest_rsi > 70 or latest_rsi < 30) else ""
-                    )
-                ], md=2)
-            ])
-            
-            return chart, stats
+        new_state = {"session": session_id, "key": list(key), "version": version,
+                     "chart_type": chart_type}
+        if payload is None:
+            return no_update, no_update, new_state
+        if new_state == live_state:
+            # Nothing new since this session's last render
+            return no_update, no_update, no_update
+        
+        chart, stats = render_live(payload, asset_type, key[1], chart_type, version)
+        return chart, stats, new_state
             
     except Exception as e:
         print(f"Error in live update: {e}")
-        return no_update, no_update
-    
-    return dash.no_update, dash.no_update
+        return no_update, no_update, no_update
 
 
 # Add CSS for pulse animation
@@ -0,0 +1,282 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from data_fetcher import parse_timespan
+from multi_ticker import forward_fill
+from screener import MAX_POOL_PROCESSES, pool_context
+
+# Bars per year, for annualizing Sharpe ratios (US equity sessions)
+PERIODS_PER_YEAR = {
+    "minute": 252 * 390,
+    "hour": 252 * 7,
+    "day": 252,
+    "week": 52,
+    "month": 12,
+}
+
+# All indicator arrays below are time-major: (bars, parameter sets), and
+# follow the definitions in calculate_technical_indicators so a backtest
+# trades on the same values the charts show.
+
+
+def rolling_mean(close: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """Simple moving averages for many windows at once from one cumulative sum"""
+    windows = np.asarray(windows, dtype=np.int64)
+    sums = np.concatenate([[0.0], np.cumsum(close)])
+    end = np.arange(1, len(close) + 1)[:, None]
+    start = end - windows[None, :]
+    with np.errstate(invalid="ignore"):
+        means = (sums[end] - sums[np.maximum(start, 0)]) / windows
+    means[start < 0] = np.nan
+    return means
+
+
+def rolling_std(close: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """Sample (ddof=1) rolling standard deviations, like pandas rolling().std()"""
+    windows = np.asarray(windows, dtype=np.int64)
+    # Centering first keeps the sum-of-squares formula numerically stable
+    centered = close - close.mean()
+    sums = np.concatenate([[0.0], np.cumsum(centered)])
+    squares = np.concatenate([[0.0], np.cumsum(centered * centered)])
+    end = np.arange(1, len(close) + 1)[:, None]
+    start = np.maximum(end - windows[None, :], 0)
+    total = sums[end] - sums[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (squares[end] - squares[start] - total * total / windows) / (windows - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+    std[end - windows[None, :] < 0] = np.nan
+    return std
+
+
+def ema(values: np.ndarray, spans: Sequence[int]) -> np.ndarray:
+    """ewm(span, adjust=False).mean() for many spans: one vector step per bar"""
+    spans = np.asarray(spans, dtype=np.float64)
+    if values.ndim == 1:
+        values = np.broadcast_to(values[:, None], (len(values), len(spans)))
+    alpha = 2.0 / (spans + 1.0)
+    out = np.empty(values.shape)
+    out[0] = values[0]
+    for t in range(1, len(values)):
+        out[t] = out[t - 1] + alpha * (values[t] - out[t - 1])
+    return out
+
+
+def rsi(close: np.ndarray, periods: Sequence[int]) -> np.ndarray:
+    delta = np.diff(close, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rs = rolling_mean(gain, periods) / rolling_mean(loss, periods)
+        return 100 - 100 / (1 + rs)
+
+
+def _hold(enter: np.ndarray, exit: np.ndarray, enter_short: Optional[np.ndarray] = None,
+          exit_short: Optional[np.ndarray] = None) -> np.ndarray:
+    """Long from an entry bar until the next exit bar, as 0/1 positions.
+
+    With short signals too, also short from a short entry until the next
+    short exit (-1); an exit and an entry on the same bar reverse the
+    position. That depends on the position held, so it steps through the
+    bars, still for every parameter set at once.
+    """
+    if enter_short is None:
+        events = np.where(enter, 1.0, np.where(exit, 0.0, np.nan))
+        return np.nan_to_num(forward_fill(events), nan=0.0)
+    positions = np.empty(enter.shape)
+    current = np.zeros(enter.shape[1:])
+    for t in range(len(enter)):
+        current[((current > 0) & exit[t]) | ((current < 0) & exit_short[t])] = 0.0
+        flat = current == 0
+        current[flat & enter[t]] = 1.0
+        current[flat & ~enter[t] & enter_short[t]] = -1.0
+        positions[t] = current
+    return positions
+
+
+def sma_cross_positions(close: np.ndarray, params: np.ndarray, short: bool = False) -> np.ndarray:
+    windows, inverse = np.unique(params[:, :2], return_inverse=True)
+    inverse = inverse.reshape(-1, 2)
+    means = rolling_mean(close, windows)
+    fast, slow = means[:, inverse[:, 0]], means[:, inverse[:, 1]]
+    with np.errstate(invalid="ignore"):
+        long = fast > slow
+    flat = np.isnan(fast) | np.isnan(slow)
+    positions = np.where(long, 1.0, -1.0 if short else 0.0)
+    positions[flat] = 0.0
+    return positions
+
+
+def macd_positions(close: np.ndarray, params: np.ndarray, short: bool = False) -> np.ndarray:
+    spans, inverse = np.unique(params[:, :2], return_inverse=True)
+    inverse = inverse.reshape(-1, 2)
+    emas = ema(close, spans)
+    macd = emas[:, inverse[:, 0]] - emas[:, inverse[:, 1]]
+    signal = ema(macd, params[:, 2])
+    return np.where(macd > signal, 1.0, -1.0 if short else 0.0)
+
+
+def rsi_positions(close: np.ndarray, params: np.ndarray, short: bool = False) -> np.ndarray:
+    """Buy when RSI drops below `lower`, sell when it rises above `upper`;
+    with short, sell short there and cover below `lower` again"""
+    periods, inverse = np.unique(params[:, 0], return_inverse=True)
+    values = rsi(close, periods)[:, inverse]
+    with np.errstate(invalid="ignore"):
+        oversold, overbought = values < params[:, 1], values > params[:, 2]
+    if short:
+        return _hold(oversold, overbought, overbought, oversold)
+    return _hold(oversold, overbought)
+
+
+def bollinger_positions(close: np.ndarray, params: np.ndarray, short: bool = False) -> np.ndarray:
+    """Buy a close below the lower band, sell when price is back at the middle band;
+    with short, also sell short a close above the upper band until the middle band"""
+    windows, inverse = np.unique(params[:, 0], return_inverse=True)
+    middle = rolling_mean(close, windows)[:, inverse]
+    width = params[:, 1] * rolling_std(close, windows)[:, inverse]
+    with np.errstate(invalid="ignore"):
+        below, above = close[:, None] < middle - width, close[:, None] > middle
+        if not short:
+            return _hold(below, above)
+        return _hold(below, above, close[:, None] > middle + width, close[:, None] < middle)
+
+
+STRATEGIES = {
+    "sma_cross": {
+        "params": ("fast", "slow"),
+        "positions": sma_cross_positions,
+        "grid": {"fast": range(5, 55, 5), "slow": range(20, 210, 10)},
+        "valid": lambda p: p[:, 0] < p[:, 1],
+    },
+    "macd": {
+        "params": ("fast", "slow", "signal"),
+        "positions": macd_positions,
+        "grid": {"fast": range(6, 20, 2), "slow": range(20, 40, 4), "signal": (5, 7, 9, 12)},
+        "valid": lambda p: p[:, 0] < p[:, 1],
+    },
+    "rsi": {
+        "params": ("period", "lower", "upper"),
+        "positions": rsi_positions,
+        "grid": {"period": (7, 14, 21), "lower": (20, 25, 30, 35), "upper": (60, 65, 70, 75, 80)},
+        "valid": lambda p: p[:, 1] < p[:, 2],
+    },
+    "bollinger": {
+        "params": ("window", "k"),
+        "positions": bollinger_positions,
+        "grid": {"window": range(10, 60, 5), "k": (1.5, 2.0, 2.5, 3.0)},
+        "valid": lambda p: np.ones(len(p), dtype=bool),
+    },
+}
+
+
+def make_grid(strategy: str, grid: Optional[Dict[str, Sequence]] = None) -> np.ndarray:
+    """Every valid combination of the grid's values, as a (sets, params) array"""
+    spec = STRATEGIES[strategy]
+    grid = grid or spec["grid"]
+    params = np.array(list(product(*(grid[name] for name in spec["params"]))), dtype=np.float64)
+    return params[spec["valid"](params)]
+
+
+def evaluate_positions(close: np.ndarray, positions: np.ndarray, commission: float = 0.0005,
+                       periods_per_year: int = 252) -> Dict[str, np.ndarray]:
+    """Metrics for every column of positions at once.
+
+    A position decided at bar t's close earns bar t+1's return. Commission
+    is charged as a fraction of the traded notional on every change in
+    position (a long-to-short flip trades twice).
+    """
+    returns = close[1:] / close[:-1] - 1.0
+    held = positions[:-1]
+    turnover = np.abs(np.diff(held, axis=0, prepend=0.0))
+    strategy_returns = held * returns[:, None] - commission * turnover
+    equity = np.cumprod(1.0 + strategy_returns, axis=0)
+    drawdown = 1.0 - equity / np.maximum.accumulate(equity, axis=0)
+    mean = strategy_returns.mean(axis=0)
+    std = strategy_returns.std(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), 0.0)
+    return {
+        "total_return": equity[-1] - 1.0,
+        "sharpe": sharpe,
+        "max_drawdown": drawdown.max(axis=0),
+        "trades": turnover.sum(axis=0),
+        "exposure": np.abs(held).mean(axis=0),
+    }
+
+
+def _sweep_chunk(strategy: str, close: np.ndarray, params: np.ndarray, commission: float,
+                 short: bool, periods_per_year: int) -> Dict[str, np.ndarray]:
+    positions = STRATEGIES[strategy]["positions"](close, params, short=short)
+    return evaluate_positions(close, positions, commission, periods_per_year)
+
+
+class SweepResult:
+    """Per-parameter-set metrics, best Sharpe first, plus sweep timing"""
+
+    def __init__(self, results: pd.DataFrame, stats: Dict):
+        self.results = results
+        self.stats = stats
+
+    @property
+    def best(self) -> pd.Series:
+        return self.results.iloc[0]
+
+
+def sweep(close, strategy: str = "sma_cross", grid: Optional[Dict[str, Sequence]] = None,
+          commission: float = 0.0005, short: bool = False, periods_per_year: int = 252,
+          processes: int = 0, max_cells: int = 2_000_000) -> SweepResult:
+    """Backtest every parameter set of a grid over one close series.
+
+    Parameter sets are evaluated in batches of at most max_cells
+    (bars x sets) array cells; with processes > 1 the batches run on a
+    process pool started from the screener's fork server (or spawned), as
+    forking the threaded server directly is unsafe.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    params = make_grid(strategy, grid)
+    batch = max(1, max_cells // len(close))
+    chunks = [params[i:i + batch] for i in range(0, len(params), batch)]
+    args = (commission, short, periods_per_year)
+
+    start = time.perf_counter()
+    if processes > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=pool_context()) as pool:
+            parts = list(pool.map(_sweep_chunk, [strategy] * len(chunks), [close] * len(chunks),
+                                  chunks, *([arg] * len(chunks) for arg in args)))
+    else:
+        parts = [_sweep_chunk(strategy, close, chunk, *args) for chunk in chunks]
+    elapsed = time.perf_counter() - start
+
+    results = pd.DataFrame(params, columns=list(STRATEGIES[strategy]["params"]))
+    for metric in parts[0]:
+        results[metric] = np.concatenate([part[metric] for part in parts])
+    results = results.sort_values("sharpe", ascending=False, kind="stable").reset_index(drop=True)
+
+    evaluations = len(close) * len(params)
+    stats = {
+        "strategy": strategy,
+        "bars": len(close),
+        "parameter_sets": len(params),
+        "bar_evaluations": evaluations,
+        "seconds": elapsed,
+        "seconds_per_million": elapsed / evaluations * 1e6 if evaluations else 0.0,
+    }
+    return SweepResult(results, stats)
+
+
+def sweep_ticker(fetcher, asset_type: str, ticker: str, days_back: int = 365,
+                 timespan: str = "day", strategy: str = "sma_cross", **kwargs) -> Optional[SweepResult]:
+    """Sweep a strategy grid over one ticker's cached (or freshly fetched) bars"""
+    df = fetcher.fetch_data(asset_type, ticker, days_back, timespan)
+    if df is None or len(df) < 2:
+        return None
+    multiplier, base = parse_timespan(timespan)
+    kwargs.setdefault("periods_per_year", PERIODS_PER_YEAR.get(base, 252) // multiplier)
+    kwargs.setdefault("processes", 0 if os.environ.get("VERCEL") else
+                      min(os.cpu_count() or 1, MAX_POOL_PROCESSES))
+    return sweep(df["close"].to_numpy(np.float64), strategy, **kwargs)
@@ -0,0 +1,275 @@
+import os
+import re
+import struct
+import threading
+import weakref
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aggregate_bars import AggregateBars
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: writers in other processes aren't locked out
+
+# One fixed-width record per bar, in the order Polygon returns the fields
+RECORD = np.dtype([("t", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+                   ("volume", "<f8"), ("vwap", "<f8"), ("transactions", "<i8")])
+COLUMNS = RECORD.names[1:]
+
+MAGIC = b"ALCBARS\0"
+FORMAT_VERSION = 1
+# magic, version, record size, first and last covered day (ordinals), record count
+HEADER = struct.Struct("<8sIIqqQ")
+HEADER_SIZE = RECORD.itemsize  # Padded, so records stay 64-byte aligned
+
+DAY_MS = 86_400_000
+INTRADAY = ("second", "minute", "hour")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _day_start_ms(ordinal: int) -> int:
+    return (ordinal - EPOCH_ORDINAL) * DAY_MS
+
+
+def _bounds_ms(first: int, last: int, timespan: str, calendar=None) -> Tuple[int, int]:
+    """[start, end) in epoch ms of the bars dated first through last (ordinals).
+
+    Intraday bars are cut at the calendar's session bounds: a stock session
+    runs to 20:00 Eastern, past UTC midnight in winter. Daily and longer bars
+    are stamped at the start of their date, so they (and every span without
+    a calendar) are cut at UTC midnight.
+    """
+    if calendar is None or not timespan.endswith(INTRADAY):
+        return _day_start_ms(first), _day_start_ms(last + 1)
+    start = calendar.session_start(date.fromordinal(first))
+    end = calendar.session_end(date.fromordinal(last))
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
+def _safe(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9.-]", "_", value)
+
+
+# Every live archive, so one fork hook can reach them all
+_archives = weakref.WeakSet()
+
+
+def _reset_locks_after_fork():
+    for archive in list(_archives):
+        archive._reset_lock()
+
+
+if hasattr(os, "register_at_fork"):
+    # A forked child (e.g. of a fork-start process pool) would otherwise
+    # inherit an archive's lock as held by a writer thread that doesn't exist there
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+class _Mapped:
+    """A read-only mapping of one series file, valid for `count` records"""
+
+    __slots__ = ("inode", "count", "start", "end", "records")
+
+    def __init__(self, path: str, inode: int, start: int, end: int, count: int):
+        self.inode, self.start, self.end, self.count = inode, start, end, count
+        # Plain ndarray view of the map, so slices don't leak the memmap subclass into pandas
+        self.records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER_SIZE,
+                                 shape=(count,)).view(np.ndarray) if count else np.empty(0, dtype=RECORD)
+
+
+class BarArchive:
+    """Append-only bar files per (ticker, timespan), read through mmap.
+
+    Each file is a header with the covered day range and record count,
+    then fixed-width records sorted by timestamp. Readers trust the header
+    count, so a writer appending past it is invisible until the header is
+    updated. Ranges are sliced with a binary search on the timestamp
+    column and returned as read-only views into the mapping; every worker
+    process maps the same pages from the OS page cache.
+
+    A series covers one contiguous span of days: newer bars are appended
+    in place, older ones are merged in by rewriting the file (readers
+    keep their old mapping until they notice the new inode).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._maps: Dict[Tuple[str, str], _Mapped] = {}
+        self._lock = threading.Lock()
+        _archives.add(self)
+        self.stats = {"reads": 0, "hits": 0, "appended": 0, "rewrites": 0}
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def _path(self, ticker: str, timespan: str) -> str:
+        return os.path.join(self.root, _safe(ticker), f"{_safe(timespan)}.bars")
+
+    @staticmethod
+    def _read_header(f) -> Optional[Tuple[int, int, int]]:
+        raw = os.pread(f.fileno(), HEADER.size, 0) if hasattr(os, "pread") else f.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            return None
+        magic, version, record_size, start, end, count = HEADER.unpack(raw)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.itemsize:
+            raise ValueError(f"Not a version {FORMAT_VERSION} bar archive")
+        return start, end, count
+
+    def _mapped(self, ticker: str, timespan: str) -> Optional[_Mapped]:
+        """The current mapping for a series, remapped if the file grew or was replaced"""
+        path = self._path(ticker, timespan)
+        try:
+            with open(path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                header = self._read_header(f)
+        except (OSError, ValueError):
+            return None
+        if header is None:
+            return None
+        start, end, count = header
+        key = (ticker, timespan)
+        mapped = self._maps.get(key)
+        if mapped is None or mapped.inode != inode or mapped.count != count or mapped.end != end:
+            mapped = _Mapped(path, inode, start, end, count)
+            self._maps[key] = mapped
+        return mapped
+
+    def coverage(self, ticker: str, timespan: str) -> Optional[Tuple[str, str]]:
+        """First and last archived day, as ISO dates"""
+        mapped = self._mapped(ticker, timespan)
+        if mapped is None:
+            return None
+        return date.fromordinal(mapped.start).isoformat(), date.fromordinal(mapped.end).isoformat()
+
+    def read(self, ticker: str, timespan: str, from_date: str, to_date: str,
+             calendar=None) -> Optional[Tuple[AggregateBars, str]]:
+        """Archived bars from from_date through to_date (or the last archived
+        day, if earlier) as zero-copy views, with the last day they cover.
+        None unless the archive covers from_date. Days are the calendar's
+        sessions (a stock day ends at 20:00 Eastern), UTC days without one."""
+        self.stats["reads"] += 1
+        mapped = self._mapped(ticker, timespan)
+        first = date.fromisoformat(from_date).toordinal()
+        if mapped is None or not mapped.start <= first <= mapped.end:
+            return None
+        last = min(date.fromisoformat(to_date).toordinal(), mapped.end)
+        t = mapped.records["t"]
+        lo, hi = np.searchsorted(t, _bounds_ms(first, last, timespan, calendar))
+        window = mapped.records[lo:hi]
+        self.stats["hits"] += 1
+        bars = AggregateBars(window["t"], {name: window[name] for name in COLUMNS})
+        return bars, date.fromordinal(last).isoformat()
+
+    def store(self, ticker: str, timespan: str, df: pd.DataFrame, from_date: str, to_date: str,
+              calendar=None) -> int:
+        """Archive the bars of a complete, final range; returns how many were added.
+
+        The range must be final (no bar in it can still change) and df must
+        hold every bar in it. Ranges that would leave a gap in the covered
+        span replace the series when they are newer and are dropped otherwise.
+        Days are cut at the calendar's session bounds, as in read().
+        """
+        first = date.fromisoformat(from_date).toordinal()
+        last = date.fromisoformat(to_date).toordinal()
+        records = self._to_records(df, *_bounds_ms(first, last, timespan, calendar))
+        path = self._path(ticker, timespan)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, self._locked(path) as f:
+            try:
+                header = self._read_header(f)
+            except ValueError:
+                header = None  # Unreadable: start over
+            if header is None:
+                return self._rewrite(path, records, first, last)
+            start, end, count = header
+            if start <= first and last <= end:
+                return 0  # Already covered
+            if first > end + 1 or last < start - 1:
+                if last < start:
+                    return 0
+                print(f"Archive of {ticker} {timespan} restarts at {from_date} (gap after "
+                      f"{date.fromordinal(end).isoformat()})")
+                return self._rewrite(path, records, first, last)
+            if first >= start:
+                # Newer bars only: append past the last record, then publish the count
+                newer = records
+                if count:
+                    f.seek(HEADER_SIZE + (count - 1) * RECORD.itemsize)
+                    last_t = np.frombuffer(f.read(RECORD.itemsize), dtype=RECORD)["t"][0]
+                    newer = records[records["t"] > last_t]
+                f.seek(HEADER_SIZE + count * RECORD.itemsize)
+                f.truncate()
+                f.write(newer.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+                self._write_header(f, start, max(end, last), count + len(newer))
+                self.stats["appended"] += len(newer)
+                return len(newer)
+            # Older bars: merge, keeping archived bars where both have one
+            existing = np.fromfile(path, dtype=RECORD, count=count, offset=HEADER_SIZE)
+            merged = np.concatenate([existing, records])
+            order = np.argsort(merged["t"], kind="stable")
+            merged = merged[order]
+            keep = np.ones(len(merged), dtype=bool)
+            keep[1:] = merged["t"][1:] != merged["t"][:-1]
+            return self._rewrite(path, merged[keep], min(start, first), max(end, last)) - count
+
+    @staticmethod
+    def _locked(path: str):
+        """The series file opened for update, holding an exclusive lock on the
+        file that is at `path` (another process may have replaced it meanwhile)"""
+        while True:
+            f = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+            if fcntl is None:
+                return f
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except OSError:
+                pass
+            f.close()
+
+    @staticmethod
+    def _to_records(df: pd.DataFrame, start_ms: int, end_ms: int) -> np.ndarray:
+        t = df.index.values.astype("datetime64[ms]").astype(np.int64)
+        inside = (t >= start_ms) & (t < end_ms)
+        records = np.empty(int(inside.sum()), dtype=RECORD)
+        records["t"] = t[inside]
+        for name in COLUMNS:
+            records[name] = df[name].to_numpy()[inside] if name in df else 0
+        return records
+
+    @staticmethod
+    def _write_header(f, start: int, end: int, count: int):
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.itemsize, start, end, count).ljust(HEADER_SIZE, b"\0"))
+        f.flush()
+
+    def _rewrite(self, path: str, records: np.ndarray, start: int, end: int) -> int:
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as out:
+            out.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.itemsize, start, end, len(records))
+                      .ljust(HEADER_SIZE, b"\0"))
+            out.write(records.tobytes())
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, path)
+        self.stats["rewrites"] += 1
+        return len(records)
+
+
+def last_final_day(calendar, from_date: str, to_date: str,
+                   at: Optional[datetime] = None) -> Optional[str]:
+    """The latest day in [from_date, to_date] whose bars, and all before it, are final"""
+    day = date.fromisoformat(to_date)
+    first = date.fromisoformat(from_date)
+    at = at or datetime.now(timezone.utc)
+    while day >= first and not calendar.is_final(day.isoformat(), at):
+        day -= timedelta(days=1)
+    return day.isoformat() if day >= first else None
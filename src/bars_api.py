@@ -0,0 +1,231 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, Response, request
+
+from cache_policy import NO_STORE, bars_cache_control
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+BAR_COLUMNS = ["open", "high", "low", "close", "volume", "vwap", "transactions"]
+TIMESPANS = {"minute", "5minute", "15minute", "hour", "day", "week"}
+ASSET_TYPES = {"stock", "forex", "crypto"}
+# Longest range per request, by timespan: uncached ranges are fetched
+# inside the request, and a year of minute bars is hundreds of API calls
+MAX_DAYS = {"minute": 30, "5minute": 90, "15minute": 180, "hour": 730, "day": 3650, "week": 3650}
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a bar frame: index plus every column's raw bytes"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(df.index.values.astype("datetime64[ms]")).view("i8").tobytes())
+    for column in df.columns:
+        digest.update(column.encode())
+        digest.update(np.ascontiguousarray(df[column].to_numpy(dtype="f8")).tobytes())
+    return digest.hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header allows gzip: an explicit gzip (or
+    x-gzip) token wins over *, and q=0 refuses the coding"""
+    explicit = wildcard = None
+    for token in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in token.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        coding = coding.lower()
+        if coding in ("gzip", "x-gzip"):
+            explicit = max(explicit or 0.0, quality)
+        elif coding == "*":
+            wildcard = quality
+    quality = explicit if explicit is not None else wildcard
+    return quality is not None and quality > 0
+
+
+def to_columnar_json(df: pd.DataFrame) -> bytes:
+    """{"t": [epoch ms...], "columns": {name: [values...]}} with NaN as null"""
+    columns = {}
+    for column in df.columns:
+        values = df[column].to_numpy(dtype="f8")
+        missing = np.isnan(values)
+        listed = values.tolist()
+        if missing.any():
+            for i in np.flatnonzero(missing):
+                listed[i] = None
+        columns[column] = listed
+    stamps = np.asarray(df.index.values.astype("datetime64[ms]")).view("i8").tolist()
+    return json.dumps({"t": stamps, "columns": columns}, separators=(",", ":")).encode()
+
+
+def to_arrow(df: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class ResponseCache:
+    """Encoded bodies keyed by ETag, so repeat polls skip serialization and gzip.
+
+    Bounded by total body size: a year of minute-bar indicators is megabytes,
+    so an entry count alone would not cap memory. Bodies larger than the
+    whole budget are not kept.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous)
+            self._entries[key] = body
+            self.total_bytes += len(body)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+
+def _error(message: str, status: int) -> Response:
+    response = Response(json.dumps({"error": message}), status=status, mimetype="application/json")
+    response.headers["Cache-Control"] = NO_STORE
+    return response
+
+
+def create_bars_api(fetcher) -> Blueprint:
+    """Columnar bar and indicator endpoints backed by the dashboard's DataFetcher.
+
+    GET /api/v1/bars/<asset_type>/<ticker>
+    GET /api/v1/indicators/<asset_type>/<ticker>
+
+    Query: timespan (default day), days (default 30) or from/to (YYYY-MM-DD),
+    format=json|arrow. Responses carry a strong ETag derived from the bar
+    data (one per content encoding), answer If-None-Match with 304 and are
+    gzipped when accepted. Ranges are capped per timespan (MAX_DAYS).
+    Cache-Control is set per response so a CDN can absorb repeat requests.
+    """
+    api = Blueprint("bars_api", __name__, url_prefix="/api/v1")
+    bodies = ResponseCache()
+
+    def parse_query():
+        timespan = request.args.get("timespan", "day")
+        if timespan not in TIMESPANS:
+            raise ValueError(f"Unsupported timespan: {timespan}")
+        max_days = MAX_DAYS[timespan]
+        days = request.args.get("days", 30, type=int)
+        if days is None or not 1 <= days <= max_days:
+            raise ValueError(f"days must be between 1 and {max_days} for {timespan} bars")
+        from_date = request.args.get("from")
+        to_date = request.args.get("to")
+        dates = {value: datetime.strptime(value, "%Y-%m-%d")
+                 for value in (from_date, to_date) if value is not None}
+        if from_date is not None:
+            end = dates[to_date] if to_date is not None else datetime.now()
+            if (end - dates[from_date]).days + 1 > max_days:
+                raise ValueError(f"from/to may span at most {max_days} days for {timespan} bars")
+        output = request.args.get("format", "json")
+        if output not in ("json", "arrow"):
+            raise ValueError(f"Unsupported format: {output}")
+        if output == "arrow" and pa is None:
+            raise ValueError("Arrow output requires pyarrow to be installed")
+        return timespan, days, from_date, to_date, output
+
+    def serve(asset_type: str, ticker: str, with_indicators: bool) -> Response:
+        if asset_type not in ASSET_TYPES:
+            return _error(f"Invalid asset type: {asset_type}", 404)
+        try:
+            timespan, days, from_date, to_date, output = parse_query()
+        except ValueError as e:
+            return _error(str(e), 400)
+
+        df = fetcher.fetch_data(asset_type, ticker.upper(), days, timespan, from_date, to_date)
+        if df is None or df.empty:
+            return _error(f"No data found for {ticker}", 404)
+
+        cache_control = bars_cache_control(timespan, from_date, to_date)
+
+        # The ETag covers the bars plus everything that shapes the body, and is
+        # checked before any indicator work or serialization happens. A strong
+        # validator names one exact body, so the gzipped one gets its own
+        gzip_ok = accepts_gzip(request.headers.get("Accept-Encoding"))
+        variant = f"{request.path}|{output}|{with_indicators}"
+        digest = hashlib.blake2b(f"{fingerprint(df)}|{variant}".encode(), digest_size=16).hexdigest()
+        etag = f'"{digest}-gzip"' if gzip_ok else f'"{digest}"'
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            response = Response(status=304)
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = cache_control
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        cached = bodies.get(etag)
+        if cached is None:
+            if with_indicators:
+                frame = fetcher.calculate_technical_indicators(df)
+                frame = frame[[c for c in frame.columns if c not in BAR_COLUMNS]]
+            else:
+                frame = df[BAR_COLUMNS]
+            body = to_arrow(frame) if output == "arrow" else to_columnar_json(frame)
+            if gzip_ok:
+                body = gzip.compress(body, compresslevel=6)
+            cached = body
+            bodies.set(etag, cached)
+
+        response = Response(cached, mimetype=ARROW_MIMETYPE if output == "arrow" else "application/json")
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = cache_control
+        response.headers["Vary"] = "Accept-Encoding"
+        if gzip_ok:
+            response.headers["Content-Encoding"] = "gzip"
+        return response
+
+    @api.route("/bars/<asset_type>/<ticker>")
+    def bars(asset_type, ticker):
+        return serve(asset_type, ticker, with_indicators=False)
+
+    @api.route("/indicators/<asset_type>/<ticker>")
+    def indicators(asset_type, ticker):
+        return serve(asset_type, ticker, with_indicators=True)
+
+    return api
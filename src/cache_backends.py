@@ -0,0 +1,242 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+# A cached entry: (payload, stored_at, expires_at); expires_at None = never
+Entry = Tuple[bytes, float, Optional[float]]
+
+# File backends keep expiry in the mtime; "never" is a far-future mtime
+FILE_NEVER_EXPIRES = 4102444800.0  # 2100-01-01
+
+AGGS_PATH = re.compile(r"/v2/aggs/ticker/([^/]+)/range/(\d+)/([a-z]+)/([^/]+)/([^/?]+)")
+TICKER_PATH = re.compile(r"/tickers?/([^/?]+)")
+
+
+def describe_url(url: str) -> Dict[str, Optional[str]]:
+    """Ticker/timespan/range metadata for a Polygon URL, for selective invalidation"""
+    match = AGGS_PATH.search(url)
+    if match:
+        ticker, multiplier, timespan, from_date, to_date = match.groups()
+        if multiplier != "1":
+            timespan = f"{multiplier}{timespan}"
+        return {"ticker": ticker, "timespan": timespan, "from_date": from_date, "to_date": to_date}
+    match = TICKER_PATH.search(url)
+    return {"ticker": match.group(1) if match else None, "timespan": None,
+            "from_date": None, "to_date": None}
+
+
+def _safe(value: Optional[str]) -> str:
+    return re.sub(r"[^A-Za-z0-9.-]", "_", value or "-")
+
+
+def entry_key(digest: str, meta: Dict) -> str:
+    """Request hash prefixed with the ticker and timespan it belongs to.
+
+    The prefix lets backends without indexes (plain files) invalidate by
+    ticker from a directory listing alone.
+    """
+    return f"{_safe(meta.get('ticker'))}__{_safe(meta.get('timespan'))}__{digest}"
+
+
+class CacheBackend:
+    """Storage for cached API responses, keyed by request hash"""
+
+    def get(self, key: str) -> Optional[Entry]:
+        raise NotImplementedError
+
+    def set(self, key: str, payload: bytes, meta: Dict, expires_at: Optional[float]):
+        raise NotImplementedError
+
+    def delete_expired(self, before: float) -> int:
+        """Drop entries that expired before `before`; returns how many"""
+        raise NotImplementedError
+
+    def invalidate(self, ticker: Optional[str] = None, timespan: Optional[str] = None) -> int:
+        """Drop every entry for a ticker (and timespan); returns how many"""
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        raise NotImplementedError
+
+    def final_entries(self) -> Iterator[Tuple[str, bytes, Dict]]:
+        """(key, payload, meta) for every entry that never expires"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class FileCacheBackend(CacheBackend):
+    """One JSON file per entry, named by its key, with the expiry time kept
+    in the file's mtime. Sweeps and invalidation scan the directory."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Entry]:
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            with open(path, "rb") as f:
+                payload = f.read()
+        except OSError:
+            return None
+        expires_at = None if stat.st_mtime >= FILE_NEVER_EXPIRES else stat.st_mtime
+        return payload, stat.st_ctime, expires_at
+
+    def set(self, key: str, payload: bytes, meta: Dict, expires_at: Optional[float]):
+        path = self._path(key)
+        # Write then rename, so concurrent readers never see half a file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        expiry = FILE_NEVER_EXPIRES if expires_at is None else expires_at
+        os.utime(tmp, (expiry, expiry))
+        os.replace(tmp, path)
+
+    def _remove_where(self, predicate) -> int:
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json") and predicate(entry):
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def delete_expired(self, before: float) -> int:
+        return self._remove_where(lambda entry: entry.stat().st_mtime < before)
+
+    def invalidate(self, ticker: Optional[str] = None, timespan: Optional[str] = None) -> int:
+        def matches(entry):
+            parts = entry.name.split("__")
+            if len(parts) != 3:
+                # Unprefixed (older) entries only go with a full invalidation
+                return ticker is None and timespan is None
+            return ((ticker is None or parts[0] == _safe(ticker)) and
+                    (timespan is None or parts[1] == _safe(timespan)))
+
+        return self._remove_where(matches)
+
+    def clear(self) -> int:
+        return self._remove_where(lambda entry: True)
+
+    def final_entries(self) -> Iterator[Tuple[str, bytes, Dict]]:
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".json") or entry.stat().st_mtime < FILE_NEVER_EXPIRES:
+                continue
+            key = entry.name[:-len(".json")]
+            parts = key.split("__")
+            # Only the key prefix survives in a file name; the range is in the URL hash
+            meta = {"ticker": parts[0], "timespan": parts[1], "from_date": None, "to_date": None} \
+                if len(parts) == 3 else {}
+            try:
+                with open(entry.path, "rb") as f:
+                    yield key, f.read(), meta
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return sum(1 for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json"))
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """All entries in one SQLite database in WAL mode.
+
+    Readers never block each other or the writer, so several server worker
+    processes can share one cache file. Payloads are BLOBs; ticker,
+    timespan, range and expiry are indexed columns, so expiry sweeps and
+    selective invalidation are single indexed DELETEs.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            payload BLOB NOT NULL,
+            ticker TEXT,
+            timespan TEXT,
+            from_date TEXT,
+            to_date TEXT,
+            stored_at REAL NOT NULL,
+            expires_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS entries_by_range ON entries (ticker, timespan, from_date, to_date);
+        CREATE INDEX IF NOT EXISTS entries_by_expiry ON entries (expires_at);
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        if sqlite3 is None:
+            raise ImportError("SQLiteCacheBackend requires the sqlite3 module")
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Entry]:
+        row = self._connection().execute(
+            "SELECT payload, stored_at, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return (bytes(row[0]), row[1], row[2]) if row else None
+
+    def set(self, key: str, payload: bytes, meta: Dict, expires_at: Optional[float]):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries "
+            "(key, payload, ticker, timespan, from_date, to_date, stored_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, sqlite3.Binary(payload), meta.get("ticker"), meta.get("timespan"),
+             meta.get("from_date"), meta.get("to_date"), time.time(), expires_at)
+        )
+
+    def delete_expired(self, before: float) -> int:
+        return self._connection().execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (before,)
+        ).rowcount
+
+    def invalidate(self, ticker: Optional[str] = None, timespan: Optional[str] = None) -> int:
+        clauses, args = [], []
+        if ticker is not None:
+            clauses.append("ticker = ?")
+            args.append(ticker)
+        if timespan is not None:
+            clauses.append("timespan = ?")
+            args.append(timespan)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._connection().execute(f"DELETE FROM entries{where}", args).rowcount
+
+    def clear(self) -> int:
+        return self._connection().execute("DELETE FROM entries").rowcount
+
+    def final_entries(self) -> Iterator[Tuple[str, bytes, Dict]]:
+        rows = self._connection().execute(
+            "SELECT key, payload, ticker, timespan, from_date, to_date FROM entries "
+            "WHERE expires_at IS NULL ORDER BY key"
+        )
+        for key, payload, ticker, timespan, from_date, to_date in rows:
+            yield key, bytes(payload), {"ticker": ticker, "timespan": timespan,
+                                        "from_date": from_date, "to_date": to_date}
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
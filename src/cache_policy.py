@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Historical bars never change once their range has closed
+IMMUTABLE = "public, max-age=31536000, s-maxage=31536000, immutable"
+# Errors must not be pinned at the edge
+NO_STORE = "no-store"
+
+# Short lifetimes for ranges that include the current session, by timespan
+LIVE_MAX_AGE = {
+    "minute": 5,
+    "5minute": 15,
+    "15minute": 30,
+    "hour": 60,
+    "day": 60,
+    "week": 300,
+}
+
+
+def bars_cache_control(timespan: str, from_date: Optional[str], to_date: Optional[str],
+                       now: Optional[datetime] = None) -> str:
+    """Cache-Control for a bars response, based on what kind of range it is.
+
+    - Explicit range that ended before today: immutable, cached for a year.
+    - Relative range (days=N, which ends yesterday): identical until the
+      date rolls over, so it lives until midnight.
+    - Range that reaches into today: short max-age by timespan.
+
+    s-maxage and stale-while-revalidate let the CDN keep serving (and
+    refreshing in the background) without going back to the function.
+    """
+    now = now or datetime.now()
+    today = now.strftime("%Y-%m-%d")
+
+    if to_date is not None and to_date < today:
+        if from_date is not None:
+            return IMMUTABLE
+        # Explicit end date but relative start: shifts when the date rolls over
+    if to_date is None or to_date < today:
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        ttl = max(60, int((midnight - now).total_seconds()))
+        return f"public, max-age={ttl}, s-maxage={ttl}, stale-while-revalidate=600"
+
+    ttl = LIVE_MAX_AGE.get(timespan, 60)
+    return f"public, max-age={ttl}, s-maxage={ttl}, stale-while-revalidate={ttl * 6}"
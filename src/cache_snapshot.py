@@ -0,0 +1,181 @@
+"""Portable snapshots of the immutable part of the cache.
+
+A snapshot holds every final cache entry (closed ranges that can no longer
+change) and the ticker reference lists in one file, so a cold instance can
+answer from it instead of the API. Layout:
+
+    header    magic, format version, entry count, index and manifest offsets
+    entries   one zlib block per entry: key, meta JSON and payload
+    index     fixed-width (digest, offset, length) records sorted by digest
+    manifest  zlib JSON: creation time, counts and the reference lists
+
+Opening a snapshot maps the file and reads only the header and manifest.
+A lookup binary-searches the mapped index and inflates that entry alone.
+
+Usage:
+    python src/cache_snapshot.py export OUT [--cache-dir DIR] [--reference-dir DIR]
+    python src/cache_snapshot.py info PATH
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"ALCSNAP\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQ")  # magic, version, flags, entries, index at, manifest at, manifest length
+INDEX_DTYPE = np.dtype([("digest", "S32"), ("offset", "<u8"), ("length", "<u4")])
+COMPRESSION_LEVEL = 6
+
+
+def _digest(key: str) -> bytes:
+    """The request hash a cache key ends with (see cache_backends.entry_key)"""
+    return key.rsplit("__", 1)[-1].encode()
+
+
+class CacheSnapshot:
+    """A read-only, memory-mapped snapshot; safe to share between threads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path} is not a cache snapshot")
+        magic, version, _, count, index_at, manifest_at, manifest_length = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a cache snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} is snapshot format {version}, expected {FORMAT_VERSION}")
+        self.index = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=count, offset=index_at)
+        self.manifest = json.loads(zlib.decompress(self._map[manifest_at:manifest_at + manifest_length]))
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _entry(self, position: int) -> Tuple[str, Dict, bytes]:
+        record = self.index[position]
+        start = int(record["offset"])
+        block = zlib.decompress(self._map[start:start + int(record["length"])])
+        key, meta, payload = block.split(b"\n", 2)
+        return key.decode(), json.loads(meta), payload
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        """(payload, meta) for a cache key, or None if the snapshot lacks it"""
+        digest = _digest(key)
+        position = int(np.searchsorted(self.index["digest"], digest))
+        if position >= len(self.index) or self.index[position]["digest"] != digest:
+            return None
+        stored_key, meta, payload = self._entry(position)
+        if stored_key != key:
+            return None
+        self.hits += 1
+        return payload, meta
+
+    def reference(self, asset_type: str) -> Optional[Dict]:
+        """The saved ticker reference list for an asset type (TickerIndex format)"""
+        return self.manifest["reference"].get(asset_type)
+
+    def describe(self) -> Dict:
+        return {"path": self.path, "format": FORMAT_VERSION, "created_at": self.manifest["created_at"],
+                "entries": len(self.index), "bytes": len(self._map),
+                "payload_bytes": self.manifest["payload_bytes"],
+                "reference": {asset_type: len(saved["rows"])
+                              for asset_type, saved in self.manifest["reference"].items()}}
+
+
+def export_snapshot(cache, path: str, reference_dir: Optional[str] = None) -> Dict:
+    """Write the final entries of a CacheManager, plus any saved ticker
+    reference lists, to a snapshot at path"""
+    if cache.backend is None:
+        raise ValueError("The cache is disabled; nothing to export")
+    reference = {}
+    if reference_dir:
+        for name in sorted(os.listdir(reference_dir)) if os.path.isdir(reference_dir) else []:
+            if name.startswith("tickers-") and name.endswith(".json"):
+                with open(os.path.join(reference_dir, name)) as f:
+                    reference[name[len("tickers-"):-len(".json")]] = json.load(f)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    records, payload_bytes = [], 0
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        for key, payload, meta in cache.backend.final_entries():
+            block = zlib.compress(key.encode() + b"\n" + json.dumps(meta).encode() + b"\n" + payload,
+                                  COMPRESSION_LEVEL)
+            records.append((_digest(key), f.tell(), len(block)))
+            payload_bytes += len(payload)
+            f.write(block)
+        index = np.array(records, dtype=INDEX_DTYPE)
+        index.sort(order="digest")
+        # Keep the index aligned so it can be viewed in place
+        f.write(b"\0" * (-f.tell() % 8))
+        index_at = f.tell()
+        f.write(index.tobytes())
+        manifest = zlib.compress(json.dumps({"created_at": time.time(), "payload_bytes": payload_bytes,
+                                             "reference": reference}).encode(), COMPRESSION_LEVEL)
+        manifest_at = f.tell()
+        f.write(manifest)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(index), index_at, manifest_at, len(manifest)))
+    os.replace(tmp, path)
+    return {"entries": len(index), "payload_bytes": payload_bytes, "bytes": os.path.getsize(path),
+            "reference": {asset_type: len(saved["rows"]) for asset_type, saved in reference.items()}}
+
+
+@lru_cache(maxsize=None)
+def load_snapshot(path: Optional[str]) -> Optional[CacheSnapshot]:
+    """Open a snapshot once per process; None (with a message) if it can't be used"""
+    if not path:
+        return None
+    try:
+        snapshot = CacheSnapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"Cache snapshot unavailable ({e})")
+        return None
+    print(f"Loaded cache snapshot {path}: {len(snapshot)} entries")
+    return snapshot
+
+
+def default_snapshot() -> Optional[CacheSnapshot]:
+    """The snapshot named by the CACHE_SNAPSHOT environment variable, if any"""
+    return load_snapshot(os.environ.get("CACHE_SNAPSHOT"))
+
+
+def main(argv):
+    import argparse
+    from polygon_client import CacheManager
+
+    parser = argparse.ArgumentParser(prog="cache_snapshot.py", description="Cache snapshot tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write the final cache entries to a snapshot")
+    export.add_argument("out")
+    export.add_argument("--cache-dir", default="cache")
+    export.add_argument("--reference-dir", default=None,
+                        help="Ticker reference lists to include (default: CACHE_DIR/reference)")
+    info = commands.add_parser("info", help="Describe a snapshot")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        cache = CacheManager(cache_dir=args.cache_dir, snapshot=False)
+        reference_dir = args.reference_dir or os.path.join(args.cache_dir, "reference")
+        stats = export_snapshot(cache, args.out, reference_dir)
+        print(f"Wrote {args.out}: {stats['entries']} entries, "
+              f"{stats['payload_bytes'] / 1e6:.1f} MB of responses in {stats['bytes'] / 1e6:.1f} MB, "
+              f"reference lists {stats['reference']}")
+    else:
+        print(json.dumps(CacheSnapshot(args.path).describe(), indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,78 +1,476 @@
 from polygon_client import PolygonClient
-from datetime import datetime, timedelta
+from bar_archive import BarArchive, last_final_day
+from indicators import compute_indicators
+from market_calendar import get_calendar
+from request_scheduler import propagate
+from profiling import profiled
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
+import re
+import threading
+import time
+
+TICKER_PREFIXES = {"stock": "", "forex": "C:", "crypto": "X:"}
+
+# Polygon's 50,000 limit counts the base aggregates a response is built
+# from: intraday bars come from minute bars, daily and longer from day bars.
+# Counts assume a 24h market (crypto), the worst case.
+BASE_BARS_PER_DAY = {
+    "second": 86400,
+    "minute": 1440,
+    "hour": 1440,
+    "day": 1,
+    "week": 1,
+    "month": 1,
+    "quarter": 1,
+    "year": 1,
+}
+AGGREGATE_LIMIT = 50000
+
+
+def parse_timespan(timespan: str) -> Tuple[int, str]:
+    """'5minute' -> (5, 'minute'); 'day' -> (1, 'day')"""
+    match = re.fullmatch(r"(\d*)([a-z]+)", timespan)
+    if not match or match.group(2) not in BASE_BARS_PER_DAY:
+        raise ValueError(f"Invalid timespan: {timespan}")
+    return int(match.group(1) or 1), match.group(2)
+
+
+def plan_chunks(from_date: str, to_date: str, timespan: str,
+                limit: int = AGGREGATE_LIMIT) -> List[Tuple[str, str]]:
+    """Split a date range into chunks that each stay under the result limit.
+    
+    Chunks sit on a fixed grid of whole chunk lengths (counted from day 1
+    of the proleptic calendar), so overlapping requests plan the same
+    chunks and reuse each other's cache entries. Only the last chunk is
+    clipped to the requested end.
+    """
+    _, base = parse_timespan(timespan)
+    chunk_days = max(1, int(limit * 0.9) // BASE_BARS_PER_DAY[base])
+    start = date.fromisoformat(from_date).toordinal()
+    end = date.fromisoformat(to_date).toordinal()
+    if end - start + 1 <= chunk_days:
+        return [(from_date, to_date)]
+    
+    chunks = []
+    for chunk_start in range(start // chunk_days * chunk_days, end + 1, chunk_days):
+        chunk_end = min(chunk_start + chunk_days - 1, end)
+        chunks.append((date.fromordinal(max(chunk_start, 1)).isoformat(),
+                       date.fromordinal(chunk_end).isoformat()))
+    return chunks
+
+
+@profiled
+def calculate_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """A copy of df with every registered indicator column added"""
+    return compute_indicators(df)
 
 
 class DataFetcher:
-    def __init__(self, api_keys):
-        # Support both single key and multiple keys
-        self.client = PolygonClient(api_keys)
+    def __init__(self, api_keys, archive_dir: Optional[str] = None, cache=None):
+        # Support both single key and multiple keys; cache defaults to a CacheManager
+        self.client = PolygonClient(api_keys, cache=cache)
+        # Final bars, memory-mapped per (ticker, timespan); see bar_archive.py
+        self.archive = BarArchive(archive_dir) if archive_dir else None
+        
+        # Live view state per (asset type, ticker): finalized minute bars plus
+        # the start of the minute currently forming
+        self._live_state = {}
+        self._live_lock = threading.Lock()
+        self.live_stats = {"snapshots": 0, "aggregate_refetches": 0, "closed_skips": 0}
+        # How long streamed views reuse the aggregate history in front of the stream
+        self.live_history_seconds = 300.0
+        # A stream silent for longer than this is treated as down: live views
+        # go back to REST snapshots until it is heard from again
+        self.stream_stale_seconds = 60.0
+        # Optional WebSocket streams per asset type (see streaming.PolygonStream)
+        self.streams = {}
+        # Chunked backfills wait for rate-limit slots far longer than an
+        # interactive request would
+        self.backfill_budget_seconds = 300.0
+        self.backfill_stats = {"chunks": 0, "cached": 0, "fetched": 0, "failed": 0}
+    
+    def attach_stream(self, stream):
+        """Serve live bars for this stream's market from its aggregator"""
+        self.streams[stream.asset_type] = stream
+    
+    def _date_range(self, days_back: int, from_date: Optional[str] = None,
+                    to_date: Optional[str] = None):
+        """Explicit dates win; otherwise end yesterday to ensure data availability"""
+        if to_date is None:
+            to_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        if from_date is None:
+            from_date = (datetime.now() - timedelta(days=days_back + 1)).strftime("%Y-%m-%d")
+        return from_date, to_date
+    
+    def _session_range(self, asset_type: str, days_back: int, from_date: Optional[str] = None,
+                       to_date: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """The requested range clipped to trading days, or None if it has none.
+        
+        A default range with no sessions in it (a one-day lookback over a
+        weekend) moves back to the last session instead.
+        """
+        implicit = from_date is None
+        from_date, to_date = self._date_range(days_back, from_date, to_date)
+        calendar = get_calendar(asset_type)
+        clipped = calendar.clip_range(from_date, to_date)
+        if clipped is None and implicit:
+            last = calendar.previous_trading_day(date.fromisoformat(to_date)).isoformat()
+            clipped = (last, last)
+        if clipped is None:
+            print(f"No {asset_type} sessions between {from_date} and {to_date}")
+        return clipped
+    
+    def pending_requests(self, asset_type: str, ticker: str, days_back: int = 30,
+                         timespan: str = "day") -> int:
+        """How many API calls fetch_data would make right now (0 = fully cached)"""
+        session_range = self._session_range(asset_type, days_back)
+        if session_range is None:
+            return 0
+        multiplier, base = parse_timespan(timespan)
+        formatted = f"{TICKER_PREFIXES[asset_type]}{ticker}"
+        calendar = get_calendar(asset_type)
+        archived = self.archive.read(formatted, timespan, *session_range, calendar) \
+            if self.archive else None
+        if archived is not None:
+            session_range = self._rest_of_range(archived[1], session_range[1], calendar)
+            if session_range is None:
+                return 0
+        return sum(self.client.cached_aggregates(formatted, multiplier, base, start, end) is None
+                   for start, end in plan_chunks(*session_range, base))
     
     def fetch_stock_data(self, ticker: str, days_back: int = 30, 
-                        timespan: str = "day") -> Optional[pd.DataFrame]:
-        # Use yesterday as the end date to ensure data availability
-        to_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        from_date = (datetime.now() - timedelta(days=days_back + 1)).strftime("%Y-%m-%d")
+                        timespan: str = "day", from_date: Optional[str] = None,
+                        to_date: Optional[str] = None) -> Optional[pd.DataFrame]:
+        session_range = self._session_range("stock", days_back, from_date, to_date)
+        if session_range is None:
+            return None
+        from_date, to_date = session_range
         
         print(f"Fetching {ticker} data from {from_date} to {to_date}")
         
-        data = self.client.get_aggregates(
-            ticker=ticker,
-            multiplier=1,
-            timespan=timespan,
-            from_date=from_date,
-            to_date=to_date
-        )
-        
-        if data:
-            return self.client.aggregates_to_dataframe(data)
-        return None
+        return self._fetch_aggregates(ticker, timespan, from_date, to_date, get_calendar("stock"))
     
     def fetch_forex_data(self, ticker: str, days_back: int = 30,
-                        timespan: str = "day") -> Optional[pd.DataFrame]:
-        # Use yesterday as the end date to ensure data availability
-        to_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        from_date = (datetime.now() - timedelta(days=days_back + 1)).strftime("%Y-%m-%d")
+                        timespan: str = "day", from_date: Optional[str] = None,
+                        to_date: Optional[str] = None) -> Optional[pd.DataFrame]:
+        session_range = self._session_range("forex", days_back, from_date, to_date)
+        if session_range is None:
+            return None
+        from_date, to_date = session_range
         
         print(f"Fetching forex {ticker} data from {from_date} to {to_date}")
         
         ticker_formatted = f"C:{ticker}"
         
-        data = self.client.get_forex_aggregates(
-            ticker=ticker_formatted,
-            multiplier=1,
-            timespan=timespan,
+        return self._fetch_aggregates(ticker_formatted, timespan, from_date, to_date,
+                                      get_calendar("forex"))
+    
+    def fetch_crypto_data(self, ticker: str, days_back: int = 30,
+                         timespan: str = "day", from_date: Optional[str] = None,
+                         to_date: Optional[str] = None) -> Optional[pd.DataFrame]:
+        session_range = self._session_range("crypto", days_back, from_date, to_date)
+        if session_range is None:
+            return None
+        from_date, to_date = session_range
+        
+        print(f"Fetching crypto {ticker} data from {from_date} to {to_date}")
+        
+        ticker_formatted = f"X:{ticker}"
+        
+        return self._fetch_aggregates(ticker_formatted, timespan, from_date, to_date,
+                                      get_calendar("crypto"))
+    
+    def fetch_data(self, asset_type: str, ticker: str, days_back: int = 30,
+                   timespan: str = "day", from_date: Optional[str] = None,
+                   to_date: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Fetch bars for any supported asset type"""
+        if asset_type == "stock":
+            return self.fetch_stock_data(ticker, days_back, timespan, from_date, to_date)
+        elif asset_type == "forex":
+            return self.fetch_forex_data(ticker, days_back, timespan, from_date, to_date)
+        elif asset_type == "crypto":
+            return self.fetch_crypto_data(ticker, days_back, timespan, from_date, to_date)
+        raise ValueError(f"Invalid asset type: {asset_type}")
+    
+    def _fetch_aggregates(self, formatted_ticker: str, timespan: str, from_date: str,
+                          to_date: str, calendar=None) -> Optional[pd.DataFrame]:
+        """Bars for a range: the archived part from the bar archive, the rest from the API.
+        
+        Days fetched from the API whose sessions have all ended are archived.
+        """
+        archived = self.archive.read(formatted_ticker, timespan, from_date, to_date, calendar) \
+            if self.archive is not None else None
+        if archived is None:
+            df = self._fetch_range(formatted_ticker, timespan, from_date, to_date, calendar)
+            self._archive_final(formatted_ticker, timespan, df, from_date, to_date, calendar)
+            return df
+        
+        bars, archived_to = archived
+        rest = self._rest_of_range(archived_to, to_date, calendar)
+        if rest is None:
+            return bars.to_dataframe()  # Zero-copy view of the archive
+        tail = self._fetch_range(formatted_ticker, timespan, *rest, calendar)
+        if tail is None:
+            print(f"No bars for {formatted_ticker} after {archived_to}; serving the archived range")
+            return bars.to_dataframe()
+        self._archive_final(formatted_ticker, timespan, tail, *rest, calendar)
+        return pd.concat([bars.to_dataframe(), tail])
+    
+    @staticmethod
+    def _rest_of_range(archived_to: str, to_date: str, calendar=None) -> Optional[Tuple[str, str]]:
+        """The trading days after archived_to up to to_date, or None if there are none"""
+        start = (date.fromisoformat(archived_to) + timedelta(days=1)).isoformat()
+        if start > to_date:
+            return None
+        return calendar.clip_range(start, to_date) if calendar is not None else (start, to_date)
+    
+    def _archive_final(self, formatted_ticker: str, timespan: str, df: Optional[pd.DataFrame],
+                       from_date: str, to_date: str, calendar=None):
+        if self.archive is None or df is None or calendar is None:
+            return
+        final_to = last_final_day(calendar, from_date, to_date)
+        if final_to is None:
+            return
+        coverage = self.archive.coverage(formatted_ticker, timespan)
+        if coverage is not None:
+            # Days without sessions (weekends, holidays) between this range
+            # and the archived one don't break its continuity
+            archived_from, archived_to = (date.fromisoformat(day) for day in coverage)
+            after_archive = (archived_to + timedelta(days=1)).isoformat()
+            before_archive = (archived_from - timedelta(days=1)).isoformat()
+            if after_archive < from_date and calendar.clip_range(
+                    after_archive, (date.fromisoformat(from_date) - timedelta(days=1)).isoformat()) is None:
+                from_date = after_archive
+            if final_to < before_archive and calendar.clip_range(
+                    (date.fromisoformat(final_to) + timedelta(days=1)).isoformat(), before_archive) is None:
+                final_to = before_archive
+        try:
+            self.archive.store(formatted_ticker, timespan, df, from_date, final_to, calendar)
+        except OSError as e:
+            print(f"Could not archive {formatted_ticker} {timespan}: {e}")
+    
+    def _fetch_range(self, formatted_ticker: str, timespan: str, from_date: str,
+                     to_date: str, calendar=None) -> Optional[pd.DataFrame]:
+        """One request for ranges under the result limit, a chunked backfill otherwise.
+        
+        With a calendar, ranges whose sessions have all ended are cached as final.
+        """
+        multiplier, base = parse_timespan(timespan)
+        chunks = plan_chunks(from_date, to_date, base)
+        if len(chunks) > 1:
+            return self._fetch_chunked(formatted_ticker, multiplier, base, chunks, from_date, to_date,
+                                       calendar)
+        
+        data = self.client.get_aggregates(
+            ticker=formatted_ticker,
+            multiplier=multiplier,
+            timespan=base,
             from_date=from_date,
-            to_date=to_date
+            to_date=to_date,
+            final=calendar is not None and calendar.is_final(to_date)
         )
         
         if data:
             return self.client.aggregates_to_dataframe(data)
         return None
     
-    def fetch_crypto_data(self, ticker: str, days_back: int = 30,
-                         timespan: str = "day") -> Optional[pd.DataFrame]:
-        # Use yesterday as the end date to ensure data availability
-        to_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        from_date = (datetime.now() - timedelta(days=days_back + 1)).strftime("%Y-%m-%d")
+    def _fetch_chunked(self, formatted_ticker: str, multiplier: int, timespan: str,
+                       chunks: List[Tuple[str, str]], from_date: str,
+                       to_date: str, calendar=None) -> Optional[pd.DataFrame]:
+        """Fetch chunks in parallel across the key pool and stitch them in order"""
+        responses = [self.client.cached_aggregates(formatted_ticker, multiplier, timespan, start, end)
+                     for start, end in chunks]
+        pending = [i for i, data in enumerate(responses) if data is None]
+        workers = max(1, min(len(pending), len(self.client.api_keys)))
+        print(f"Backfilling {formatted_ticker}: {len(chunks)} chunks, "
+              f"{len(chunks) - len(pending)} cached, fetching {len(pending)} on {workers} workers")
         
-        print(f"Fetching crypto {ticker} data from {from_date} to {to_date}")
+        def fetch_chunk(i):
+            start, end = chunks[i]
+            return self.client.get_aggregates(
+                ticker=formatted_ticker,
+                multiplier=multiplier,
+                timespan=timespan,
+                from_date=start,
+                to_date=end,
+                budget_seconds=self.backfill_budget_seconds,
+                final=calendar is not None and calendar.is_final(end)
+            )
         
-        ticker_formatted = f"X:{ticker}"
+        if pending:
+            # The client's scheduler spreads concurrent requests over the keys;
+            # chunks queue in the caller's priority class and session
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for i, data in zip(pending, pool.map(propagate(fetch_chunk), pending)):
+                    responses[i] = data
+        
+        failed = sum(1 for data in responses if data is None)
+        self.backfill_stats["chunks"] += len(chunks)
+        self.backfill_stats["cached"] += len(chunks) - len(pending)
+        self.backfill_stats["fetched"] += len(pending) - failed
+        self.backfill_stats["failed"] += failed
+        if failed:
+            # A hole in the middle of the series would be silently misleading
+            print(f"Backfill of {formatted_ticker} failed: {failed}/{len(chunks)} chunks missing")
+            return None
+        
+        frames = [self.client.aggregates_to_dataframe(data) for data in responses]
+        frames = [df for df in frames if df is not None]
+        if not frames:
+            return None
+        df = pd.concat(frames)
+        df = df[~df.index.duplicated(keep="last")]
+        return df.loc[from_date:to_date]
+    
+    def fetch_live_bars(self, asset_type: str, ticker: str) -> Optional[pd.DataFrame]:
+        """Today's minute bars for the live view, advanced from snapshots.
+        
+        Each tick fetches only the snapshot and updates the forming candle.
+        The full minute aggregate is refetched only when the minute rolls
+        over (the previous candle is then final) or on the first tick.
+        With a WebSocket stream attached, bars come from the stream instead
+        and the only requests are the periodic history refreshes, for as
+        long as the stream is connected and not stale.
+        """
+        formatted = f"{TICKER_PREFIXES[asset_type]}{ticker}"
+        
+        stream = self.streams.get(asset_type)
+        if stream is not None:
+            stream.subscribe([ticker])
+            if stream.is_fresh(self.stream_stale_seconds):
+                streamed = stream.bars_frame(ticker)
+                if streamed is not None:
+                    return self._with_history(asset_type, ticker, formatted, streamed,
+                                              stream.stats["connected_at"])
+        
+        calendar = get_calendar(asset_type)
+        if not calendar.is_open():
+            return self._closed_session_bars(asset_type, ticker, formatted, calendar)
+        
+        forming = self.client.snapshot_to_bar(self.client.get_snapshot(formatted, asset_type))
+        
+        key = (asset_type, ticker)
+        with self._live_lock:
+            self.live_stats["snapshots"] += 1
+            state = self._live_state.get(key)
+        
+        if forming is None:
+            # Snapshot unavailable (e.g. plan without snapshot access)
+            return self._fetch_live_aggregate(formatted)
+        
+        if state is None or state.get("closed") or state.get("streamed") \
+                or forming["t"] > state["minute"]:
+            bars = self._fetch_live_aggregate(formatted)
+            if bars is None:
+                return None
+            # Anything at or after the forming minute comes from the snapshot
+            cutoff = pd.to_datetime(forming["t"], unit="ms")
+            state = {"bars": bars[bars.index < cutoff], "minute": forming["t"]}
+            with self._live_lock:
+                self._live_state[key] = state
+                self.live_stats["aggregate_refetches"] += 1
+        elif forming["t"] < state["minute"]:
+            # Stale snapshot; keep showing what we have
+            forming = None
+        
+        if forming is None:
+            return state["bars"]
+        
+        row = pd.DataFrame(
+            {column: [forming[column]] for column in
+             ["open", "high", "low", "close", "volume", "vwap", "transactions"]},
+            index=pd.DatetimeIndex([pd.to_datetime(forming["t"], unit="ms")], name="datetime")
+        )
+        return pd.concat([state["bars"], row])
+    
+    def _closed_session_bars(self, asset_type: str, ticker: str, formatted: str,
+                             calendar) -> Optional[pd.DataFrame]:
+        """The last session's minute bars while the market is closed.
+        
+        They can't change until the next open, so they are fetched once
+        (through the cache, as final once settled) and then served without
+        any request on every tick.
+        """
+        key = (asset_type, ticker)
+        session = calendar.last_session()
+        with self._live_lock:
+            state = self._live_state.get(key)
+            if state is not None and state.get("closed") == session:
+                self.live_stats["closed_skips"] += 1
+                return state["bars"]
         
-        data = self.client.get_crypto_aggregates(
-            ticker=ticker_formatted,
+        day = session.isoformat()
+        bars = self._fetch_aggregates(formatted, "minute", day, day, calendar)
+        if bars is None or bars.empty:
+            return None
+        with self._live_lock:
+            self._live_state[key] = {"bars": bars, "minute": int(bars.index[-1].value // 1_000_000),
+                                     "closed": session}
+        return bars
+    
+    def _with_history(self, asset_type: str, ticker: str, formatted: str,
+                      streamed: pd.DataFrame, connected_at: float) -> pd.DataFrame:
+        """Streamed bars, with aggregate history wherever the stream has none.
+        
+        History is refetched every live_history_seconds, when the stream
+        moves into a new day and after it reconnects (the bars it missed
+        meanwhile come from history), so a live view left open doesn't go
+        stale.
+        """
+        key = (asset_type, ticker)
+        day = streamed.index[-1].normalize()
+        with self._live_lock:
+            state = self._live_state.get(key)
+        if state is None or state.get("streamed") != connected_at or state.get("day") != day or \
+                time.time() - state.get("fetched_at", 0.0) >= self.live_history_seconds:
+            bars = self._fetch_live_aggregate(formatted)
+            if bars is not None:
+                state = {"bars": bars, "minute": int(streamed.index[-1].value // 1_000_000),
+                         "day": day, "fetched_at": time.time(), "streamed": connected_at}
+                with self._live_lock:
+                    self._live_state[key] = state
+                    self.live_stats["aggregate_refetches"] += 1
+            elif state is None or not state.get("streamed"):
+                return streamed
+        history = state["bars"]
+        return pd.concat([history[~history.index.isin(streamed.index)], streamed]).sort_index()
+    
+    def _fetch_live_aggregate(self, formatted_ticker: str) -> Optional[pd.DataFrame]:
+        """Minute bars from yesterday through today, bypassing the cache"""
+        to_date = datetime.now().strftime("%Y-%m-%d")
+        from_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        data = self.client.get_aggregates(
+            ticker=formatted_ticker,
             multiplier=1,
-            timespan=timespan,
+            timespan="minute",
             from_date=from_date,
-            to_date=to_date
+            to_date=to_date,
+            use_cache=False
         )
-        
         if data:
             return self.client.aggregates_to_dataframe(data)
         return None
     
+    def fetch_multiple(self, asset_type: str, tickers: List[str], days_back: int = 30,
+                       timespan: str = "day") -> Dict[str, pd.DataFrame]:
+        results = {}
+        
+        # Cache hits return immediately; misses share the key pool in parallel
+        workers = max(1, min(len(tickers), len(self.client.api_keys)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            frames = pool.map(propagate(lambda t: self.fetch_data(asset_type, t, days_back, timespan)),
+                              tickers)
+            for ticker, df in zip(tickers, frames):
+                if df is not None and not df.empty:
+                    results[ticker] = df
+                else:
+                    print(f"Failed to fetch data for {ticker}")
+        
+        return results
+    
     def fetch_multiple_stocks(self, tickers: List[str], days_back: int = 30,
                             timespan: str = "day") -> Dict[str, pd.DataFrame]:
         results = {}
@@ -87,33 +485,4 @@ class DataFetcher:
         return results
     
     def calculate_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
-        
-        df['SMA_20'] = df['close'].rolling(window=20, min_periods=1).mean()
-        df['SMA_50'] = df['close'].rolling(window=50, min_periods=1).mean()
-        
-        df['EMA_12'] = df['close'].ewm(span=12, adjust=False).mean()
-        df['EMA_26'] = df['close'].ewm(span=26, adjust=False).mean()
-        
-        df['MACD'] = df['EMA_12'] - df['EMA_26']
-        df['MACD_signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        df['MACD_histogram'] = df['MACD'] - df['MACD_signal']
-        
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        high_low = df['high'] - df['low']
-        high_close = abs(df['high'] - df['close'].shift())
-        low_close = abs(df['low'] - df['close'].shift())
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        df['ATR'] = true_range.rolling(window=14).mean()
-        
-        df['BB_middle'] = df['close'].rolling(window=20).mean()
-        bb_std = df['close'].rolling(window=20).std()
-        df['BB_upper'] = df['BB_middle'] + (bb_std * 2)
-        df['BB_lower'] = df['BB_middle'] - (bb_std * 2)
-        
-        return df
\ No newline at end of file
+        return calculate_technical_indicators(df)
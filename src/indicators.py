@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from profiling import profiled
+
+# Bar columns every frame already has; indicators may depend on them freely
+BASE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# name -> {"depends": (...), "compute": fn(columns) -> Series}. Names starting
+# with "_" are intermediates: computed when needed, never added to frames.
+INDICATORS = {}
+
+
+def indicator(name: str, *depends: str):
+    """Register fn(columns) -> Series as an indicator.
+
+    `columns` maps every name in `depends` (bar columns or other
+    indicators) to its Series.
+    """
+    def register(compute: Callable[[Dict[str, pd.Series]], pd.Series]):
+        INDICATORS[name] = {"depends": depends, "compute": compute}
+        return compute
+    return register
+
+
+@indicator("SMA_20", "close")
+def _sma_20(c):
+    return c["close"].rolling(window=20, min_periods=1).mean()
+
+
+@indicator("SMA_50", "close")
+def _sma_50(c):
+    return c["close"].rolling(window=50, min_periods=1).mean()
+
+
+@indicator("EMA_12", "close")
+def _ema_12(c):
+    return c["close"].ewm(span=12, adjust=False).mean()
+
+
+@indicator("EMA_26", "close")
+def _ema_26(c):
+    return c["close"].ewm(span=26, adjust=False).mean()
+
+
+@indicator("MACD", "EMA_12", "EMA_26")
+def _macd(c):
+    return c["EMA_12"] - c["EMA_26"]
+
+
+@indicator("MACD_signal", "MACD")
+def _macd_signal(c):
+    return c["MACD"].ewm(span=9, adjust=False).mean()
+
+
+@indicator("MACD_histogram", "MACD", "MACD_signal")
+def _macd_histogram(c):
+    return c["MACD"] - c["MACD_signal"]
+
+
+@indicator("RSI", "close")
+def _rsi(c):
+    delta = c["close"].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+@indicator("ATR", "high", "low", "close")
+def _atr(c):
+    high_low = c["high"] - c["low"]
+    high_close = abs(c["high"] - c["close"].shift())
+    low_close = abs(c["low"] - c["close"].shift())
+    true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+    return true_range.rolling(window=14).mean()
+
+
+@indicator("BB_middle", "close")
+def _bb_middle(c):
+    return c["close"].rolling(window=20).mean()
+
+
+@indicator("_BB_std", "close")
+def _bb_std(c):
+    return c["close"].rolling(window=20).std()
+
+
+@indicator("BB_upper", "BB_middle", "_BB_std")
+def _bb_upper(c):
+    return c["BB_middle"] + (c["_BB_std"] * 2)
+
+
+@indicator("BB_lower", "BB_middle", "_BB_std")
+def _bb_lower(c):
+    return c["BB_middle"] - (c["_BB_std"] * 2)
+
+
+def public_indicators() -> List[str]:
+    return [name for name in INDICATORS if not name.startswith("_")]
+
+
+def resolve(columns: Iterable[str]) -> List[str]:
+    """The indicators needed for `columns`, dependencies first"""
+    order, visiting = [], set()
+
+    def visit(name):
+        if name in BASE_COLUMNS or name in order:
+            return
+        if name not in INDICATORS:
+            raise KeyError(f"Unknown indicator: {name}")
+        if name in visiting:
+            raise ValueError(f"Indicator dependency cycle at {name}")
+        visiting.add(name)
+        for dependency in INDICATORS[name]["depends"]:
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in columns:
+        visit(name)
+    return order
+
+
+class IndicatorEngine:
+    """Computes requested indicator columns, memoized per data version.
+
+    Only the requested columns and their dependencies are evaluated; each
+    series is kept per version, so asking for more columns of the same data
+    later computes just the missing ones.
+    """
+
+    def __init__(self, max_versions: int = 64):
+        self.max_versions = max_versions
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    @profiled
+    def compute(self, df: pd.DataFrame, columns: Optional[Iterable[str]] = None,
+                version=None) -> pd.DataFrame:
+        """df plus the requested indicators (all public ones when columns is None)"""
+        wanted = public_indicators() if columns is None else [c for c in columns if c not in df.columns]
+        if version is None:
+            series = {}
+        else:
+            with self._lock:
+                series = self._versions.setdefault(version, {})
+                self._versions.move_to_end(version)
+                while len(self._versions) > self.max_versions:
+                    self._versions.popitem(last=False)
+
+        order = resolve(wanted)
+        for name in order:
+            if name not in series:
+                spec = INDICATORS[name]
+                inputs = {dep: series[dep] if dep in series else df[dep] for dep in spec["depends"]}
+                series[name] = spec["compute"](inputs)
+                self.computed += 1
+
+        added = {name: series[name] for name in order if not name.startswith("_")}
+        if not added:
+            return df
+        return pd.DataFrame({**{column: df[column] for column in df.columns}, **added},
+                            index=df.index, copy=False)
+
+
+def compute_indicators(df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """One-off, unmemoized evaluation"""
+    return IndicatorEngine(max_versions=0).compute(df, columns)
@@ -0,0 +1,101 @@
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+import psutil
+from dash import DiskcacheManager
+from dash.background_callback.managers.diskcache_manager import _make_job_fn
+
+_job = ContextVar("background_job", default=None)
+
+
+class JobCancelled(BaseException):
+    """Raised from set_progress once the job's callback has been superseded.
+
+    A BaseException, so callbacks' `except Exception` error handlers don't
+    turn it into an error result."""
+
+
+class ThreadedJobManager(DiskcacheManager):
+    """Dash background callbacks run on a thread pool in the server process.
+
+    DiskcacheManager forks a process per job, and each job then works on
+    private copies of the key scheduler, request queues, caches and memo
+    tables that are thrown away when it exits. Here jobs share them with
+    the rest of the server, while results, progress and cancellation still
+    go through the diskcache, so any worker process can answer a poll.
+
+    Threads can't be killed: cancelling a job flags it, and the job stops
+    at its next set_progress call (the render pipeline reports each stage).
+    """
+
+    def __init__(self, cache, max_workers: int = 8, expire=None):
+        super().__init__(cache, expire=expire)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dash-job")
+        # Job ids only need to be unique across the processes sharing the cache
+        self._ids = itertools.count(os.getpid() << 32)
+
+    @staticmethod
+    def _running_key(job) -> str:
+        return f"job-{job}-running"
+
+    @staticmethod
+    def _cancel_key(job) -> str:
+        return f"job-{job}-cancel"
+
+    def cancelled(self, job) -> bool:
+        return job is not None and self.handle.get(self._cancel_key(job)) is not None
+
+    def make_job_fn(self, fn, progress, key=None):
+        def job_callback(*args, **kwargs):
+            if progress:
+                set_progress, job = args[0], _job.get()
+
+                def checked_progress(value):
+                    if self.cancelled(job):
+                        raise JobCancelled()
+                    set_progress(value)
+                args = (checked_progress,) + args[1:]
+            return fn(*args, **kwargs)
+        return _make_job_fn(job_callback, self.handle, progress)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = next(self._ids)
+        self.handle.set(self._running_key(job), os.getpid())
+        self._pool.submit(self._run, job, job_fn, key, args, context)
+        return job
+
+    def _run(self, job, job_fn, key, args, context):
+        _job.set(job)
+        try:
+            if not self.cancelled(job):
+                job_fn(key, self._make_progress_key(key), args, context)
+        except JobCancelled:
+            pass
+        finally:
+            if self.cancelled(job):
+                # Superseded: nobody polls for what it left behind
+                self.clear_cache_entry(key)
+                self.clear_cache_entry(self._make_progress_key(key))
+            self.handle.delete(self._running_key(job))
+            self.handle.delete(self._cancel_key(job))
+
+    def terminate_job(self, job):
+        # Also called once a finished job's result has been read
+        if job is not None and self.job_running(job):
+            self.handle.set(self._cancel_key(job), True, expire=3600)
+
+    def terminate_unhealthy_job(self, job):
+        pid = self.handle.get(self._running_key(job))
+        if pid is not None and not psutil.pid_exists(pid):
+            # The worker process that ran it is gone
+            self.handle.delete(self._running_key(job))
+            return True
+        return False
+
+    def job_running(self, job):
+        if job is None:
+            return False
+        pid = self.handle.get(self._running_key(job))
+        return pid is not None and psutil.pid_exists(pid)
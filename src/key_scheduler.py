@@ -0,0 +1,182 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+
+def parse_retry_after(value, default: float = 60.0) -> float:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return default
+
+
+class CircuitBreaker:
+    """Per-key circuit breaker (closed -> open -> half-open -> closed).
+
+    Not thread-safe on its own; KeyScheduler guards it with its lock.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.probe_in_flight = False
+
+    def available_at(self, now: float) -> float:
+        """Earliest time this breaker lets a request through"""
+        if self.state == self.OPEN:
+            return max(now, self.open_until)
+        if self.state == self.HALF_OPEN and self.probe_in_flight:
+            # Only one probe at a time; wait for it to resolve
+            return float("inf")
+        return now
+
+    def on_dispatch(self, now: float):
+        if self.state == self.OPEN and now >= self.open_until:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.open_until = now + self.reset_timeout
+
+    def trip(self, now: float):
+        """Open at once, whatever the failure count (e.g. a revoked key)"""
+        self.failures = max(self.failures + 1, self.failure_threshold)
+        self.probe_in_flight = False
+        self.state = self.OPEN
+        self.open_until = now + self.reset_timeout
+
+    def release_probe(self):
+        """The probe got an answer that says nothing about key health (e.g. 429)
+        or was never sent"""
+        self.probe_in_flight = False
+
+
+class KeyScheduler:
+    """Thread-safe rate-limit and health scheduling for a pool of API keys.
+
+    Each key has a next-free time (rate limit, Retry-After cooldowns and
+    jittered backoff after errors all push it forward) and a circuit breaker.
+    Callers reserve a slot with a deadline and get None back instead of
+    blocking when no key can serve them in time.
+    """
+
+    def __init__(self, key_count: int, min_interval: float,
+                 failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 backoff_base: float = 1.0, backoff_cap: float = 20.0):
+        self.key_count = key_count
+        self.min_interval = min_interval
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.next_free = [0.0] * key_count
+        self.breakers = [CircuitBreaker(failure_threshold, reset_timeout)
+                         for _ in range(key_count)]
+        self.current_index = 0
+        self._lock = threading.Lock()
+
+    def _ready_at(self, index: int, now: float) -> float:
+        return max(now, self.next_free[index], self.breakers[index].available_at(now))
+
+    def acquire(self, deadline: Optional[float] = None) -> Optional[Tuple[int, float]]:
+        """Reserve the key that can serve soonest.
+
+        Returns (key_index, seconds_to_wait), or None if no key can start
+        before the deadline. Nothing is reserved when None is returned.
+        """
+        with self._lock:
+            now = time.time()
+            best_index, best_ready = None, float("inf")
+            # Round-robin starting point keeps the load spread across keys
+            for offset in range(self.key_count):
+                index = (self.current_index + offset) % self.key_count
+                ready_at = self._ready_at(index, now)
+                if ready_at < best_ready:
+                    best_index, best_ready = index, ready_at
+                if ready_at <= now:
+                    break
+
+            if best_index is None or (deadline is not None and best_ready > deadline):
+                return None
+
+            self.next_free[best_index] = best_ready + self.min_interval
+            self.breakers[best_index].on_dispatch(best_ready)
+            self.current_index = (best_index + 1) % self.key_count
+            return best_index, best_ready - now
+
+    def estimated_wait(self, keys: int = 1) -> float:
+        """Seconds until the soonest key (or `keys` keys) could serve a new request"""
+        with self._lock:
+            now = time.time()
+            if keys > self.key_count:
+                return float("inf")
+            return sorted(self._ready_at(i, now) for i in range(self.key_count))[keys - 1] - now
+
+    def ready_count(self) -> int:
+        """How many keys could serve a request right now"""
+        with self._lock:
+            now = time.time()
+            return sum(1 for i in range(self.key_count) if self._ready_at(i, now) <= now)
+
+    def release(self, index: int):
+        """Give back a reservation that was never sent, so a half-open key's
+        probe slot doesn't stay taken"""
+        with self._lock:
+            self.breakers[index].release_probe()
+
+    def record_success(self, index: int):
+        with self._lock:
+            self.breakers[index].record_success()
+
+    def record_failure(self, index: int) -> float:
+        """Count an error against a key and back it off with full jitter"""
+        with self._lock:
+            now = time.time()
+            breaker = self.breakers[index]
+            breaker.record_failure(now)
+            ceiling = min(self.backoff_cap, self.backoff_base * (2 ** (breaker.failures - 1)))
+            backoff = random.uniform(0, ceiling)
+            self.next_free[index] = max(self.next_free[index], now + backoff)
+            return backoff
+
+    def record_rejected_key(self, index: int):
+        """The API refused the key itself (401/403): take it out of rotation
+        until its breaker lets a probe through"""
+        with self._lock:
+            self.breakers[index].trip(time.time())
+
+    def record_rate_limited(self, index: int, retry_after: float):
+        """Honor a 429 Retry-After, with a little jitter so keys don't resync"""
+        with self._lock:
+            now = time.time()
+            self.breakers[index].release_probe()
+            cooldown = retry_after * random.uniform(1.0, 1.1)
+            self.next_free[index] = max(self.next_free[index], now + cooldown)
+
+    def states(self) -> List[str]:
+        with self._lock:
+            return [breaker.state for breaker in self.breakers]
@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Blueprint, Response, stream_with_context
+
+
+class _Feed:
+    """Latest computed result for one (asset type, ticker), plus its watchers"""
+
+    def __init__(self):
+        self.version = 0
+        self.payload = None
+        self.updated_at = 0.0
+        self.leases = {}          # session id -> lease expiry
+        self.thread = None
+        self.refresh_lock = threading.Lock()
+        self.wake = threading.Event()
+
+
+class LiveHub:
+    """One live poller per watched (asset type, ticker), shared by all sessions.
+
+    Sessions subscribe with a lease that they renew on every read; a poller
+    thread fetches and computes once per interval and publishes a new
+    version, and stops as soon as no session holds a live lease. With
+    threaded=False (serverless) there are no threads: the first reader
+    after the interval refreshes inline and everyone else reuses the result.
+    unchanged(old, new) lets a refresh that produced the same data keep the
+    current version. refresh(key) brings a poller's next compute forward
+    (e.g. when a stream has new bars), at most once per min_refresh_seconds.
+    """
+
+    def __init__(self, compute: Callable[[str, str], Any], interval_seconds: float = 10.0,
+                 lease_seconds: Optional[float] = None, threaded: bool = True,
+                 unchanged: Optional[Callable[[Any, Any], bool]] = None,
+                 min_refresh_seconds: float = 1.0):
+        self.compute = compute
+        self.unchanged = unchanged
+        self.interval_seconds = interval_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.lease_seconds = lease_seconds or interval_seconds * 3
+        self.threaded = threaded
+        self._feeds: Dict[Tuple[str, str], _Feed] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.stats = {"computes": 0, "pollers_started": 0, "pollers_stopped": 0}
+
+    def subscribe(self, key: Tuple[str, str], session_id: str):
+        """Take or renew a lease on a feed, starting its poller if needed"""
+        with self._lock:
+            feed = self._feeds.setdefault(key, _Feed())
+            feed.leases[session_id] = time.time() + self.lease_seconds
+            if self.threaded and feed.thread is None:
+                feed.thread = threading.Thread(target=self._poll, args=(key, feed), daemon=True)
+                self.stats["pollers_started"] += 1
+                feed.thread.start()
+
+    def unsubscribe(self, key: Tuple[str, str], session_id: str):
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is not None:
+                feed.leases.pop(session_id, None)
+
+    def refresh(self, key: Tuple[str, str]):
+        """Recompute a watched feed now rather than at its next interval"""
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is not None:
+                feed.wake.set()
+
+    def watchers(self, key: Tuple[str, str]) -> int:
+        with self._lock:
+            feed = self._feeds.get(key)
+            return len(feed.leases) if feed else 0
+
+    def latest(self, key: Tuple[str, str]) -> Tuple[int, Any]:
+        """(version, payload) of the newest result; version 0 means none yet"""
+        if not self.threaded:
+            self._refresh_if_stale(key)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is None:
+                return 0, None
+            return feed.version, feed.payload
+
+    def wait_for_update(self, key: Tuple[str, str], since_version: int,
+                        timeout: float) -> Tuple[int, Any]:
+        """Block until the feed moves past since_version or the timeout expires"""
+        if not self.threaded:
+            return self.latest(key)
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                feed = self._feeds.get(key)
+                if feed is not None and feed.version > since_version:
+                    return feed.version, feed.payload
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return (feed.version, feed.payload) if feed else (0, None)
+                self._changed.wait(remaining)
+
+    def _publish(self, feed: _Feed, payload: Any):
+        with self._changed:
+            feed.version += 1
+            feed.payload = payload
+            feed.updated_at = time.time()
+            self.stats["computes"] += 1
+            self._changed.notify_all()
+
+    def _run_compute(self, key: Tuple[str, str], feed: _Feed):
+        try:
+            payload = self.compute(*key)
+        except Exception as e:
+            print(f"Live feed {key} failed: {e}")
+            return
+        if payload is None:
+            return
+        if self.unchanged is not None and feed.payload is not None \
+                and self.unchanged(feed.payload, payload):
+            # Same data as before (e.g. market closed): no new version for readers
+            with self._lock:
+                feed.updated_at = time.time()
+            return
+        self._publish(feed, payload)
+
+    def _poll(self, key: Tuple[str, str], feed: _Feed):
+        while True:
+            with self._lock:
+                now = time.time()
+                for session_id, expiry in list(feed.leases.items()):
+                    if expiry < now:
+                        del feed.leases[session_id]
+                if not feed.leases:
+                    # Nobody is watching: shut the poller down
+                    feed.thread = None
+                    self._feeds.pop(key, None)
+                    self.stats["pollers_stopped"] += 1
+                    return
+            started = time.time()
+            feed.wake.clear()
+            self._run_compute(key, feed)
+            feed.wake.wait(max(0.0, self.interval_seconds - (time.time() - started)))
+            time.sleep(max(0.0, min(self.min_refresh_seconds, self.interval_seconds)
+                           - (time.time() - started)))
+
+    def _refresh_if_stale(self, key: Tuple[str, str]):
+        with self._lock:
+            feed = self._feeds.setdefault(key, _Feed())
+        if time.time() - feed.updated_at < self.interval_seconds:
+            return
+        # Single flight: concurrent readers wait for one refresh instead of
+        # each computing their own
+        with feed.refresh_lock:
+            if time.time() - feed.updated_at >= self.interval_seconds:
+                self._run_compute(key, feed)
+
+
+def create_live_blueprint(hub: LiveHub, serialize: Callable[[Any], Dict],
+                          keepalive_seconds: float = 15.0) -> Blueprint:
+    """Server-sent events for a live feed: GET /live/stream/<asset_type>/<ticker>
+
+    Each event is {"version": n, ...serialize(payload)}. The open stream
+    holds a lease, so the poller keeps running while anyone is connected.
+    """
+    live = Blueprint("live_hub", __name__, url_prefix="/live")
+
+    @live.route("/stream/<asset_type>/<ticker>")
+    def stream(asset_type, ticker):
+        key = (asset_type, ticker.upper())
+        session_id = f"sse-{uuid.uuid4().hex}"
+
+        def events():
+            version = 0
+            try:
+                while True:
+                    hub.subscribe(key, session_id)
+                    new_version, payload = hub.wait_for_update(key, version, keepalive_seconds)
+                    if new_version > version and payload is not None:
+                        version = new_version
+                        data = {"version": version, **serialize(payload)}
+                        yield f"id: {version}\ndata: {json.dumps(data)}\n\n"
+                    else:
+                        yield ": keep-alive\n\n"
+            finally:
+                hub.unsubscribe(key, session_id)
+
+        response = Response(stream_with_context(events()), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-store"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    return live
@@ -0,0 +1,235 @@
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# US equity hours in Eastern time. Polygon's minute aggregates include the
+# extended sessions, so data keeps changing from pre-market to post-market.
+EQUITY_HOURS = {
+    "premarket": dtime(4, 0),
+    "open": dtime(9, 30),
+    "close": dtime(16, 0),
+    "postmarket": dtime(20, 0),
+}
+EARLY_CLOSE_HOURS = {"close": dtime(13, 0), "postmarket": dtime(17, 0)}
+
+# Forex trades from Sunday 17:00 to Friday 17:00 Eastern
+FOREX_WEEK = {"open": (6, dtime(17, 0)), "close": (4, dtime(17, 0))}
+
+# One-off NYSE closures the holiday rules can't produce
+SPECIAL_CLOSURES = {
+    date(2012, 10, 29): "Hurricane Sandy",
+    date(2012, 10, 30): "Hurricane Sandy",
+    date(2018, 12, 5): "National Day of Mourning (George H. W. Bush)",
+    date(2025, 1, 9): "National Day of Mourning (Jimmy Carter)",
+}
+
+# How long after a session ends before its bars count as final; Polygon
+# may still correct late prints shortly after the close
+SETTLE_MINUTES = 60
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th (1-based) weekday of a month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays move to Friday, Sunday holidays to Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def us_equity_holidays(year: int) -> Dict[date, str]:
+    """NYSE full-day holidays for a year"""
+    holidays = {
+        _nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+        _easter(year) - timedelta(days=2): "Good Friday",
+        _nth_weekday(year, 5, 0, -1): "Memorial Day",
+        _observed(date(year, 7, 4)): "Independence Day",
+        _nth_weekday(year, 9, 0, 1): "Labor Day",
+        _nth_weekday(year, 11, 3, 4): "Thanksgiving Day",
+        _observed(date(year, 12, 25)): "Christmas Day",
+    }
+    # A Saturday New Year's Day is not observed on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+    if year >= 1998:
+        holidays[_nth_weekday(year, 1, 0, 3)] = "Martin Luther King Jr. Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth"
+    holidays.update({day: name for day, name in SPECIAL_CLOSURES.items() if day.year == year})
+    return holidays
+
+
+@lru_cache(maxsize=None)
+def us_equity_early_closes(year: int) -> Dict[date, str]:
+    """Days the NYSE closes at 13:00 Eastern"""
+    early = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1): "Day after Thanksgiving"}
+    july_3 = date(year, 7, 3)
+    if july_3.weekday() < 5 and _observed(date(year, 7, 4)) != july_3:
+        early[july_3] = "Independence Day eve"
+    christmas_eve = date(year, 12, 24)
+    if christmas_eve.weekday() < 5:
+        early[christmas_eve] = "Christmas Eve"
+    return early
+
+
+def _eastern_offset(utc: datetime) -> timedelta:
+    """UTC offset of US Eastern time: DST from the second Sunday of March
+    (2:00 local) to the first Sunday of November (2:00 local)"""
+    year = utc.year
+    dst_start = datetime.combine(_nth_weekday(year, 3, 6, 2), dtime(7, 0))   # 2:00 EST
+    dst_end = datetime.combine(_nth_weekday(year, 11, 6, 1), dtime(6, 0))    # 2:00 EDT
+    naive = utc.replace(tzinfo=None)
+    return timedelta(hours=-4) if dst_start <= naive < dst_end else timedelta(hours=-5)
+
+
+def to_eastern(at: datetime) -> datetime:
+    """Naive Eastern wall-clock time for an aware (or naive UTC) datetime"""
+    utc = at.astimezone(timezone.utc) if at.tzinfo else at.replace(tzinfo=timezone.utc)
+    return (utc + _eastern_offset(utc)).replace(tzinfo=None)
+
+
+def from_eastern(local: datetime) -> datetime:
+    """Aware UTC datetime for a naive Eastern wall-clock time"""
+    guess = local.replace(tzinfo=timezone.utc) + timedelta(hours=5)
+    return local.replace(tzinfo=timezone.utc) - _eastern_offset(guess)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class MarketCalendar:
+    """Trading days and hours for one asset type.
+
+    stock: NYSE holidays and early closes, extended hours; forex: 24/5 from
+    Sunday to Friday 17:00 Eastern; crypto: always open. Dates are Eastern
+    calendar days, except crypto's, which are UTC days.
+    """
+
+    def __init__(self, asset_type: str):
+        if asset_type not in ("stock", "forex", "crypto"):
+            raise ValueError(f"Invalid asset type: {asset_type}")
+        self.asset_type = asset_type
+
+    def _local(self, at: Optional[datetime]) -> datetime:
+        at = at or _now()
+        if self.asset_type == "crypto":
+            return (at.astimezone(timezone.utc) if at.tzinfo else at).replace(tzinfo=None)
+        return to_eastern(at)
+
+    def is_trading_day(self, day: date) -> bool:
+        if self.asset_type == "crypto":
+            return True
+        if self.asset_type == "forex":
+            return day.weekday() != 5  # Sunday evening opens the week
+        return day.weekday() < 5 and day not in us_equity_holidays(day.year)
+
+    def session_start(self, day: date) -> datetime:
+        """When bars dated `day` start, as an aware UTC datetime"""
+        if self.asset_type == "crypto":
+            return datetime.combine(day, dtime(0), tzinfo=timezone.utc)
+        if self.asset_type == "forex":
+            if day.weekday() == 6:
+                return from_eastern(datetime.combine(day, FOREX_WEEK["open"][1]))
+            return from_eastern(datetime.combine(day, dtime(0)))
+        return from_eastern(datetime.combine(day, EQUITY_HOURS["premarket"]))
+
+    def session_end(self, day: date) -> datetime:
+        """When bars dated `day` stop changing, as an aware UTC datetime"""
+        if self.asset_type == "crypto":
+            return datetime.combine(day + timedelta(days=1), dtime(0), tzinfo=timezone.utc)
+        if self.asset_type == "forex":
+            if day.weekday() == 4:
+                return from_eastern(datetime.combine(day, FOREX_WEEK["close"][1]))
+            return from_eastern(datetime.combine(day + timedelta(days=1), dtime(0)))
+        hours = EARLY_CLOSE_HOURS if day in us_equity_early_closes(day.year) else EQUITY_HOURS
+        return from_eastern(datetime.combine(day, hours["postmarket"]))
+
+    def is_open(self, at: Optional[datetime] = None) -> bool:
+        """Whether new data can be arriving now (extended hours for stocks)"""
+        local = self._local(at)
+        if self.asset_type == "crypto":
+            return True
+        if self.asset_type == "forex":
+            weekday, clock = local.weekday(), local.time()
+            if weekday == 5:
+                return False
+            if weekday == 6:
+                return clock >= FOREX_WEEK["open"][1]
+            if weekday == 4:
+                return clock < FOREX_WEEK["close"][1]
+            return True
+        day = local.date()
+        if not self.is_trading_day(day):
+            return False
+        hours = EARLY_CLOSE_HOURS if day in us_equity_early_closes(day.year) else EQUITY_HOURS
+        return EQUITY_HOURS["premarket"] <= local.time() < hours["postmarket"]
+
+    def previous_trading_day(self, day: date) -> date:
+        """The latest trading day on or before `day`"""
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def next_trading_day(self, day: date) -> date:
+        """The earliest trading day on or after `day`"""
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def last_session(self, at: Optional[datetime] = None) -> date:
+        """The trading day whose bars are the most recent ones available"""
+        local = self._local(at)
+        day = local.date()
+        if self.asset_type == "stock" and self.is_trading_day(day) \
+                and local.time() < EQUITY_HOURS["premarket"]:
+            day -= timedelta(days=1)
+        elif self.asset_type == "forex" and day.weekday() == 6 and local.time() < FOREX_WEEK["open"][1]:
+            day -= timedelta(days=2)
+        return self.previous_trading_day(day)
+
+    def clip_range(self, from_date: str, to_date: str) -> Optional[Tuple[str, str]]:
+        """Shrink [from_date, to_date] to its first and last trading days;
+        None when the range holds no trading day at all"""
+        start = self.next_trading_day(date.fromisoformat(from_date))
+        end = self.previous_trading_day(date.fromisoformat(to_date))
+        if start > end:
+            return None
+        return start.isoformat(), end.isoformat()
+
+    def is_final(self, to_date: str, at: Optional[datetime] = None) -> bool:
+        """Whether bars through to_date can no longer change"""
+        end = self.session_end(date.fromisoformat(to_date))
+        return (at or _now()) >= end + timedelta(minutes=SETTLE_MINUTES)
+
+
+CALENDARS = {asset_type: MarketCalendar(asset_type) for asset_type in ("stock", "forex", "crypto")}
+
+
+def get_calendar(asset_type: str) -> MarketCalendar:
+    return CALENDARS[asset_type]
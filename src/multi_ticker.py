@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class AlignedPanel:
+    """Close prices of several tickers on one shared timestamp index.
+
+    `values` is a (rows, tickers) float64 array; `timestamps` holds epoch
+    nanoseconds for each row.
+    """
+
+    def __init__(self, timestamps: np.ndarray, tickers: List[str], values: np.ndarray):
+        self.timestamps = timestamps
+        self.tickers = tickers
+        self.values = values
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def to_frame(self) -> pd.DataFrame:
+        index = pd.DatetimeIndex(self.timestamps.view("datetime64[ns]"), name="datetime")
+        return pd.DataFrame(self.values, index=index, columns=self.tickers)
+
+
+def _epoch_ns(index: pd.Index) -> np.ndarray:
+    return np.asarray(index.values.astype("datetime64[ns]")).view("i8")
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """Column-wise forward fill of NaNs, without a Python loop over rows"""
+    rows = np.arange(values.shape[0])[:, None]
+    last_valid = np.where(np.isnan(values), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return values[last_valid, np.arange(values.shape[1])]
+
+
+def align_closes(data_dict: Dict[str, pd.DataFrame], fill: str = "ffill",
+                 column: str = "close") -> AlignedPanel:
+    """Align each ticker's closes onto the union of all timestamps.
+
+    fill="ffill" carries the last close forward over a ticker's missing bars
+    and drops the leading rows before every ticker has traded; fill="drop"
+    keeps only timestamps where every ticker has a bar.
+    """
+    tickers = sorted(data_dict)
+    stamps = [_epoch_ns(data_dict[ticker].index) for ticker in tickers]
+    timestamps = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype="i8")
+
+    values = np.full((len(timestamps), len(tickers)), np.nan)
+    for col, (ticker, ts) in enumerate(zip(tickers, stamps)):
+        values[np.searchsorted(timestamps, ts), col] = data_dict[ticker][column].to_numpy(dtype="f8")
+
+    if fill == "ffill":
+        values = forward_fill(values)
+    complete = ~np.isnan(values).any(axis=1)
+    return AlignedPanel(timestamps[complete], tickers, values[complete])
+
+
+class RollingCorrelation:
+    """Correlation matrix over the last `window` rows, updated incrementally.
+
+    Keeps running sums and cross-products of the rows in the window, so
+    pushing one new bar costs O(tickers^2) instead of recomputing the window.
+    """
+
+    def __init__(self, window: int, n_cols: int, resync_every: Optional[int] = None):
+        self.window = window
+        self.n_cols = n_cols
+        self.buffer = np.empty((window, n_cols))
+        self.count = 0       # Rows currently in the window
+        self.head = 0        # Next slot to overwrite in the ring buffer
+        self.offset = None   # Shift applied to all rows for numerical stability
+        self.sums = np.zeros(n_cols)
+        self.products = np.zeros((n_cols, n_cols))
+        self.resync_every = resync_every or window
+        self._since_resync = 0
+
+    def push(self, rows: np.ndarray):
+        rows = np.atleast_2d(np.asarray(rows, dtype="f8"))
+        if len(rows) >= self.window:
+            self._reset(rows[-self.window:])
+            return
+        if self.offset is None:
+            self.offset = rows[0].copy()
+        rows = rows - self.offset
+
+        slots = (self.head + np.arange(len(rows))) % self.window
+        leaving = max(0, self.count + len(rows) - self.window)
+        if leaving:
+            # The oldest rows in the window are the ones about to be overwritten
+            old = self.buffer[(self.head - self.count + np.arange(leaving)) % self.window]
+            self.sums -= old.sum(axis=0)
+            self.products -= old.T @ old
+        self.buffer[slots] = rows
+        self.sums += rows.sum(axis=0)
+        self.products += rows.T @ rows
+        self.head = (self.head + len(rows)) % self.window
+        self.count = min(self.window, self.count + len(rows))
+
+        # Periodically rebuild the sums so floating-point drift can't accumulate
+        self._since_resync += len(rows)
+        if self._since_resync >= self.resync_every:
+            self._resync()
+
+    def _reset(self, rows: np.ndarray):
+        self.offset = rows[0].copy()
+        self.buffer[:] = rows - self.offset
+        self.count = self.window
+        self.head = 0
+        self._resync()
+
+    def _resync(self):
+        live = self.buffer if self.count == self.window else \
+            self.buffer[(self.head - self.count + np.arange(self.count)) % self.window]
+        self.sums = live.sum(axis=0)
+        self.products = live.T @ live
+        self._since_resync = 0
+
+    def matrix(self) -> np.ndarray:
+        if self.count < 2:
+            return np.full((self.n_cols, self.n_cols), np.nan)
+        mean = self.sums / self.count
+        cov = self.products / self.count - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = cov / np.outer(std, std)
+        return np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationCache:
+    """Rolling correlation state per (ticker set, timeframe, window).
+
+    When the aligned panel only gained rows since the last call, just those
+    rows are pushed; anything else rebuilds the window from the panel.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"updates": 0, "rebuilds": 0}
+
+    def get(self, panel: AlignedPanel, timeframe: str, window: int) -> pd.DataFrame:
+        key = (tuple(panel.tickers), timeframe, window)
+        with self._lock:
+            entry = self._entries.get(key)
+            new_rows = self._new_rows(entry, panel)
+            if new_rows is None:
+                rolling = RollingCorrelation(window, len(panel.tickers))
+                rolling.push(panel.values[-window:])
+                self.stats["rebuilds"] += 1
+            else:
+                rolling = entry["rolling"]
+                self.stats["updates"] += 1
+                if len(new_rows):
+                    rolling.push(new_rows)
+            if len(panel):
+                self._entries[key] = {"rolling": rolling,
+                                      "last_ts": panel.timestamps[-1],
+                                      "last_row": panel.values[-1].copy()}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            matrix = rolling.matrix()
+        return pd.DataFrame(matrix, index=panel.tickers, columns=panel.tickers)
+
+    @staticmethod
+    def _new_rows(entry, panel: AlignedPanel) -> Optional[np.ndarray]:
+        """Rows appended since the entry was stored, or None if it can't be reused"""
+        if entry is None or not len(panel):
+            return None
+        pos = np.searchsorted(panel.timestamps, entry["last_ts"])
+        if pos >= len(panel) or panel.timestamps[pos] != entry["last_ts"]:
+            return None
+        if not np.array_equal(panel.values[pos], entry["last_row"]):
+            # The last bar we saw was revised (e.g. a forming candle)
+            return None
+        return panel.values[pos + 1:]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
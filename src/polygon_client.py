@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 import pandas as pd
 from typing import Optional, Dict, List
@@ -7,6 +8,14 @@ import json
 import os
 from functools import wraps
 import hashlib
+import threading
+import weakref
+from key_scheduler import KeyScheduler, parse_retry_after
+from request_scheduler import RequestScheduler
+from aggregate_bars import AggregateBars
+from cache_backends import FileCacheBackend, SQLiteCacheBackend, describe_url, entry_key
+from cache_snapshot import default_snapshot
+from profiling import profiled
 
 
 def rate_limit(calls_per_minute=5):
@@ -28,7 +37,7 @@ def rate_limit(calls_per_minute=5):
 
 
 class CacheManager:
-    def __init__(self, cache_dir=None, ttl_minutes=5):
+    def __init__(self, cache_dir=None, ttl_minutes=5, backend=None, snapshot=None):
         # Use /tmp in Vercel or serverless environments
         if cache_dir is None:
             if os.environ.get('VERCEL'):
@@ -38,6 +47,10 @@ class CacheManager:
         
         self.cache_dir = cache_dir
         self.ttl_minutes = ttl_minutes
+        self.backend = None
+        # Read-only seed of final entries (see cache_snapshot.py), consulted
+        # on misses; defaults to the CACHE_SNAPSHOT file, False for none
+        self.snapshot = default_snapshot() if snapshot is None else (snapshot or None)
         
         # Try to create cache directory, but don't fail if we can't
         try:
@@ -46,170 +59,298 @@ class CacheManager:
             # If we can't create the directory (e.g., read-only filesystem),
             # we'll just disable caching
             self.cache_dir = None
+            return
+        
+        # "sqlite" (default): one WAL database shared by every worker process;
+        # "file": one JSON file per entry
+        backend = backend or os.environ.get('CACHE_BACKEND', 'sqlite')
+        if backend == 'sqlite':
+            try:
+                self.backend = SQLiteCacheBackend(os.path.join(cache_dir, 'cache.sqlite3'))
+            except Exception as e:
+                print(f"SQLite cache unavailable ({e}), falling back to files")
+        if self.backend is None:
+            self.backend = FileCacheBackend(cache_dir)
     
     def _get_cache_key(self, url, params):
         """Generate a unique cache key from URL and params"""
         key_str = f"{url}_{json.dumps(params, sort_keys=True)}"
-        return hashlib.md5(key_str.encode()).hexdigest()
+        return entry_key(hashlib.md5(key_str.encode()).hexdigest(), describe_url(url))
     
-    def get(self, url, params):
-        """Get cached data if available and not expired"""
-        if self.cache_dir is None:
+    def get(self, url, params, allow_stale=False):
+        """Get cached data if available and not expired (or any age if allow_stale)"""
+        if self.backend is None and self.snapshot is None:
             return None  # Caching disabled
-            
-        cache_key = self._get_cache_key(url, params)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
         
+        key = self._get_cache_key(url, params)
         try:
-            if os.path.exists(cache_file):
-                # Check if cache is still valid
-                file_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-                if datetime.now() - file_time < timedelta(minutes=self.ttl_minutes):
-                    with open(cache_file, 'r') as f:
-                        return json.load(f)
+            entry = self.backend.get(key) if self.backend is not None else None
+            if entry is not None:
+                payload, _, expires_at = entry
+                if allow_stale or expires_at is None or time.time() < expires_at:
+                    return json.loads(payload)
+            if self.snapshot is not None:
+                return self._from_snapshot(key)
         except Exception:
             # If any error occurs reading cache, just return None
             pass
         return None
     
-    def set(self, url, params, data):
-        """Save data to cache"""
-        if self.cache_dir is None:
+    def _from_snapshot(self, key):
+        found = self.snapshot.get(key)
+        if found is None:
+            return None
+        payload, meta = found
+        if self.backend is not None:
+            # Copy it over so the next read skips decompression
+            self.backend.set(key, payload, meta, None)
+        return json.loads(payload)
+    
+    def set(self, url, params, data, final=False):
+        """Save data to cache; final entries (closed ranges) never expire"""
+        if self.backend is None:
             return  # Caching disabled
-            
-        cache_key = self._get_cache_key(url, params)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
         
+        expires_at = None if final else time.time() + self.ttl_minutes * 60
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(data, f)
+            self.backend.set(self._get_cache_key(url, params), json.dumps(data).encode(),
+                             describe_url(url), expires_at)
         except Exception:
             # If we can't write to cache, just continue without caching
             pass
+    
+    def sweep(self, grace_minutes=24 * 60):
+        """Drop entries expired for longer than the grace period (kept until
+        then as a stale fallback for failed requests)"""
+        if self.backend is None:
+            return 0
+        return self.backend.delete_expired(time.time() - grace_minutes * 60)
+    
+    def invalidate(self, ticker=None, timespan=None):
+        """Drop cached responses for one ticker (optionally one timespan);
+        snapshot entries are final and stay"""
+        if self.backend is None:
+            return 0
+        return self.backend.invalidate(ticker, timespan)
+    
+    def clear(self):
+        if self.backend is None:
+            return 0
+        return self.backend.clear()
+
+
+SNAPSHOT_ENDPOINTS = {
+    "stock": "/v2/snapshot/locale/us/markets/stocks/tickers/{ticker}",
+    "forex": "/v2/snapshot/locale/global/markets/forex/tickers/{ticker}",
+    "crypto": "/v2/snapshot/locale/global/markets/crypto/tickers/{ticker}"
+}
+
+# Every live client, so one fork hook can reach them all
+_clients = weakref.WeakSet()
+
+
+def _reopen_sessions_after_fork():
+    for client in list(_clients):
+        client._open_sessions()
+
+
+if hasattr(os, "register_at_fork"):
+    # A forked child (e.g. of a fork-start process pool) sharing the
+    # parent's pooled sockets would interleave two processes' responses
+    os.register_at_fork(after_in_child=_reopen_sessions_after_fork)
 
 
 class PolygonClient:
-    def __init__(self, api_keys, rate_limit_per_minute=5):
+    def __init__(self, api_keys, rate_limit_per_minute=None, max_concurrent_per_key=4,
+                 base_url=None, cache=None,
+                 request_budget_seconds=20.0, request_timeout_seconds=10.0):
         # Support both single key (string) and multiple keys (list)
         if isinstance(api_keys, str):
             self.api_keys = [api_keys]
         else:
             self.api_keys = api_keys
             
-        self.current_key_index = 0
-        self.base_url = "https://api.polygon.io"
-        self.sessions = []
-        
-        # Create a session for each API key
-        for api_key in self.api_keys:
-            session = requests.Session()
-            session.headers.update({
-                "Authorization": f"Bearer {api_key}"
-            })
-            self.sessions.append(session)
+        # Overridable for a local stand-in (see polygon_stub.py and load_test.py)
+        self.base_url = base_url or os.environ.get('POLYGON_BASE_URL', 'https://api.polygon.io')
+        if rate_limit_per_minute is None:
+            rate_limit_per_minute = int(os.environ.get('POLYGON_RATE_LIMIT', 5))
+        self.max_concurrent_per_key = max_concurrent_per_key
+        self._open_sessions()
+        _clients.add(self)
             
-        self.cache = CacheManager()
+        self.cache = cache if cache is not None else CacheManager()
         # Rate limit is per key, so total rate limit is multiplied
         self.rate_limit_per_minute = rate_limit_per_minute * len(self.api_keys)
-        self.last_request_times = [0] * len(self.api_keys)
         self.min_interval = 60.0 / rate_limit_per_minute
         self.request_counts = [0] * len(self.api_keys)  # Track requests per key
         
-    def _get_next_key_index(self):
-        """Get the next API key to use (round-robin with rate limiting check)"""
-        # Try to find a key that hasn't hit rate limit
-        for _ in range(len(self.api_keys)):
-            elapsed = time.time() - self.last_request_times[self.current_key_index]
-            if elapsed >= self.min_interval:
-                return self.current_key_index
-            # Move to next key
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
+        # Default latency budget for a request, including any wait for a key
+        self.request_budget_seconds = request_budget_seconds
+        self.request_timeout_seconds = request_timeout_seconds
         
-        # All keys are rate limited, use the one with longest elapsed time
-        oldest_time_index = 0
-        oldest_time = self.last_request_times[0]
-        for i in range(1, len(self.api_keys)):
-            if self.last_request_times[i] < oldest_time:
-                oldest_time = self.last_request_times[i]
-                oldest_time_index = i
-        
-        self.current_key_index = oldest_time_index
-        return self.current_key_index
+        # Shared by every Dash callback thread: key selection, backoff and
+        # circuit breakers live in the scheduler, counters are only touched
+        # while holding this lock, and each key has a cap on how many
+        # requests may be in flight at once. Every request queues in
+        # self.requests, which hands out keys by priority class
+        self.scheduler = KeyScheduler(len(self.api_keys), self.min_interval)
+        self.requests = RequestScheduler(self.scheduler)
+        self._lock = threading.Lock()
+        self._key_slots = [threading.BoundedSemaphore(max_concurrent_per_key)
+                           for _ in self.api_keys]
     
-    def _wait_if_needed(self, key_index):
-        """Enforce rate limiting for specific key"""
-        elapsed = time.time() - self.last_request_times[key_index]
-        if elapsed < self.min_interval:
-            wait_time = self.min_interval - elapsed
-            print(f"Rate limiting on key {key_index + 1}/{len(self.api_keys)}: waiting {wait_time:.2f} seconds...")
-            time.sleep(wait_time)
+    def _open_sessions(self):
+        """Create a session for each API key, with a pool sized for the number
+        of requests we allow in flight on that key so connections are kept
+        alive instead of being opened and discarded under load"""
+        self.sessions = []
+        for api_key in self.api_keys:
+            session = requests.Session()
+            session.headers.update({
+                "Authorization": f"Bearer {api_key}",
+                "Connection": "keep-alive"
+            })
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self.max_concurrent_per_key,
+                pool_block=True
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self.sessions.append(session)
+    
+    def estimated_wait(self) -> float:
+        """Seconds until any API key could serve a new request"""
+        if not self.api_keys:
+            return 0.0
+        return max(0.0, self.scheduler.estimated_wait())
     
-    def _make_request(self, url: str, params: Dict, max_retries: int = 3) -> Optional[Dict]:
-        """Make HTTP request with caching, rate limiting, and retry logic"""
+    def _record_request(self, key_index):
+        """Count a completed request against a key"""
+        with self._lock:
+            self.request_counts[key_index] += 1
+            return sum(self.request_counts), list(self.request_counts)
+    
+    @profiled
+    def _make_request(self, url: str, params: Dict, max_retries: int = 3,
+                      budget_seconds: Optional[float] = None,
+                      use_cache: bool = True, final: bool = False) -> Optional[Dict]:
+        """Make HTTP request with caching, rate limiting, and retry logic.
+        
+        Never sleeps past the latency budget: if no key can serve the request
+        in time it fails fast, falling back to stale cached data if any.
+        The request queues at the caller's priority class (see
+        request_scheduler.request_priority), interactive by default.
+        use_cache=False is for live data that must never be served from cache;
+        final=True caches a response that can no longer change without expiry.
+        """
         # Check cache first
-        cached_data = self.cache.get(url, params)
+        cached_data = self.cache.get(url, params) if use_cache else None
         if cached_data:
             print(f"Using cached data for {url}")
             return cached_data
         
-        # Try each API key if needed
-        for key_attempt in range(len(self.api_keys)):
-            # Get next available key
-            key_index = self._get_next_key_index()
-            session = self.sessions[key_index]
-            
-            # Rate limiting for this specific key
-            self._wait_if_needed(key_index)
-            
-            for attempt in range(max_retries):
+        if not self.api_keys:
+            return None
+        
+        if budget_seconds is None:
+            budget_seconds = self.request_budget_seconds
+        deadline = time.time() + budget_seconds
+        
+        # Errors back a key off in the scheduler instead of sleeping here,
+        # so the next attempt simply goes to whichever key is healthy
+        attempts = 0
+        while attempts < max_retries * len(self.api_keys):
+            slot = self.requests.acquire(deadline)
+            if slot is None:
+                print(f"No API key can serve the request within {budget_seconds:.0f}s")
+                break
+            key_index, wait_time = slot
+            # Set once the key's health is recorded; until then a half-open
+            # key's probe is ours and has to be handed back on the way out
+            recorded = False
+            try:
+                session = self.sessions[key_index]
+                if wait_time > 0:
+                    print(f"Rate limiting on key {key_index + 1}/{len(self.api_keys)}: waiting {wait_time:.2f} seconds...")
+                    time.sleep(wait_time)
+
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._key_slots[key_index].acquire(timeout=remaining):
+                    break
+                attempts += 1
                 try:
                     print(f"Using API key {key_index + 1}/{len(self.api_keys)} for request...")
-                    response = session.get(url, params=params)
-                    self.last_request_times[key_index] = time.time()
-                    self.request_counts[key_index] += 1
-                    
+                    response = session.get(url, params=params,
+                                           timeout=min(self.request_timeout_seconds, max(remaining, 0.1)))
+                    total_requests, key_distribution = self._record_request(key_index)
+
                     if response.status_code == 429:
-                        # Rate limit exceeded on this key
-                        retry_after = int(response.headers.get('Retry-After', 60))
-                        print(f"Rate limit exceeded on key {key_index + 1}. Waiting {retry_after} seconds...")
-                        # Mark this key as rate limited
-                        self.last_request_times[key_index] = time.time() + retry_after
-                        # Try next key
-                        break
-                    
+                        # Rate limit exceeded on this key: cool it down and try another
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        print(f"Rate limit exceeded on key {key_index + 1}. Cooling down for {retry_after:.0f} seconds...")
+                        self.scheduler.record_rate_limited(key_index, retry_after)
+                        recorded = True
+                        continue
+
+                    if response.status_code in (401, 403):
+                        # The key itself was refused (revoked, or not entitled):
+                        # trip its breaker and try another key
+                        self.scheduler.record_rejected_key(key_index)
+                        recorded = True
+                        print(f"Key {key_index + 1} refused with {response.status_code}; taking it out of rotation")
+                        continue
+
+                    if 400 <= response.status_code < 500:
+                        # The request itself was rejected (e.g. an unknown ticker):
+                        # the key answered fine and no other key will do better
+                        self.scheduler.record_success(key_index)
+                        recorded = True
+                        print(f"Request rejected with {response.status_code} for {url}")
+                        return None
+
                     response.raise_for_status()
                     data = response.json()
-                    
+                    self.scheduler.record_success(key_index)
+                    recorded = True
+
                     # Cache successful response
-                    self.cache.set(url, params, data)
-                    
+                    if use_cache:
+                        self.cache.set(url, params, data, final=final)
+
                     # Log statistics
-                    total_requests = sum(self.request_counts)
                     print(f"Request successful. Total requests: {total_requests} " +
-                          f"(Key distribution: {self.request_counts})")
-                    
+                          f"(Key distribution: {key_distribution})")
+
                     return data
-                    
+
+                except (requests.exceptions.HTTPError, requests.exceptions.Timeout,
+                        requests.exceptions.ConnectionError) as e:
+                    # Server errors, timeouts and dropped connections count
+                    # against the key's breaker
+                    backoff = self.scheduler.record_failure(key_index)
+                    recorded = True
+                    print(f"Error on attempt {attempts} with key {key_index + 1}: {e} " +
+                          f"(key backed off {backoff:.1f}s)")
                 except requests.exceptions.RequestException as e:
-                    print(f"Error on attempt {attempt + 1} with key {key_index + 1}: {e}")
-                    if attempt < max_retries - 1:
-                        # Exponential backoff
-                        wait_time = (2 ** attempt) * 5
-                        print(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"Max retries reached for key {key_index + 1}")
-                        # Try next key
-                        break
-            
-            # Move to next key for next attempt
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
+                    # E.g. a truncated body: worth a retry, but says nothing about the key
+                    print(f"Error on attempt {attempts} with key {key_index + 1}: {e}")
+                finally:
+                    self._key_slots[key_index].release()
+            finally:
+                if not recorded:
+                    self.scheduler.release(key_index)
+        
+        stale_data = self.cache.get(url, params, allow_stale=True) if use_cache else None
+        if stale_data:
+            print(f"Request failed. Serving stale cached data for {url}")
+            return stale_data
         
         print(f"All API keys exhausted. Request failed.")
         return None
     
-    def get_aggregates(self, ticker: str, multiplier: int, timespan: str, 
-                      from_date: str, to_date: str, adjusted: bool = True) -> Dict:
+    def _aggregates_request(self, ticker: str, multiplier: int, timespan: str,
+                            from_date: str, to_date: str, adjusted: bool = True):
         endpoint = f"/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{from_date}/{to_date}"
         
         params = {
@@ -218,44 +359,103 @@ class PolygonClient:
             "limit": 50000
         }
         
-        url = f"{self.base_url}{endpoint}"
-        return self._make_request(url, params)
+        return f"{self.base_url}{endpoint}", params
+    
+    def get_aggregates(self, ticker: str, multiplier: int, timespan: str, 
+                      from_date: str, to_date: str, adjusted: bool = True,
+                      use_cache: bool = True, budget_seconds: Optional[float] = None,
+                      final: bool = False) -> Dict:
+        url, params = self._aggregates_request(ticker, multiplier, timespan, from_date, to_date, adjusted)
+        return self._make_request(url, params, budget_seconds=budget_seconds, use_cache=use_cache,
+                                  final=final)
+    
+    def cached_aggregates(self, ticker: str, multiplier: int, timespan: str,
+                          from_date: str, to_date: str, adjusted: bool = True) -> Optional[Dict]:
+        """The fresh cached response for this range, without touching the API"""
+        url, params = self._aggregates_request(ticker, multiplier, timespan, from_date, to_date, adjusted)
+        return self.cache.get(url, params)
     
     def get_ticker_details(self, ticker: str) -> Dict:
         endpoint = f"/v3/reference/tickers/{ticker}"
         url = f"{self.base_url}{endpoint}"
         return self._make_request(url, {})
-    
+
+    def get_reference_tickers(self, market: str, cursor_url: Optional[str] = None,
+                              budget_seconds: Optional[float] = None) -> Optional[Dict]:
+        """One page (up to 1000) of active tickers for a market.
+
+        Pass the previous page's next_url as cursor_url to continue. Not cached:
+        TickerIndex persists the assembled index itself.
+        """
+        if cursor_url:
+            return self._make_request(cursor_url, {}, budget_seconds=budget_seconds, use_cache=False)
+        url = f"{self.base_url}/v3/reference/tickers"
+        params = {"market": market, "active": "true", "sort": "ticker", "order": "asc", "limit": 1000}
+        return self._make_request(url, params, budget_seconds=budget_seconds, use_cache=False)
+
     def get_daily_open_close(self, ticker: str, date: str) -> Dict:
         endpoint = f"/v1/open-close/{ticker}/{date}"
         url = f"{self.base_url}{endpoint}"
         return self._make_request(url, {})
     
-    def aggregates_to_dataframe(self, aggregates_data: Dict) -> Optional[pd.DataFrame]:
-        if not aggregates_data or "results" not in aggregates_data:
-            return None
+    def get_snapshot(self, ticker: str, asset_type: str = "stock") -> Dict:
+        """Latest trade/quote plus the forming minute bar; a ~1KB payload.
         
-        results = aggregates_data["results"]
-        if not results:
-            return None
+        Forex and crypto tickers take their C:/X: prefixes. Never cached.
+        """
+        endpoint = SNAPSHOT_ENDPOINTS[asset_type].format(ticker=ticker)
+        url = f"{self.base_url}{endpoint}"
+        return self._make_request(url, {}, use_cache=False)
+    
+    def snapshot_to_bar(self, snapshot_data: Dict) -> Optional[Dict]:
+        """The forming minute bar from a snapshot, updated to the latest price.
         
-        df = pd.DataFrame(results)
+        Returns a dict with open/high/low/close/volume/vwap/transactions and
+        the bar start as epoch milliseconds under "t", or None.
+        """
+        if not snapshot_data or not snapshot_data.get("ticker"):
+            return None
+        snapshot = snapshot_data["ticker"]
+        minute = snapshot.get("min") or {}
         
-        df["datetime"] = pd.to_datetime(df["t"], unit="ms")
+        # Most recent price: last trade for stocks/crypto, quote midpoint for forex
+        last_trade = snapshot.get("lastTrade") or {}
+        last_quote = snapshot.get("lastQuote") or {}
+        if last_trade.get("p"):
+            price = last_trade["p"]
+        elif last_quote.get("a") and last_quote.get("b"):
+            price = (last_quote["a"] + last_quote["b"]) / 2
+        else:
+            price = minute.get("c")
+        if price is None:
+            return None
         
-        df = df.rename(columns={
-            "o": "open",
-            "h": "high",
-            "l": "low",
-            "c": "close",
-            "v": "volume",
-            "vw": "vwap",
-            "n": "transactions"
-        })
+        if minute.get("t"):
+            start_ms = minute["t"]
+        else:
+            # No forming bar yet; start one at the snapshot's minute
+            updated = snapshot.get("updated") or time.time() * 1e9
+            start_ms = int(updated // 1_000_000 // 60_000 * 60_000)
         
-        df = df.set_index("datetime")
+        return {
+            "t": int(start_ms),
+            "open": minute.get("o", price),
+            "high": max(minute.get("h", price), price),
+            "low": min(minute.get("l", price), price),
+            "close": price,
+            "volume": minute.get("v", 0),
+            "vwap": minute.get("vw", price),
+            "transactions": minute.get("n", 0)
+        }
+    
+    def aggregates_to_dataframe(self, aggregates_data: Dict, compact: bool = False) -> Optional[pd.DataFrame]:
+        # Typed columns straight from the bar dicts, wrapped without copying;
+        # nothing else holds them, so the frame can stay writable
+        bars = AggregateBars.from_response(aggregates_data, compact=compact, readonly=False)
+        if bars is None:
+            return None
         
-        return df[["open", "high", "low", "close", "volume", "vwap", "transactions"]]
+        return bars.to_dataframe()
     
     def get_forex_aggregates(self, ticker: str, multiplier: int, timespan: str,
                             from_date: str, to_date: str) -> Dict:
@@ -285,20 +485,12 @@ class PolygonClient:
     
     def clear_cache(self):
         """Clear all cached data"""
-        if self.cache.cache_dir is None:
+        if self.cache.backend is None:
             print("Cache is disabled")
             return
             
         try:
-            cache_files = os.listdir(self.cache.cache_dir)
-            cleared = 0
-            for file in cache_files:
-                if file.endswith('.json'):
-                    try:
-                        os.remove(os.path.join(self.cache.cache_dir, file))
-                        cleared += 1
-                    except Exception:
-                        pass
-            print(f"Cleared {cleared} cache files")
+            cleared = self.cache.clear()
+            print(f"Cleared {cleared} cache entries")
         except Exception:
             print("Unable to clear cache")
\ No newline at end of file
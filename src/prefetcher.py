@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from request_scheduler import request_priority
+
+# Timeframes a user is likely to switch to next from each one
+TIMEFRAME_NEIGHBORS = {
+    "minute": ("5minute",),
+    "5minute": ("minute", "15minute"),
+    "15minute": ("5minute", "hour"),
+    "hour": ("15minute", "day"),
+    "day": ("hour", "week"),
+    "week": ("day",),
+}
+
+# (asset type, ticker, days back, timeframe)
+Selection = Tuple[str, str, int, str]
+
+
+class Prefetcher:
+    """Speculatively warms the cache for the selection a user is building.
+
+    select() is called whenever the dropdowns change: the selection itself
+    runs first, then its neighboring timeframes. One background worker
+    runs the queue newest-first and only spends a request when an API key
+    is free right now, and those requests queue in the prefetch class, so
+    speculation never makes a foreground request wait.
+    record_use() is called on the Fetch click; a prefetched selection used
+    within ttl_seconds is a hit, one left unused is wasted. Selections that
+    were already cached when they came up count as neither.
+    The same worker sweeps long-expired entries out of the response cache
+    on start and then every sweep_interval_seconds.
+    """
+
+    def __init__(self, fetcher, ttl_seconds: Optional[float] = None, max_pending: int = 16,
+                 neighbors: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 sweep_interval_seconds: float = 3600.0):
+        self.fetcher = fetcher
+        # Prefetched data is only useful while the cache still holds it
+        if ttl_seconds is None:
+            ttl_seconds = fetcher.client.cache.ttl_minutes * 60
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self.neighbors = TIMEFRAME_NEIGHBORS if neighbors is None else neighbors
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._next_sweep = 0.0
+        self._pending = deque()
+        self._in_flight = set()
+        self._done = OrderedDict()  # selection -> (finished at, API calls made)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self.stats = {"queued": 0, "skipped_warm": 0, "skipped_busy": 0, "dropped": 0,
+                      "prefetched": 0, "calls": 0, "hits": 0, "late": 0, "misses": 0,
+                      "already_cached": 0,
+                      "wasted": 0, "wasted_calls": 0, "sweeps": 0, "swept": 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def select(self, asset_type: str, ticker: str, days: int, timeframe: str):
+        """Queue the current selection and its neighbors, most likely last (run first)"""
+        if not ticker or timeframe not in self.neighbors:
+            return
+        ticker = ticker.upper()
+        selections = [(asset_type, ticker, days, neighbor)
+                      for neighbor in reversed(self.neighbors[timeframe])]
+        selections.append((asset_type, ticker, days, timeframe))
+        with self._wake:
+            for selection in selections:
+                if selection in self._in_flight:
+                    continue
+                if selection in self._pending:
+                    self._pending.remove(selection)
+                self._pending.append(selection)
+                self.stats["queued"] += 1
+            while len(self._pending) > self.max_pending:
+                # Oldest speculation is the least likely to be wanted
+                self._pending.popleft()
+                self.stats["dropped"] += 1
+            self._wake.notify()
+
+    def record_use(self, asset_type: str, ticker: str, days: int, timeframe: str) -> str:
+        """Count a foreground fetch as a hit, late (prefetch still running), miss,
+        or already cached (warm before the prefetcher got to it)"""
+        selection = (asset_type, ticker.upper(), days, timeframe)
+        with self._lock:
+            self._expire()
+            done = self._done.pop(selection, None)
+            if done is not None:
+                # No calls: the cache was warm already, e.g. from the user's own earlier fetch
+                outcome = "hits" if done[1] else "already_cached"
+            elif selection in self._in_flight:
+                outcome = "late"
+            else:
+                outcome = "misses"
+            self.stats[outcome] += 1
+        return outcome
+
+    def hit_rate(self) -> float:
+        with self._lock:
+            used = self.stats["hits"] + self.stats["late"] + self.stats["misses"]
+            return self.stats["hits"] / used if used else 0.0
+
+    def _expire(self):
+        """Unused prefetches older than the TTL are waste (caller holds the lock)"""
+        cutoff = time.time() - self.ttl_seconds
+        while self._done:
+            selection, (finished, calls) = next(iter(self._done.items()))
+            if finished >= cutoff:
+                break
+            del self._done[selection]
+            if calls:
+                self.stats["wasted"] += 1
+                self.stats["wasted_calls"] += calls
+
+    def _run(self):
+        while True:
+            if time.time() >= self._next_sweep:
+                self._sweep()
+            with self._wake:
+                if not self._pending:
+                    self._wake.wait(max(0.0, self._next_sweep - time.time()))
+                    continue
+                selection = self._pending.pop()
+                self._in_flight.add(selection)
+            try:
+                self._prefetch(selection)
+            except Exception as e:
+                print(f"Prefetch of {selection} failed: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(selection)
+
+    def _sweep(self):
+        self._next_sweep = time.time() + self.sweep_interval_seconds
+        try:
+            removed = self.fetcher.client.cache.sweep()
+        except Exception as e:
+            print(f"Cache sweep failed: {e}")
+            return
+        with self._lock:
+            self.stats["sweeps"] += 1
+            self.stats["swept"] += removed
+
+    def _prefetch(self, selection: Selection):
+        asset_type, ticker, days, timeframe = selection
+        calls = self.fetcher.pending_requests(asset_type, ticker, days, timeframe)
+        if calls == 0:
+            # Already warm: a click on it is still served from the cache
+            with self._lock:
+                self._done[selection] = (time.time(), 0)
+                self._done.move_to_end(selection)
+                self.stats["skipped_warm"] += 1
+            return
+        if self.fetcher.client.estimated_wait() > 0:
+            # No spare quota right now; foreground requests come first
+            with self._lock:
+                self.stats["skipped_busy"] += 1
+            return
+        with request_priority("prefetch", session="prefetch"):
+            self.fetcher.fetch_data(asset_type, ticker, days, timeframe)
+        with self._lock:
+            self._expire()
+            self._done[selection] = (time.time(), calls)
+            self._done.move_to_end(selection)
+            self.stats["prefetched"] += 1
+            self.stats["calls"] += calls
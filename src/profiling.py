@@ -0,0 +1,319 @@
+"""Opt-in request profiling for Dash callbacks and the data path.
+
+Off unless PROFILE_SAMPLE_RATE is above zero (that fraction of callback
+calls is profiled) or PROFILE_TOKEN is set and a request sends it in the
+X-Profile header. A profiled call records:
+
+    spans   wall time and call count of every @profiled function it ran,
+            on any thread (pool threads inherit the request's context)
+    stacks  the stacks of those threads, sampled every PROFILE_INTERVAL_MS
+
+and writes them to PROFILE_DIR as <id>.json and <id>.collapsed. Its stacks
+are also appended to collapsed.txt across requests and processes; both are
+"frame;frame;frame count" lines for flamegraph.pl or speedscope, which
+sum repeated stacks. GET /_profiles lists the slowest recent requests.
+
+A sampler rather than cProfile: cProfile only sees the thread that
+enabled it and slows pandas-heavy code severalfold, while reading
+sys._current_frames() costs the profiled request next to nothing.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+
+from flask import Blueprint, Response, abort, has_request_context, jsonify, request
+
+PROFILE_HEADER = "X-Profile"
+AGGREGATE_FILE = "collapsed.txt"
+MAX_AGGREGATE_BYTES = 64 * 1024 * 1024  # Rotated to collapsed.txt.1 past this
+
+_current = ContextVar("request_profile", default=None)
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of threads working on a profiled request.
+
+    Threads attach while they run a span of a profile; the sampling thread
+    runs only while any are attached.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # A forked child inherits attachments but not the sampling thread
+            sampler = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: sampler() is not None and sampler()._reset())
+
+    def _reset(self):
+        self._threads = {}  # thread id -> [profile, nesting depth]
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def attach(self, profile: "RequestProfile"):
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._threads.get(ident)
+            if entry is not None and entry[0] is profile:
+                entry[1] += 1
+                return
+            self._threads[ident] = [profile, 1]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+    def detach(self, profile: "RequestProfile"):
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._threads.get(ident)
+            if entry is not None and entry[0] is profile:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._threads[ident]
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._threads:
+                    self._thread = None
+                    return
+                threads = [(ident, entry[0]) for ident, entry in self._threads.items()]
+            frames = sys._current_frames()
+            for ident, profile in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    profile.add_sample(_collapse(frame))
+            del frames
+
+
+_sampler = StackSampler(float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000)
+
+
+class RequestProfile:
+    def __init__(self, name: str, reason: str):
+        self.started_at = time.time()
+        # Sorts by start time, across processes
+        self.id = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}"
+                   f".{int(self.started_at * 1e6) % 1_000_000:06d}-{uuid.uuid4().hex[:6]}")
+        self.name = name
+        self.reason = reason
+        self.duration = 0.0
+        self.stacks = Counter()
+        self.spans = defaultdict(lambda: [0, 0.0])  # name -> [calls, seconds]
+        self._lock = threading.Lock()
+
+    def add_sample(self, stack: str):
+        with self._lock:
+            self.stacks[stack] += 1
+
+    @contextmanager
+    def span(self, name: str):
+        _sampler.attach(self)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _sampler.detach(self)
+            with self._lock:
+                span = self.spans[name]
+                span[0] += 1
+                span[1] += elapsed
+
+    def summary(self) -> Dict:
+        with self._lock:
+            spans = {name: {"calls": calls, "ms": round(seconds * 1000, 3)}
+                     for name, (calls, seconds) in sorted(self.spans.items(), key=lambda item: -item[1][1])}
+            samples = sum(self.stacks.values())
+        return {"id": self.id, "name": self.name, "reason": self.reason, "pid": os.getpid(),
+                "started_at": self.started_at, "ms": round(self.duration * 1000, 3),
+                "samples": samples, "spans": spans}
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def profiled(func):
+    """Time calls to func as a span of the current request's profile, if any"""
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        with profile.span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _request_headers() -> Dict[str, str]:
+    """Headers of the request a callback serves; background jobs get a copy from Dash"""
+    try:
+        from dash import callback_context
+        headers = callback_context.headers
+    except Exception:
+        headers = None
+    if not headers and has_request_context():
+        headers = request.headers
+    return {key.lower(): value for key, value in (headers or {}).items()}
+
+
+class Profiler:
+    def __init__(self, directory: str, sample_rate: float = 0.0, token: Optional[str] = None,
+                 keep: int = 200):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.keep = keep
+
+    @classmethod
+    def from_env(cls, directory: str) -> "Profiler":
+        """PROFILE_SAMPLE_RATE, PROFILE_TOKEN, PROFILE_DIR (default: directory) and PROFILE_KEEP"""
+        return cls(os.environ.get("PROFILE_DIR") or directory,
+                   sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+                   token=os.environ.get("PROFILE_TOKEN") or None,
+                   keep=int(os.environ.get("PROFILE_KEEP", 200)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.token is not None
+
+    def _reason(self) -> Optional[str]:
+        if self.token is not None and _request_headers().get(PROFILE_HEADER.lower()) == self.token:
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def callback(self, func):
+        """Profile a sample of calls to a Dash callback (or any request handler)"""
+        if not self.enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            reason = None if _current.get() is not None else self._reason()
+            if reason is None:
+                return func(*args, **kwargs)
+            profile = RequestProfile(func.__name__, reason)
+            token = _current.set(profile)
+            start = time.perf_counter()
+            try:
+                with profile.span(func.__name__):
+                    return func(*args, **kwargs)
+            finally:
+                profile.duration = time.perf_counter() - start
+                _current.reset(token)
+                self.save(profile)
+        return wrapper
+
+    def save(self, profile: RequestProfile):
+        """Write a finished profile and add its stacks to the aggregate"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            collapsed = profile.collapsed()
+            with open(os.path.join(self.directory, f"{profile.id}.collapsed"), "w") as f:
+                f.write(collapsed)
+            # The summary goes last: readers list profiles by it
+            with open(os.path.join(self.directory, f"{profile.id}.json"), "w") as f:
+                json.dump(profile.summary(), f)
+            aggregate = os.path.join(self.directory, AGGREGATE_FILE)
+            if os.path.exists(aggregate) and os.path.getsize(aggregate) > MAX_AGGREGATE_BYTES:
+                os.replace(aggregate, aggregate + ".1")
+            # One O_APPEND write per request, so processes don't interleave lines
+            fd = os.open(aggregate, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, collapsed.encode())
+            finally:
+                os.close(fd)
+            self._prune()
+        except OSError as e:
+            print(f"Could not save profile {profile.id}: {e}")
+
+    def _ids(self) -> List[str]:
+        """Saved profile ids, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def _prune(self):
+        for old in self._ids()[:-self.keep]:
+            for suffix in (".json", ".collapsed"):
+                try:
+                    os.remove(os.path.join(self.directory, old + suffix))
+                except OSError:
+                    pass
+
+    def slowest(self, limit: int = 20) -> List[Dict]:
+        """Summaries of the slowest kept profiles, slowest first"""
+        summaries = []
+        for profile_id in self._ids():
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Pruned or still being written
+        summaries.sort(key=lambda summary: -summary["ms"])
+        return summaries[:limit]
+
+
+def create_profiles_blueprint(profiler: Profiler) -> Blueprint:
+    """GET /_profiles[?limit=N]: the slowest recent profiled requests;
+    /_profiles/<id>: one request's collapsed stacks; /_profiles/collapsed.txt: all of them.
+
+    Requests must send PROFILE_TOKEN in X-Profile or ?token=; without a token
+    configured every request is refused, since stacks and timings are not public.
+    """
+    profiles = Blueprint("profiles", __name__, url_prefix="/_profiles")
+
+    @profiles.before_request
+    def check_token():
+        if profiler.token is None or \
+                profiler.token not in (request.headers.get(PROFILE_HEADER), request.args.get("token")):
+            abort(403)
+
+    @profiles.route("")
+    def slowest():
+        limit = request.args.get("limit", 20, type=int)
+        response = jsonify({"directory": profiler.directory, "kept": len(profiler._ids()),
+                            "slowest": profiler.slowest(limit)})
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    @profiles.route("/<profile_id>")
+    def stacks(profile_id):
+        name = AGGREGATE_FILE if profile_id == AGGREGATE_FILE else f"{profile_id}.collapsed"
+        if profile_id != AGGREGATE_FILE and profile_id not in profiler._ids():
+            abort(404)
+        try:
+            with open(os.path.join(profiler.directory, name)) as f:
+                body = f.read()
+        except OSError:
+            abort(404)
+        return Response(body, mimetype="text/plain", headers={"Cache-Control": "no-store"})
+
+    return profiles
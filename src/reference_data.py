@@ -0,0 +1,219 @@
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+from cache_snapshot import default_snapshot
+from request_scheduler import request_priority
+
+# Polygon's market name for each dashboard asset type
+MARKETS = {"stock": "stocks", "forex": "fx", "crypto": "crypto"}
+
+# Shown before the first bulk load (and on hosts that never run one)
+SEED_TICKERS = {
+    "stock": [
+        ("AAPL", "Apple Inc."), ("MSFT", "Microsoft Corporation"), ("GOOGL", "Alphabet Inc."),
+        ("AMZN", "Amazon.com Inc."), ("TSLA", "Tesla Inc."), ("META", "Meta Platforms Inc."),
+        ("NVDA", "NVIDIA Corporation"), ("JPM", "JPMorgan Chase & Co."), ("V", "Visa Inc."),
+        ("WMT", "Walmart Inc."), ("BA", "Boeing Company"), ("DIS", "Walt Disney Company"),
+    ],
+    "forex": [
+        ("EURUSD", "Euro/US Dollar"), ("GBPUSD", "British Pound/US Dollar"),
+        ("USDJPY", "US Dollar/Japanese Yen"), ("AUDUSD", "Australian Dollar/US Dollar"),
+        ("USDCAD", "US Dollar/Canadian Dollar"), ("USDCHF", "US Dollar/Swiss Franc"),
+        ("NZDUSD", "New Zealand Dollar/US Dollar"), ("EURGBP", "Euro/British Pound"),
+    ],
+    "crypto": [
+        ("BTCUSD", "Bitcoin/US Dollar"), ("ETHUSD", "Ethereum/US Dollar"),
+        ("BNBUSD", "Binance Coin/US Dollar"), ("XRPUSD", "Ripple/US Dollar"),
+        ("ADAUSD", "Cardano/US Dollar"), ("DOGEUSD", "Dogecoin/US Dollar"),
+        ("SOLUSD", "Solana/US Dollar"), ("MATICUSD", "Polygon/US Dollar"),
+    ],
+}
+
+# Ticker metadata kept per row, in storage order
+FIELDS = ("ticker", "name", "type", "primary_exchange", "currency_name")
+
+WORD = re.compile(r"[A-Z0-9]+")
+
+
+def _strip_prefix(ticker: str) -> str:
+    """C:EURUSD / X:BTCUSD -> EURUSD / BTCUSD"""
+    return ticker.split(":", 1)[1] if ":" in ticker else ticker
+
+
+class _AssetIndex:
+    """Sorted symbol and name-word keys for one asset type, searched with bisect"""
+
+    def __init__(self, rows: List[tuple], fetched_at: float = 0.0):
+        self.rows = sorted({row[0]: row for row in rows}.values())
+        self.fetched_at = fetched_at
+        self.by_symbol = {row[0]: i for i, row in enumerate(self.rows)}
+        self.symbols = [row[0] for row in self.rows]
+        words = sorted((word, i) for i, row in enumerate(self.rows)
+                       for word in set(WORD.findall((row[1] or "").upper())))
+        self.words = [word for word, _ in words]
+        self.word_rows = [i for _, i in words]
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """Row numbers: symbol-prefix matches first, then name-word-prefix matches.
+
+        Multi-word queries look up the first word and keep rows whose names
+        also have words starting with the others.
+        """
+        query = query.strip().upper()
+        found = []
+        start = bisect_left(self.symbols, query)
+        for i in range(start, min(start + limit, len(self.symbols))):
+            if not self.symbols[i].startswith(query):
+                break
+            found.append(i)
+        terms = WORD.findall(query)
+        if len(found) < limit and terms:
+            seen = set(found)
+            first, rest = terms[0], terms[1:]
+            i = bisect_left(self.words, first)
+            while i < len(self.words) and len(found) < limit and self.words[i].startswith(first):
+                row = self.word_rows[i]
+                if row not in seen and all(self._name_has(row, term) for term in rest):
+                    seen.add(row)
+                    found.append(row)
+                i += 1
+        return found
+
+    def _name_has(self, row: int, term: str) -> bool:
+        return any(word.startswith(term) for word in WORD.findall((self.rows[row][1] or "").upper()))
+
+
+class TickerIndex:
+    """Local index of ticker reference data for typeahead search.
+
+    Bulk-loads every active ticker per market through paginated
+    /v3/reference/tickers calls, persists it as JSON and refreshes it on a
+    schedule. Until the first load completes, the lists from the cache
+    snapshot, if any, or else the seed lists are served.
+    """
+
+    def __init__(self, client=None, cache_dir: Optional[str] = None, refresh_hours: float = 24.0,
+                 snapshot=None):
+        self.client = client
+        self.snapshot = default_snapshot() if snapshot is None else (snapshot or None)
+        if cache_dir is None:
+            cache_dir = os.path.join('/tmp/cache' if os.environ.get('VERCEL') else 'cache', 'reference')
+        self.cache_dir = cache_dir
+        self.refresh_hours = refresh_hours
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        for asset_type, seeds in SEED_TICKERS.items():
+            self._indexes[asset_type] = _AssetIndex([(t, n, None, None, None) for t, n in seeds])
+            self._load(asset_type)
+
+    def _path(self, asset_type: str) -> str:
+        return os.path.join(self.cache_dir, f"tickers-{asset_type}.json")
+
+    def _load(self, asset_type: str):
+        try:
+            with open(self._path(asset_type)) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = self.snapshot.reference(asset_type) if self.snapshot is not None else None
+            if saved is None:
+                return
+        self._indexes[asset_type] = _AssetIndex([tuple(row) for row in saved["rows"]],
+                                                saved["fetched_at"])
+
+    def _save(self, asset_type: str, index: _AssetIndex):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{self._path(asset_type)}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"fetched_at": index.fetched_at, "fields": FIELDS, "rows": index.rows}, f)
+            os.replace(tmp, self._path(asset_type))
+        except OSError:
+            pass  # Read-only filesystem: keep the index in memory only
+
+    def __len__(self) -> int:
+        return sum(len(index.rows) for index in self._indexes.values())
+
+    def search(self, asset_type: str, query: str, limit: int = 20) -> List[Dict]:
+        index = self._indexes.get(asset_type)
+        if index is None:
+            return []
+        if not query:
+            rows = [index.by_symbol[t] for t, _ in SEED_TICKERS.get(asset_type, [])
+                    if t in index.by_symbol][:limit]
+        else:
+            rows = index.search(query, limit)
+        return [dict(zip(FIELDS, index.rows[i])) for i in rows]
+
+    def details(self, asset_type: str, ticker: str) -> Optional[Dict]:
+        index = self._indexes.get(asset_type)
+        row = index.by_symbol.get(ticker.upper()) if index else None
+        return dict(zip(FIELDS, index.rows[row])) if row is not None else None
+
+    def options(self, asset_type: str, query: Optional[str] = None, limit: int = 20,
+                include: Iterable[str] = ()) -> List[Dict]:
+        """Dropdown options for a search, always including the current selection(s)"""
+        matches = self.search(asset_type, query or "", limit)
+        listed = {match["ticker"] for match in matches}
+        for ticker in include:
+            if ticker and ticker not in listed:
+                matches.insert(0, self.details(asset_type, ticker) or {"ticker": ticker, "name": None})
+                listed.add(ticker)
+        return [{"label": f"{m['ticker']} ({m['name']})" if m.get("name") else m["ticker"],
+                 "value": m["ticker"]} for m in matches]
+
+    def popular(self, asset_type: str) -> List[str]:
+        return [ticker for ticker, _ in SEED_TICKERS.get(asset_type, [])]
+
+    def is_stale(self, asset_type: str) -> bool:
+        index = self._indexes.get(asset_type)
+        return index is None or time.time() - index.fetched_at > self.refresh_hours * 3600
+
+    def refresh(self, asset_type: str, budget_seconds: float = 600.0) -> int:
+        """Reload one market from the API; keeps the old index if any page fails"""
+        rows = []
+        data = self.client.get_reference_tickers(MARKETS[asset_type], budget_seconds=budget_seconds)
+        while data:
+            for item in data.get("results", []):
+                rows.append((_strip_prefix(item["ticker"]), item.get("name"), item.get("type"),
+                             item.get("primary_exchange"), item.get("currency_name")))
+            next_url = data.get("next_url")
+            if not next_url:
+                break
+            data = self.client.get_reference_tickers(MARKETS[asset_type], cursor_url=next_url,
+                                                     budget_seconds=budget_seconds)
+        if not data:
+            print(f"Ticker reference refresh for {asset_type} failed after {len(rows)} tickers")
+            return 0
+        index = _AssetIndex(rows, time.time())
+        with self._lock:
+            self._indexes[asset_type] = index
+        self._save(asset_type, index)
+        print(f"Loaded {len(index.rows)} {asset_type} tickers into the reference index")
+        return len(index.rows)
+
+    def start_scheduler(self, check_minutes: float = 30.0):
+        """Refresh stale markets in a daemon thread, checking every check_minutes.
+        Pages are fetched in the backfill class, on keys nobody else needs."""
+        if self._thread is not None or self.client is None:
+            return self
+
+        def run():
+            while True:
+                for asset_type in MARKETS:
+                    if self.is_stale(asset_type):
+                        try:
+                            with request_priority("backfill", session="reference"):
+                                self.refresh(asset_type)
+                        except Exception as e:
+                            print(f"Ticker reference refresh for {asset_type} failed: {e}")
+                time.sleep(check_minutes * 60)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return self
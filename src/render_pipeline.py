@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import dash_bootstrap_components as dbc
+from dash import dcc, html
+
+from indicators import IndicatorEngine
+from visualization import CHART_INDICATORS
+
+STAGES = ("fetch", "indicators", "stats", "figure", "components")
+
+# Progress shown while a stage runs: (percent, label)
+STAGE_PROGRESS = {
+    "fetch": (25, "Fetching data"),
+    "indicators": (60, "Computing indicators"),
+    "figure": (80, "Rendering chart"),
+}
+
+# Indicators the stats row reads
+STATS_INDICATORS = ("RSI",)
+
+CHARTS = {
+    "candlestick": "create_candlestick_chart",
+    "technical": "create_technical_indicators_chart",
+    "volume_profile": "create_volume_profile_chart",
+}
+
+
+def data_version(df: pd.DataFrame, *scope) -> tuple:
+    """Fingerprint of a bar frame: a hash of its index and every value.
+
+    New bars, an update to the forming bar and a revision of an earlier
+    bar all give a new version. scope (ticker, timespan) keeps different
+    series apart.
+    """
+    return scope + (len(df), int(pd.util.hash_pandas_object(df, index=True).sum()))
+
+
+def summary_stats(df: pd.DataFrame) -> Dict:
+    """Summary statistics in one pass over each column's underlying array"""
+    close = df["close"].to_numpy(np.float64)
+    volume = df["volume"].to_numpy(np.float64)
+    first, last = close[0], close[-1]
+    latest_rsi = float(df["RSI"].to_numpy()[-1]) if "RSI" in df.columns else np.nan
+    return {
+        "latest_price": float(last),
+        "price_change": float(last - first),
+        "price_change_pct": float((last - first) / first * 100),
+        "high": float(np.nanmax(df["high"].to_numpy(np.float64))),
+        "low": float(np.nanmin(df["low"].to_numpy(np.float64))),
+        "total_volume": float(np.nansum(volume)),
+        "avg_volume": float(np.nanmean(volume)),
+        "latest_rsi": None if np.isnan(latest_rsi) else latest_rsi,
+        "bar_time": df.index[-1].isoformat(),
+        "bars": len(df),
+    }
+
+
+def stats_row(summary: Dict):
+    price_change = summary["price_change"]
+    latest_rsi = summary["latest_rsi"]
+    return dbc.Row([
+        dbc.Col([
+            html.H6("Latest Price"),
+            html.H4(f"${summary['latest_price']:.2f}", className="text-primary")
+        ], md=2),
+        dbc.Col([
+            html.H6("Change"),
+            html.H4(
+                f"{price_change:+.2f} ({summary['price_change_pct']:+.2f}%)",
+                className="text-success" if price_change >= 0 else "text-danger"
+            )
+        ], md=2),
+        dbc.Col([
+            html.H6("Period High"),
+            html.H4(f"${summary['high']:.2f}", className="text-info")
+        ], md=2),
+        dbc.Col([
+            html.H6("Period Low"),
+            html.H4(f"${summary['low']:.2f}", className="text-info")
+        ], md=2),
+        dbc.Col([
+            html.H6("Average Volume"),
+            html.H4(f"{summary['avg_volume']:,.0f}")
+        ], md=2),
+        dbc.Col([
+            html.H6("RSI (14)"),
+            html.H4(
+                f"{latest_rsi:.2f}" if latest_rsi else "N/A",
+                className="text-warning" if latest_rsi and (latest_rsi > 70 or latest_rsi < 30) else ""
+            )
+        ], md=2)
+    ])
+
+
+class Rendered:
+    """Everything a view needs for one data version and chart type"""
+
+    def __init__(self, version: tuple, df: pd.DataFrame, summary: Dict, chart, stats, timings: Dict):
+        self.version = version
+        self.df = df
+        self.summary = summary
+        self.chart = chart
+        self.stats = stats
+        self.timings = timings
+
+    def store_data(self) -> Dict:
+        """JSON-serializable bars for the data-store"""
+        return {
+            'dates': self.df.index.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+            'open': self.df['open'].tolist(),
+            'high': self.df['high'].tolist(),
+            'low': self.df['low'].tolist(),
+            'close': self.df['close'].tolist(),
+            'volume': self.df['volume'].tolist()
+        }
+
+
+class RenderPipeline:
+    """fetch -> indicators -> stats -> figure -> components, each stage timed.
+
+    Every stage after fetch is cached by the data version (and chart type
+    and annotation where they matter), so a refresh that brings no new data,
+    or a second view of the same data, reuses the earlier work. Only the
+    indicators the chart and stats row use are computed.
+    """
+
+    def __init__(self, fetcher, visualizer, max_entries: int = 128):
+        self.fetcher = fetcher
+        self.visualizer = visualizer
+        self.indicators = IndicatorEngine()
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stage_stats = {stage: {"calls": 0, "hits": 0, "seconds": 0.0} for stage in STAGES}
+
+    def _stage(self, name: str, key, compute: Callable, timings: Dict):
+        cache_key = (name,) + key if key is not None else None
+        start = time.perf_counter()
+        with self._lock:
+            value = self._cache.get(cache_key) if cache_key else None
+            if value is not None:
+                self._cache.move_to_end(cache_key)
+        hit = value is not None
+        if not hit:
+            value = compute()
+            if cache_key and value is not None:
+                with self._lock:
+                    self._cache[cache_key] = value
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+        elapsed = time.perf_counter() - start
+        timings[name] = elapsed
+        with self._lock:
+            stats = self.stage_stats[name]
+            stats["calls"] += 1
+            stats["hits"] += hit
+            stats["seconds"] += elapsed
+        return value
+
+    def prepare(self, df: pd.DataFrame, scope: tuple, columns: Iterable[str] = (),
+                timings: Optional[Dict] = None):
+        """(version, frame with the stats' and `columns`' indicators, summary stats)"""
+        timings = {} if timings is None else timings
+        version = data_version(df, *scope)
+        columns = tuple(dict.fromkeys(STATS_INDICATORS + tuple(columns)))
+        df_with_indicators = self._stage("indicators", version + columns,
+                                         lambda: self.indicators.compute(df, columns, version), timings)
+        summary = self._stage("stats", version, lambda: summary_stats(df_with_indicators), timings)
+        return version, df_with_indicators, summary
+
+    def render(self, df: pd.DataFrame, scope: tuple, ticker: str, chart_type: str,
+               annotation: Optional[str] = None, progress: Callable = lambda stage: None,
+               timings: Optional[Dict] = None) -> Rendered:
+        """Indicators, stats, figure and components for already-fetched bars"""
+        timings = {} if timings is None else timings
+        chart_type = chart_type if chart_type in CHARTS else "candlestick"
+        progress("indicators")
+        version, df_with_indicators, summary = self.prepare(df, scope, CHART_INDICATORS[chart_type],
+                                                            timings)
+        view = (chart_type, annotation)
+
+        def figure():
+            fig = getattr(self.visualizer, CHARTS[chart_type])(df_with_indicators, ticker)
+            if annotation:
+                fig.add_annotation(
+                    text=annotation,
+                    xref="paper", yref="paper",
+                    x=0.02, y=0.98,
+                    showarrow=False,
+                    font=dict(size=12, color="red"),
+                    bgcolor="rgba(0,0,0,0.5)"
+                )
+            return fig
+
+        progress("figure")
+        fig = self._stage("figure", version + view, figure, timings)
+        chart, stats = self._stage(
+            "components", version + view,
+            lambda: (dcc.Graph(figure=fig, style={'height': '800px'}), stats_row(summary)), timings
+        )
+        return Rendered(version, df_with_indicators, summary, chart, stats, timings)
+
+    def run(self, asset_type: str, ticker: str, days: int, timespan: str, chart_type: str,
+            progress: Callable = lambda stage: None) -> Optional[Rendered]:
+        """The whole pipeline for a dashboard request; None when there is no data"""
+        timings = {}
+        progress("fetch")
+        df = self._stage("fetch", None,
+                         lambda: self.fetcher.fetch_data(asset_type, ticker, days, timespan), timings)
+        if df is None or df.empty:
+            return None
+        rendered = self.render(df, (asset_type, ticker, timespan), ticker, chart_type,
+                               progress=progress, timings=timings)
+        print(f"Rendered {ticker} {timespan}: " +
+              ", ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in timings.items()))
+        return rendered
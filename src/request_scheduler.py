@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+# Lower runs first. Background classes only get keys nobody else is waiting on.
+PRIORITIES = {"interactive": 0, "live": 1, "prefetch": 2, "backfill": 3}
+BACKGROUND = ("prefetch", "backfill")
+
+_priority = ContextVar("request_priority", default="interactive")
+_session = ContextVar("request_session", default=None)
+
+
+@contextmanager
+def request_priority(priority: str, session: Optional[str] = None):
+    """Run API requests made inside the block at a priority class, queued
+    fairly against other sessions of the same class"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown request priority: {priority}")
+    priority_token = _priority.set(priority)
+    session_token = _session.set(session if session is not None else _session.get())
+    try:
+        yield
+    finally:
+        _session.reset(session_token)
+        _priority.reset(priority_token)
+
+
+def propagate(func):
+    """Carry the caller's context variables (priority, session, the request's
+    profile) into pool threads, which don't inherit them"""
+    context = copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+# Every live scheduler, so one fork hook can reach them all
+_schedulers = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    for scheduler in list(_schedulers):
+        scheduler._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    # A forked child (e.g. of a fork-start process pool) inherits the
+    # queues and lock but not the dispatcher thread; start it over empty
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _Waiter:
+    __slots__ = ("future", "priority", "deadline", "queued_at")
+
+    def __init__(self, priority: str, deadline: Optional[float]):
+        self.future = Future()
+        self.priority = priority
+        self.deadline = deadline
+        self.queued_at = time.time()
+
+
+class RequestScheduler:
+    """Grants API keys to queued requests by priority class.
+
+    Callers submit() and wait on the returned future, which resolves to a
+    (key_index, seconds_to_wait) slot like KeyScheduler.acquire(), or to
+    None once the request's deadline has passed. Keys are only handed out
+    when the KeyScheduler says one is ready now, so a bulk request never
+    holds a reservation an interactive one could have used.
+    Within a class, sessions take turns one request at a time. Background
+    classes also leave `headroom` ready keys free for foreground work.
+    """
+
+    def __init__(self, keys, headroom: Optional[int] = None, max_sleep: float = 1.0,
+                 window: int = 1000):
+        self.keys = keys
+        # One spare key for foreground requests, unless that is the only key
+        self.headroom = min(1, keys.key_count - 1) if headroom is None else headroom
+        # Breakers recover without telling us; poll at least this often
+        self.max_sleep = max_sleep
+        self._reset()
+        _schedulers.add(self)
+        self.waits = {priority: deque(maxlen=window) for priority in PRIORITIES}
+        self.stats = {priority: {"granted": 0, "expired": 0, "cancelled": 0}
+                      for priority in PRIORITIES}
+
+    def _reset(self):
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, deadline: Optional[float] = None, priority: Optional[str] = None,
+               session: Optional[str] = None) -> Future:
+        """Queue a request for a key; priority and session default to the caller's context"""
+        priority = priority or _priority.get()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown request priority: {priority}")
+        session = session if session is not None else _session.get()
+        waiter = _Waiter(priority, deadline)
+        if deadline is not None and time.time() + self.keys.estimated_wait() > deadline:
+            # No key frees up in time no matter the queue; fail fast
+            with self._cond:
+                self._finish(waiter, None)
+            return waiter.future
+        with self._cond:
+            if not self._queued:
+                # Nobody ahead of us: take a ready key without a thread hand-off
+                ready = self.keys.ready_count()
+                if ready and (priority not in BACKGROUND or ready > self.headroom):
+                    self._finish(waiter, self.keys.acquire(deadline))
+                    return waiter.future
+            self._queues[priority].setdefault(session, deque()).append(waiter)
+            self._queued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return waiter.future
+
+    def acquire(self, deadline: Optional[float] = None, priority: Optional[str] = None,
+                session: Optional[str] = None) -> Optional[Tuple[int, float]]:
+        """Block until a key is granted; None if the deadline passes first"""
+        return self.submit(deadline, priority, session).result()
+
+    def queued(self) -> Dict[str, int]:
+        with self._cond:
+            return {priority: sum(len(waiters) for waiters in queue.values())
+                    for priority, queue in self._queues.items()}
+
+    def wait_percentile(self, priority: str, q: float = 0.99) -> float:
+        """Seconds granted requests of a class spent queued, at quantile q"""
+        with self._cond:
+            waits = sorted(self.waits[priority])
+        if not waits:
+            return 0.0
+        return waits[min(len(waits) - 1, int(q * len(waits)))]
+
+    def _finish(self, waiter: _Waiter, slot: Optional[Tuple[int, float]]):
+        """Resolve a waiter's future (caller holds the lock)"""
+        if not waiter.future.set_running_or_notify_cancel():
+            self.stats[waiter.priority]["cancelled"] += 1
+            return False
+        if slot is None:
+            self.stats[waiter.priority]["expired"] += 1
+        else:
+            self.stats[waiter.priority]["granted"] += 1
+            self.waits[waiter.priority].append(time.time() - waiter.queued_at)
+        waiter.future.set_result(slot)
+        return True
+
+    def _expire(self, now: float) -> Optional[float]:
+        """Drop waiters past their deadline; return the earliest remaining deadline"""
+        earliest = None
+        for queue in self._queues.values():
+            for session in list(queue):
+                waiters = queue[session]
+                kept = deque()
+                for waiter in waiters:
+                    if waiter.deadline is not None and waiter.deadline <= now:
+                        self._finish(waiter, None)
+                    elif waiter.future.cancelled():
+                        self.stats[waiter.priority]["cancelled"] += 1
+                    else:
+                        kept.append(waiter)
+                        if waiter.deadline is not None and (earliest is None or waiter.deadline < earliest):
+                            earliest = waiter.deadline
+                self._queued -= len(waiters) - len(kept)
+                if kept:
+                    queue[session] = kept
+                else:
+                    del queue[session]
+        return earliest
+
+    def _next_waiter(self, ready: int) -> Optional[_Waiter]:
+        """Head of the first non-empty class, rotating its sessions round-robin"""
+        if not ready:
+            return None
+        for priority, queue in self._queues.items():
+            if not queue:
+                continue
+            if priority in BACKGROUND and ready <= self.headroom:
+                return None
+            session, waiters = next(iter(queue.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                queue.move_to_end(session)
+            else:
+                del queue[session]
+            self._queued -= 1
+            return waiter
+        return None
+
+    def _run(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                earliest = self._expire(now)
+                if not self._queued:
+                    self._cond.wait()
+                    continue
+                ready = self.keys.ready_count()
+                waiter = self._next_waiter(ready)
+                if waiter is None:
+                    # Sleep until one more key frees up, a deadline passes or new work arrives
+                    timeout = min(self.max_sleep, max(self.keys.estimated_wait(ready + 1), 0.001))
+                    if earliest is not None:
+                        timeout = min(timeout, max(earliest - now, 0.0))
+                    self._cond.wait(timeout)
+                    continue
+                if waiter.future.cancelled():
+                    self.stats[waiter.priority]["cancelled"] += 1
+                    continue
+                # Keys are only reserved under this lock, so a ready key is still ready
+                slot = self.keys.acquire(waiter.deadline)
+                if not self._finish(waiter, slot) and slot is not None:
+                    # Cancelled while the key was being reserved: nothing will be sent on it
+                    self.keys.release(slot[0])
@@ -0,0 +1,273 @@
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from indicators import compute_indicators
+
+# Columns a rule can reference, in panel order
+SCREEN_COLUMNS = [
+    "open", "high", "low", "close", "volume", "vwap",
+    "SMA_20", "SMA_50", "EMA_12", "EMA_26", "MACD", "MACD_signal", "MACD_histogram",
+    "RSI", "ATR", "BB_middle", "BB_upper", "BB_lower",
+]
+COLUMN_INDEX = {column: i for i, column in enumerate(SCREEN_COLUMNS)}
+
+# Default size of the indicator process pool; more workers mostly add idle
+# processes, each holding its own copy of pandas
+MAX_POOL_PROCESSES = 4
+
+COMPARISONS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+CROSSES = ("crosses_above", "crosses_below")
+
+SCREENER_PRESETS = {
+    "rsi_oversold": {"label": "RSI oversold", "rule": "RSI < 30"},
+    "rsi_overbought": {"label": "RSI overbought", "rule": "RSI > 70"},
+    "macd_bullish": {"label": "MACD bullish crossover", "rule": "MACD crosses_above MACD_signal"},
+    "macd_bearish": {"label": "MACD bearish crossover", "rule": "MACD crosses_below MACD_signal"},
+    "bb_breakout": {"label": "Bollinger breakout (upper band)", "rule": "close crosses_above BB_upper"},
+    "bb_breakdown": {"label": "Bollinger breakdown (lower band)", "rule": "close crosses_below BB_lower"},
+    "golden_cross": {"label": "SMA 20/50 golden cross", "rule": "SMA_20 crosses_above SMA_50"},
+}
+
+
+class Condition:
+    """`left op right`, where right is a column or a number.
+
+    Comparisons look at the latest bar; crossovers compare it with the bar
+    before. Bars with NaN in any referenced column never match.
+    """
+
+    def __init__(self, left: str, op: str, right: Union[str, float]):
+        if op not in COMPARISONS and op not in CROSSES:
+            raise ValueError(f"Unknown operator: {op}")
+        for column in (left, right):
+            if isinstance(column, str) and column not in COLUMN_INDEX:
+                raise ValueError(f"Unknown column: {column}")
+        self.left = left
+        self.op = op
+        self.right = right
+
+    def _operands(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        a = rows[:, COLUMN_INDEX[self.left]]
+        if isinstance(self.right, str):
+            return a, rows[:, COLUMN_INDEX[self.right]]
+        return a, np.full_like(a, self.right)
+
+    def evaluate(self, latest: np.ndarray, previous: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(match mask, signed relative margin) for every ticker at once"""
+        a, b = self._operands(latest)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if self.op in COMPARISONS:
+                mask = COMPARISONS[self.op](a, b)
+            else:
+                prev_a, prev_b = self._operands(previous)
+                if self.op == "crosses_above":
+                    mask = (prev_a <= prev_b) & (a > b)
+                else:
+                    mask = (prev_a >= prev_b) & (a < b)
+            # How far past the threshold, positive when the condition holds
+            below = self.op in ("<", "<=", "crosses_below")
+            margin = (b - a) if below else (a - b)
+            margin = np.where(b != 0, margin / np.abs(b), margin)
+        return mask, margin
+
+    def __str__(self):
+        right = self.right if isinstance(self.right, str) else f"{self.right:g}"
+        return f"{self.left} {self.op} {right}"
+
+
+class Rule:
+    """All conditions must hold; matches rank by the first condition's margin
+    unless rank_by names a column"""
+
+    def __init__(self, name: str, conditions: List[Condition], rank_by: Optional[str] = None,
+                 descending: bool = True):
+        if not conditions:
+            raise ValueError("A rule needs at least one condition")
+        if rank_by is not None and rank_by not in COLUMN_INDEX:
+            raise ValueError(f"Unknown column: {rank_by}")
+        self.name = name
+        self.conditions = conditions
+        self.rank_by = rank_by
+        self.descending = descending
+
+    @property
+    def columns(self) -> List[str]:
+        columns = []
+        for condition in self.conditions:
+            for column in (condition.left, condition.right):
+                if isinstance(column, str) and column not in columns:
+                    columns.append(column)
+        return columns
+
+    def evaluate(self, latest: np.ndarray, previous: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        mask = np.ones(len(latest), dtype=bool)
+        score = None
+        for condition in self.conditions:
+            condition_mask, margin = condition.evaluate(latest, previous)
+            mask &= condition_mask
+            if score is None:
+                score = margin
+        if self.rank_by is not None:
+            score = latest[:, COLUMN_INDEX[self.rank_by]]
+        return mask, score if self.descending else -score
+
+    def __str__(self):
+        return " and ".join(str(condition) for condition in self.conditions)
+
+
+def parse_rule(text: str, name: Optional[str] = None) -> Rule:
+    """'RSI < 30 and close > SMA_50' -> Rule"""
+    conditions = []
+    for part in re.split(r"\s+and\s+", text.strip(), flags=re.IGNORECASE):
+        match = re.fullmatch(r"\s*(\w+)\s*(<=|>=|<|>|crosses_above|crosses_below)\s*([\w.+-]+)\s*", part)
+        if not match:
+            raise ValueError(f"Can't parse condition: {part!r}")
+        left, op, right = match.groups()
+        try:
+            right = float(right)
+        except ValueError:
+            pass
+        conditions.append(Condition(left, op, right))
+    return Rule(name or text.strip(), conditions)
+
+
+def latest_indicator_rows(df: pd.DataFrame, columns: Optional[List[str]] = None,
+                          rows: int = 2) -> np.ndarray:
+    """Values for the last `rows` bars, as a (rows, len(SCREEN_COLUMNS)) array.
+
+    Only `columns` (every screen column when None) and their dependencies
+    are computed; the other indicator columns are NaN.
+    """
+    tail = compute_indicators(df, columns).reindex(columns=SCREEN_COLUMNS).to_numpy(np.float64)[-rows:]
+    if len(tail) < rows:
+        # A single bar has no previous one; crossovers can't match it
+        tail = np.vstack([np.full((rows - len(tail), len(SCREEN_COLUMNS)), np.nan), tail])
+    return tail
+
+
+def pool_context():
+    """Fork server where there is one, spawn elsewhere.
+
+    Workers then never fork from the threaded server process; a fork
+    server forks them from a clean single-threaded process with this
+    module (and pandas) already imported.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["screener"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class Screener:
+    """Runs rules over a ticker universe using the fetcher's cached bars.
+
+    Only the columns a rule uses are computed. Each ticker's latest rows
+    are kept per data version (for the max_entries most recently scanned),
+    so a rescan recomputes indicators only for tickers whose bars changed
+    or that lack a column. Rules are evaluated on the latest two bars of
+    all tickers at once. Large batches of recomputes go to a process pool
+    (at most MAX_POOL_PROCESSES by default), started on the first such
+    batch when more than one CPU is available; processes=0 keeps
+    everything in-process (e.g. on serverless hosts).
+    """
+
+    def __init__(self, fetcher, processes: Optional[int] = None, pool_threshold: int = 32,
+                 max_entries: int = 10_000):
+        self.fetcher = fetcher
+        self.processes = min(os.cpu_count() or 1, MAX_POOL_PROCESSES) if processes is None else processes
+        self.pool_threshold = pool_threshold
+        self.max_entries = max_entries
+        self._pool = None
+        # (asset type, ticker, timespan, days) -> (version, columns, rows), oldest first
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"scans": 0, "recomputed": 0, "reused": 0}
+
+    @staticmethod
+    def _version(df: pd.DataFrame) -> tuple:
+        return (len(df), int(df.index[-1].value), float(df["close"].iloc[-1]),
+                float(df["volume"].iloc[-1]))
+
+    def _pool_executor(self) -> ProcessPoolExecutor:
+        """The process pool, created on first use; workers come from the
+        pool context's fork server"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=pool_context())
+            return self._pool
+
+    def _compute(self, frames: List[pd.DataFrame], columns: List[List[str]]) -> List[np.ndarray]:
+        if self.processes > 1 and len(frames) >= self.pool_threshold:
+            chunksize = max(1, len(frames) // (self.processes * 4))
+            return list(self._pool_executor().map(latest_indicator_rows, frames, columns,
+                                                  chunksize=chunksize))
+        return [latest_indicator_rows(df, wanted) for df, wanted in zip(frames, columns)]
+
+    def latest_rows(self, asset_type: str, data_dict: Dict[str, pd.DataFrame], timespan: str,
+                    days_back: int, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Latest rows per ticker with `columns` (all screen columns when None),
+        recomputing only where bars changed or a column is missing"""
+        columns = frozenset(SCREEN_COLUMNS if columns is None else columns)
+        rows, stale = {}, []
+        for ticker, df in data_dict.items():
+            key = (asset_type, ticker, timespan, days_back)
+            version = self._version(df)
+            with self._lock:
+                cached = self._latest.get(key)
+                if cached is not None and cached[0] == version and columns <= cached[1]:
+                    self._latest.move_to_end(key)
+                    rows[ticker] = cached[2]
+                    self.stats["reused"] += 1
+                    continue
+            # Same bars, new columns: keep the ones already computed too
+            wanted = columns | cached[1] if cached is not None and cached[0] == version else columns
+            stale.append((key, ticker, version, wanted, df))
+
+        computed = self._compute([s[4] for s in stale], [sorted(s[3]) for s in stale])
+        with self._lock:
+            for (key, ticker, version, wanted, _), ticker_rows in zip(stale, computed):
+                self._latest[key] = (version, wanted, ticker_rows)
+                self._latest.move_to_end(key)
+                rows[ticker] = ticker_rows
+            while len(self._latest) > self.max_entries:
+                self._latest.popitem(last=False)
+            self.stats["recomputed"] += len(stale)
+        return rows
+
+    def scan(self, asset_type: str, tickers: List[str], rule: Rule, days_back: int = 120,
+             timespan: str = "day") -> pd.DataFrame:
+        """Ranked matches: one row per matching ticker, best first"""
+        self.stats["scans"] += 1
+        data_dict = self.fetcher.fetch_multiple(asset_type, tickers, days_back, timespan)
+        columns = ["close"] + [c for c in rule.columns if c != "close"]
+        rows = self.latest_rows(asset_type, data_dict, timespan, days_back,
+                                columns + ([rule.rank_by] if rule.rank_by else []))
+        if not rows:
+            return pd.DataFrame(columns=["ticker"] + columns + ["score"])
+
+        names = list(rows)
+        panel = np.stack([rows[name] for name in names])   # (tickers, 2, columns)
+        mask, score = rule.evaluate(panel[:, -1], panel[:, -2])
+        matches = np.flatnonzero(mask)
+        matches = matches[np.argsort(-score[matches], kind="stable")]
+
+        result = pd.DataFrame({"ticker": [names[i] for i in matches]})
+        for column in columns:
+            result[column] = panel[matches, -1, COLUMN_INDEX[column]]
+        result["score"] = score[matches]
+        return result
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,333 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+STREAM_URLS = {
+    "stock": "wss://socket.polygon.io/stocks",
+    "forex": "wss://socket.polygon.io/forex",
+    "crypto": "wss://socket.polygon.io/crypto",
+}
+
+# Tick channel per market: trades for stocks/crypto, quotes for forex
+TICK_CHANNELS = {"stock": "T", "forex": "C", "crypto": "XT"}
+BAR_CHANNELS = {"stock": "AM", "forex": "CA", "crypto": "XA"}
+
+
+def stream_symbol(asset_type: str, ticker: str) -> str:
+    """Dashboard ticker -> WebSocket symbol (AAPL, EUR/USD, BTC-USD)"""
+    if asset_type == "forex":
+        return f"{ticker[:3]}/{ticker[3:]}"
+    if asset_type == "crypto":
+        return f"{ticker[:-3]}-{ticker[-3:]}"
+    return ticker
+
+
+def normalize_symbol(symbol: str) -> str:
+    """WebSocket symbol -> dashboard ticker"""
+    return symbol.replace("/", "").replace("-", "")
+
+
+class TickAggregator:
+    """Builds OHLCV bars of any interval from ticks, in vectorized batches.
+
+    Ticks are appended to flat buffers; flush() sorts the whole batch once,
+    reduces every (symbol, bar) group with numpy reduceat and merges the
+    results into the bars already held for each symbol.
+    """
+
+    def __init__(self, interval_seconds: int = 60, max_bars: int = 5000):
+        self.interval_ms = int(interval_seconds * 1000)
+        self.max_bars = max_bars
+        self._codes = {}
+        self._symbols = []
+        self._buffer_codes = []
+        self._buffer_times = []
+        self._buffer_prices = []
+        self._buffer_sizes = []
+        # symbol -> {bar start ms: [open, high, low, close, volume, price*volume,
+        #                           trades, first tick ms, last tick ms]}
+        self._bars = {}
+        self._lock = threading.Lock()
+
+    def _code(self, symbol: str) -> int:
+        code = self._codes.get(symbol)
+        if code is None:
+            code = self._codes[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        return code
+
+    def add_tick(self, symbol: str, t: int, price: float, size: float):
+        with self._lock:
+            self._buffer_codes.append(self._code(symbol))
+            self._buffer_times.append(t)
+            self._buffer_prices.append(price)
+            self._buffer_sizes.append(size)
+
+    def add_bar(self, symbol: str, start: int, end: int, o: float, h: float, l: float,
+                c: float, v: float, vw: Optional[float] = None, n: int = 0):
+        """Merge a pre-aggregated bar (e.g. a per-minute AM event)"""
+        bucket = start // self.interval_ms * self.interval_ms
+        with self._lock:
+            self._merge(symbol, bucket, [o, h, l, c, v, (vw if vw is not None else c) * v,
+                                         n, start, end])
+
+    def flush(self) -> Dict[str, List[int]]:
+        """Aggregate buffered ticks; returns the bar starts touched per symbol"""
+        with self._lock:
+            if not self._buffer_times:
+                return {}
+            codes = np.array(self._buffer_codes, dtype=np.int64)
+            times = np.array(self._buffer_times, dtype=np.int64)
+            prices = np.array(self._buffer_prices, dtype=np.float64)
+            sizes = np.array(self._buffer_sizes, dtype=np.float64)
+            self._buffer_codes, self._buffer_times = [], []
+            self._buffer_prices, self._buffer_sizes = [], []
+
+            buckets = times // self.interval_ms * self.interval_ms
+            order = np.lexsort((times, buckets, codes))
+            codes, times, buckets = codes[order], times[order], buckets[order]
+            prices, sizes = prices[order], sizes[order]
+
+            change = np.empty(len(times), dtype=bool)
+            change[0] = True
+            change[1:] = (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])
+            starts = np.flatnonzero(change)
+            ends = np.append(starts[1:], len(times))
+
+            opens = prices[starts]
+            closes = prices[ends - 1]
+            highs = np.maximum.reduceat(prices, starts)
+            lows = np.minimum.reduceat(prices, starts)
+            volumes = np.add.reduceat(sizes, starts)
+            notionals = np.add.reduceat(prices * sizes, starts)
+            counts = ends - starts
+
+            touched = {}
+            for i, start in enumerate(starts):
+                symbol = self._symbols[codes[start]]
+                bucket = int(buckets[start])
+                self._merge(symbol, bucket, [opens[i], highs[i], lows[i], closes[i], volumes[i],
+                                             notionals[i], int(counts[i]), int(times[start]),
+                                             int(times[ends[i] - 1])])
+                touched.setdefault(symbol, []).append(bucket)
+            return touched
+
+    def _merge(self, symbol: str, bucket: int, update: list):
+        bars = self._bars.setdefault(symbol, {})
+        bar = bars.get(bucket)
+        if bar is None:
+            bars[bucket] = update
+            if len(bars) > self.max_bars:
+                del bars[min(bars)]
+            return
+        if update[7] < bar[7]:
+            bar[0], bar[7] = update[0], update[7]
+        if update[8] >= bar[8]:
+            bar[3], bar[8] = update[3], update[8]
+        bar[1] = max(bar[1], update[1])
+        bar[2] = min(bar[2], update[2])
+        bar[4] += update[4]
+        bar[5] += update[5]
+        bar[6] += update[6]
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return list(self._bars)
+
+    def bars_frame(self, symbol: str) -> Optional[pd.DataFrame]:
+        """Bars for a symbol in the same shape as aggregates_to_dataframe"""
+        with self._lock:
+            bars = self._bars.get(symbol)
+            if not bars:
+                return None
+            starts = np.array(sorted(bars), dtype=np.int64)
+            values = np.array([bars[start][:7] for start in starts], dtype=np.float64)
+        volume = values[:, 4]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vwap = np.where(volume > 0, values[:, 5] / volume, values[:, 3])
+        index = pd.DatetimeIndex(starts.view("datetime64[ms]"), name="datetime")
+        return pd.DataFrame({
+            "open": values[:, 0], "high": values[:, 1], "low": values[:, 2],
+            "close": values[:, 3], "volume": volume, "vwap": vwap,
+            "transactions": values[:, 6]
+        }, index=index)
+
+    def add_events(self, events: Iterable[Dict]) -> int:
+        """Feed decoded Polygon WebSocket events; returns how many were used"""
+        symbols, times, prices, sizes = [], [], [], []
+        used = 0
+        for event in events:
+            kind = event.get("ev")
+            if kind in ("T", "XT"):
+                symbols.append(event.get("sym") or event.get("pair", ""))
+                times.append(event["t"])
+                prices.append(event["p"])
+                sizes.append(event.get("s", 0))
+            elif kind == "C":
+                # Forex quotes: midpoint price, no traded size
+                symbols.append(event["p"])
+                times.append(event["t"])
+                prices.append((event["a"] + event["b"]) / 2)
+                sizes.append(0)
+            elif kind in ("AM", "A", "XA", "CA"):
+                symbol = normalize_symbol(event.get("sym") or event.get("pair", ""))
+                self.add_bar(symbol, event["s"], event.get("e", event["s"]), event["o"],
+                             event["h"], event["l"], event["c"], event.get("v", 0),
+                             event.get("vw"), event.get("z", 0))
+            else:
+                continue
+            used += 1
+
+        if times:
+            # One lock round-trip per message rather than per tick
+            with self._lock:
+                self._buffer_codes.extend(self._code(normalize_symbol(symbol)) for symbol in symbols)
+                self._buffer_times.extend(times)
+                self._buffer_prices.extend(prices)
+                self._buffer_sizes.extend(sizes)
+        return used
+
+
+class PolygonStream:
+    """Background WebSocket consumer feeding a TickAggregator.
+
+    Runs its own asyncio loop on a daemon thread, authenticates, keeps the
+    subscription set in sync and flushes the aggregator every
+    `flush_interval` seconds, notifying listeners of the bars that changed.
+    """
+
+    def __init__(self, api_key: str, asset_type: str = "stock", url: Optional[str] = None,
+                 interval_seconds: int = 60, flush_interval: float = 0.25,
+                 use_bar_channel: bool = False):
+        if websockets is None:
+            raise ImportError("PolygonStream requires the 'websockets' package")
+        self.api_key = api_key
+        self.asset_type = asset_type
+        self.url = url or STREAM_URLS[asset_type]
+        self.flush_interval = flush_interval
+        self.channel = BAR_CHANNELS[asset_type] if use_bar_channel else TICK_CHANNELS[asset_type]
+        self.aggregator = TickAggregator(interval_seconds)
+        self.stats = {"messages": 0, "events": 0, "connected_at": None, "last_message_at": None,
+                      "reconnects": 0}
+        self._tickers = set()
+        self._listeners = []
+        self._pending_subscriptions = []
+        self._subscription_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.connected = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add_listener(self, callback: Callable[[Dict[str, List[int]]], None]):
+        self._listeners.append(callback)
+
+    def subscribe(self, tickers: Iterable[str]):
+        with self._subscription_lock:
+            new = [ticker for ticker in tickers if ticker not in self._tickers]
+            self._tickers.update(new)
+            self._pending_subscriptions.extend(new)
+
+    def has_data(self, ticker: str) -> bool:
+        return ticker in self.aggregator.symbols()
+
+    def bars_frame(self, ticker: str) -> Optional[pd.DataFrame]:
+        return self.aggregator.bars_frame(ticker)
+
+    def is_fresh(self, max_age: float) -> bool:
+        """Connected, and heard from within the last max_age seconds"""
+        last = self.stats["last_message_at"]
+        return self.connected.is_set() and last is not None and time.time() - last < max_age
+
+    def _run_loop(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(self.url, max_size=None) as ws:
+                    await self._handshake(ws)
+                    self.stats["connected_at"] = self.stats["last_message_at"] = time.time()
+                    self.connected.set()
+                    backoff = 1.0
+                    # Resubscribe everything after a reconnect
+                    with self._subscription_lock:
+                        self._pending_subscriptions = list(self._tickers)
+                    await self._consume(ws)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                print(f"Stream {self.asset_type} disconnected: {e}. Reconnecting in {backoff:.0f}s...")
+                self.stats["reconnects"] += 1
+            finally:
+                self.connected.clear()
+                self._publish()
+            if self._stop.is_set():
+                break
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _handshake(self, ws):
+        await ws.send(json.dumps({"action": "auth", "params": self.api_key}))
+        while True:
+            events = json.loads(await ws.recv())
+            for event in events:
+                if event.get("ev") != "status":
+                    continue
+                if event.get("status") == "auth_success":
+                    return
+                if event.get("status") == "auth_failed":
+                    raise ConnectionError(event.get("message", "authentication failed"))
+
+    async def _consume(self, ws):
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            with self._subscription_lock:
+                pending, self._pending_subscriptions = self._pending_subscriptions, []
+            if pending:
+                params = ",".join(f"{self.channel}.{stream_symbol(self.asset_type, ticker)}"
+                                  for ticker in pending)
+                await ws.send(json.dumps({"action": "subscribe", "params": params}))
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                message = None
+            if message is not None:
+                events = json.loads(message)
+                self.stats["messages"] += 1
+                self.stats["last_message_at"] = time.time()
+                self.stats["events"] += self.aggregator.add_events(events)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._publish()
+                last_flush = time.monotonic()
+
+    def _publish(self):
+        touched = self.aggregator.flush()
+        if not touched:
+            return
+        for callback in self._listeners:
+            try:
+                callback(touched)
+            except Exception as e:
+                print(f"Stream listener failed: {e}")
@@ -2,6 +2,16 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 from typing import Dict, List, Optional
+from multi_ticker import align_closes
+from volume_profile import VolumeProfileEngine
+from profiling import profiled
+
+# Indicator columns each chart draws, so callers compute only those
+CHART_INDICATORS = {
+    "candlestick": ("SMA_20", "SMA_50", "BB_upper", "BB_lower"),
+    "technical": ("MACD", "MACD_signal", "MACD_histogram", "RSI"),
+    "volume_profile": (),
+}
 
 
 class ChartVisualizer:
@@ -12,7 +22,27 @@ class ChartVisualizer:
             'showlegend': True,
             'xaxis_rangeslider_visible': False
         }
+        # Per-session histograms are cached here and merged on each render
+        self.volume_profiles = VolumeProfileEngine()
+    
+    def warm_up(self):
+        """Build and serialize each chart once from a few synthetic bars.
+        Plotly imports its figure classes lazily on first use; this does
+        those imports up front instead of in request threads."""
+        index = pd.date_range("2024-01-01", periods=40, freq="D")
+        close = pd.Series(range(100, 140), index=index, dtype=float)
+        df = pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close,
+                           "volume": 1000.0, "MACD": 0.0, "MACD_signal": 0.0, "MACD_histogram": 0.0,
+                           "RSI": 50.0})
+        figures = [self.create_candlestick_chart(df, "WARMUP"),
+                   self.create_technical_indicators_chart(df, "WARMUP"),
+                   self.create_volume_profile_chart(df, "WARMUP"),
+                   self.create_comparison_chart({"A": df, "B": df * 2}),
+                   self.create_correlation_heatmap({"A": df, "B": df * 2})]
+        for fig in figures:
+            fig.to_json()
     
+    @profiled
     def create_candlestick_chart(self, df: pd.DataFrame, ticker: str) -> go.Figure:
         fig = go.Figure()
         
@@ -66,6 +96,7 @@ class ChartVisualizer:
         
         return fig
     
+    @profiled
     def create_technical_indicators_chart(self, df: pd.DataFrame, ticker: str) -> go.Figure:
         fig = make_subplots(
             rows=4, cols=1,
@@ -144,6 +175,7 @@ class ChartVisualizer:
         
         return fig
     
+    @profiled
     def create_comparison_chart(self, data_dict: Dict[str, pd.DataFrame]) -> go.Figure:
         fig = go.Figure()
         
@@ -166,7 +198,9 @@ class ChartVisualizer:
         
         return fig
     
-    def create_volume_profile_chart(self, df: pd.DataFrame, ticker: str, bins: int = 30) -> go.Figure:
+    @profiled
+    def create_volume_profile_chart(self, df: pd.DataFrame, ticker: str, bins: int = 30,
+                                    spread_volume: bool = True) -> go.Figure:
         fig = make_subplots(
             rows=1, cols=2,
             column_widths=[0.7, 0.3],
@@ -183,12 +217,12 @@ class ChartVisualizer:
             name='Price'
         ), row=1, col=1)
         
-        price_range = pd.cut(df['close'], bins=bins)
-        volume_profile = df.groupby(price_range)['volume'].sum()
+        price_levels, volumes = self.volume_profiles.profile(df, ticker, bins=bins,
+                                                             spread=spread_volume)
         
         fig.add_trace(go.Bar(
-            x=volume_profile.values,
-            y=[interval.mid for interval in volume_profile.index],
+            x=volumes,
+            y=price_levels,
             orientation='h',
             name='Volume Profile',
             marker_color='cyan'
@@ -208,12 +242,11 @@ class ChartVisualizer:
         
         return fig
     
-    def create_correlation_heatmap(self, data_dict: Dict[str, pd.DataFrame]) -> go.Figure:
-        close_prices = pd.DataFrame({
-            ticker: df['close'] for ticker, df in data_dict.items()
-        })
-        
-        correlation_matrix = close_prices.corr()
+    @profiled
+    def create_correlation_heatmap(self, data_dict: Dict[str, pd.DataFrame],
+                                   correlation_matrix: Optional[pd.DataFrame] = None) -> go.Figure:
+        if correlation_matrix is None:
+            correlation_matrix = align_closes(data_dict).to_frame().corr()
         
         fig = go.Figure(data=go.Heatmap(
             z=correlation_matrix.values,
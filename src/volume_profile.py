@@ -0,0 +1,162 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+def price_step(price: float, resolution: float = 0.0005) -> float:
+    """A 1/2/5 x 10^k price step close to `resolution` of the price.
+
+    Rounding to a nice number keeps the fine grid identical across renders,
+    which is what lets per-session histograms be cached and merged.
+    """
+    target = abs(price) * resolution
+    if not target or not math.isfinite(target):
+        return 0.01
+    magnitude = 10 ** math.floor(math.log10(target))
+    for factor in (5, 2, 1):
+        if factor * magnitude <= target:
+            return factor * magnitude
+    return magnitude
+
+
+def session_histogram(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                      volume: np.ndarray, step: float,
+                      spread: bool = True) -> Tuple[int, np.ndarray]:
+    """Volume per price bin on a fixed grid of width `step`.
+
+    Returns (first_bin, volumes) where bin b covers [b*step, (b+1)*step).
+    With spread=False each bar's volume goes to its close bin; otherwise it
+    is spread uniformly over the bar's low-high range.
+    """
+    if not spread:
+        bins = np.floor(close / step).astype(np.int64)
+        first = int(bins.min())
+        return first, np.bincount(bins - first, weights=volume)
+
+    lo = np.floor(low / step).astype(np.int64)
+    hi = np.floor(high / step).astype(np.int64)
+    first = int(lo.min())
+    size = int(hi.max()) - first + 1
+    lo -= first
+    hi -= first
+
+    span = high - low
+    single = (hi == lo) | (span <= 0)
+    counts = np.bincount(lo[single], weights=volume[single], minlength=size).astype(np.float64)
+
+    multi = ~single
+    if multi.any():
+        lo_m, hi_m = lo[multi], hi[multi]
+        density = volume[multi] / span[multi]
+        # Partial first and last bins
+        first_edge = (lo_m + first + 1) * step
+        last_edge = (hi_m + first) * step
+        counts += np.bincount(lo_m, weights=density * (first_edge - low[multi]), minlength=size)
+        counts += np.bincount(hi_m, weights=density * (high[multi] - last_edge), minlength=size)
+        # Whole bins strictly inside the range, via a difference array
+        full = density * step
+        diff = np.bincount(lo_m + 1, weights=full, minlength=size + 1)
+        diff -= np.bincount(hi_m, weights=full, minlength=size + 1)
+        counts += np.cumsum(diff)[:size]
+    return first, counts
+
+
+def merge_histograms(histograms: Iterable[Tuple[int, np.ndarray]]) -> Tuple[int, np.ndarray]:
+    """Sum histograms that share a grid but cover different bin ranges"""
+    histograms = [h for h in histograms if len(h[1])]
+    if not histograms:
+        return 0, np.zeros(0)
+    first = min(start for start, _ in histograms)
+    last = max(start + len(counts) for start, counts in histograms)
+    merged = np.zeros(last - first)
+    for start, counts in histograms:
+        merged[start - first:start - first + len(counts)] += counts
+    return first, merged
+
+
+def rebin(first: int, counts: np.ndarray, step: float, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Collapse a fine histogram into about `bins` display bins (midpoints, volumes)"""
+    nonzero = np.flatnonzero(counts)
+    if not len(nonzero):
+        return np.zeros(0), np.zeros(0)
+    counts = counts[nonzero[0]:nonzero[-1] + 1]
+    first += int(nonzero[0])
+    width = max(1, math.ceil(len(counts) / bins))
+    padded = np.zeros(math.ceil(len(counts) / width) * width)
+    padded[:len(counts)] = counts
+    volumes = padded.reshape(-1, width).sum(axis=1)
+    mids = (first + width * (np.arange(len(volumes)) + 0.5)) * step
+    return mids, volumes
+
+
+class VolumeProfileEngine:
+    """Per-session volume histograms, cached and merged for any window.
+
+    Sessions are UTC calendar days. A session's histogram is keyed by its
+    ticker, bar spacing, day, grid and a fingerprint of its bars, so closed sessions are
+    binned once and only the forming session is recomputed on each render.
+    """
+
+    def __init__(self, max_sessions: int = 20_000):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "binned": 0}
+
+    def profile(self, df: pd.DataFrame, ticker: str, bins: int = 30,
+                spread: bool = True, step: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if df.empty:
+            return np.zeros(0), np.zeros(0)
+        if step is None:
+            step = price_step(float(df['close'].iloc[-1]))
+
+        stamps = np.asarray(df.index.values.astype("datetime64[ns]")).view("i8")
+        high = df['high'].to_numpy(dtype="f8")
+        low = df['low'].to_numpy(dtype="f8")
+        close = df['close'].to_numpy(dtype="f8")
+        volume = np.nan_to_num(df['volume'].to_numpy(dtype="f8"))
+
+        # Bar spacing keeps e.g. 1-minute and 15-minute sessions apart in the cache
+        interval = int(np.diff(stamps).min()) if len(stamps) > 1 else 0
+        days = stamps // NS_PER_DAY
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(days)]))
+
+        histograms = []
+        for start, end in zip(starts, ends):
+            fingerprint = (end - start, int(stamps[end - 1]), float(volume[start:end].sum()))
+            key = (ticker, interval, int(days[start]), step, spread)
+            histograms.append(self._session(key, fingerprint, high[start:end], low[start:end],
+                                            close[start:end], volume[start:end], step, spread))
+
+        first, merged = merge_histograms(histograms)
+        return rebin(first, merged, step, bins)
+
+    def _session(self, key, fingerprint, high, low, close, volume, step, spread):
+        with self._lock:
+            cached = self._sessions.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                self._sessions.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached[1]
+
+        histogram = session_histogram(high, low, close, volume, step, spread)
+
+        with self._lock:
+            self.stats["binned"] += 1
+            self._sessions[key] = (fingerprint, histogram)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return histogram
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
@@ -0,0 +1,83 @@
+"""Checks columnar aggregate parsing against the old DataFrame parser, and snapshot bars."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from aggregate_bars import AggregateBars
+from benchmark import legacy_aggregates_to_dataframe
+from polygon_client import CacheManager, PolygonClient
+from polygon_stub import make_bars
+
+
+@pytest.fixture
+def client(tmp_path):
+    return PolygonClient(["key"], cache=CacheManager(cache_dir=str(tmp_path)))
+
+
+def test_frames_match_the_old_parser():
+    response = {"results": make_bars(500)}
+    # Volume is float64 throughout, where the old parser kept the JSON's ints
+    legacy = legacy_aggregates_to_dataframe(response).astype({"volume": np.float64})
+    frame = AggregateBars.from_response(response).to_dataframe()
+    pd.testing.assert_frame_equal(frame, legacy, check_index_type=False)  # ms vs ns on pandas 2
+
+    # Forex bars: no vwap or transactions on some bars, NaN as before
+    for bar in response["results"][::7]:
+        del bar["vw"], bar["n"]
+    legacy = legacy_aggregates_to_dataframe(response).astype({"volume": np.float64})
+    frame = AggregateBars.from_response(response).to_dataframe()
+    pd.testing.assert_frame_equal(frame, legacy, check_index_type=False)
+    assert frame["transactions"].isna().sum() == len(response["results"][::7])
+    assert AggregateBars.from_response({"results": []}) is None
+
+
+def test_compact_columns():
+    results = make_bars(100)
+    bars = AggregateBars.from_results(results, compact=True)
+    assert bars["close"].dtype == np.float32 and bars["transactions"].dtype == np.int32
+    assert bars["volume"].dtype == np.int64
+    assert bars.nbytes < AggregateBars.from_results(results).nbytes
+
+    results[3]["v"] = 0.125  # Crypto volume keeps its fractional units
+    assert AggregateBars.from_results(results, compact=True)["volume"][3] == 0.125
+
+
+def test_shared_arrays_are_never_written_through_a_frame(client):
+    bars = AggregateBars.from_results(make_bars(10))
+    view = bars.to_dataframe()
+    with pytest.raises(ValueError):
+        view.loc[view.index[0], "close"] = 0.0
+    copied = bars.to_dataframe(copy=True)
+    copied.loc[copied.index[0], "close"] = 0.0
+    assert bars["close"][0] == 100.0
+
+    # Parsed responses belong to their frame alone, which stays writable
+    frame = client.aggregates_to_dataframe({"results": make_bars(10)})
+    frame.loc[frame.index[0], "close"] = 0.0
+    frame["close"] *= 2
+    assert frame["close"].iloc[:2].tolist() == [0.0, 201.0]
+
+
+def test_snapshot_to_bar(client):
+    minute = {"o": 10.0, "h": 10.5, "l": 9.8, "c": 10.2, "v": 300, "vw": 10.1, "n": 12,
+              "t": 1_700_000_040_000}
+    bar = client.snapshot_to_bar({"ticker": {"min": minute, "lastTrade": {"p": 10.7}}})
+    # The last trade moves the close, and the high with it
+    assert bar == {"t": 1_700_000_040_000, "open": 10.0, "high": 10.7, "low": 9.8,
+                   "close": 10.7, "volume": 300, "vwap": 10.1, "transactions": 12}
+
+    # Forex: quote midpoint, and a bar started at the update's minute
+    quote = {"lastQuote": {"a": 1.1002, "b": 1.1000}, "updated": 1_700_000_075_000_000_000}
+    bar = client.snapshot_to_bar({"ticker": quote})
+    assert bar["t"] == 1_700_000_040_000
+    assert bar["open"] == bar["high"] == bar["low"] == bar["close"] == pytest.approx(1.1001)
+    assert bar["volume"] == 0 and bar["transactions"] == 0
+
+    assert client.snapshot_to_bar({"ticker": {"min": minute}})["close"] == 10.2
+    assert client.snapshot_to_bar({"ticker": {"min": {}}}) is None
+    assert client.snapshot_to_bar(None) is None
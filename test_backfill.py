@@ -0,0 +1,64 @@
+"""Checks the chunk planner and that chunked backfills spread across the key pool."""
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from data_fetcher import AGGREGATE_LIMIT, BASE_BARS_PER_DAY, DataFetcher, parse_timespan, plan_chunks
+from polygon_client import CacheManager
+from polygon_stub import start_stub
+
+
+def test_parse_timespan():
+    assert parse_timespan("day") == (1, "day")
+    assert parse_timespan("5minute") == (5, "minute")
+    assert parse_timespan("15minute") == (15, "minute")
+
+
+def test_chunks_cover_range_under_limit_and_align_to_grid():
+    chunks = plan_chunks("2023-03-15", "2024-03-14", "hour")
+    assert chunks[-1][1] == "2024-03-14"
+    assert date.fromisoformat(chunks[0][0]) <= date(2023, 3, 15)
+    for (_, end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert date.fromisoformat(end) + timedelta(days=1) == date.fromisoformat(next_start)
+    for start, end in chunks:
+        days = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+        assert days * BASE_BARS_PER_DAY["hour"] <= AGGREGATE_LIMIT
+
+    # An overlapping request plans the same interior chunks, so they hit the cache
+    shifted = plan_chunks("2023-05-01", "2024-03-14", "hour")
+    assert set(chunks[2:-1]) <= set(shifted)
+    # Daily bars never need splitting
+    assert plan_chunks("2000-01-01", "2024-12-31", "day") == [("2000-01-01", "2024-12-31")]
+
+
+def test_backfill_runs_chunks_in_parallel_and_skips_cached(tmp_path):
+    server, url = start_stub(latency=0.3, bars=50000)
+    try:
+        fetcher = DataFetcher([f"key{i}" for i in range(4)], cache=CacheManager(cache_dir=str(tmp_path)))
+        fetcher.client.base_url = url
+        fetcher.client.scheduler.min_interval = 0
+
+        start = time.perf_counter()
+        # Crypto trades every day, so no calendar clipping gets in the way
+        df = fetcher.fetch_crypto_data("BTCUSD", timespan="hour", from_date="2024-01-01",
+                                       to_date="2024-06-30")
+        elapsed = time.perf_counter() - start
+        chunks = plan_chunks("2024-01-01", "2024-06-30", "hour")
+        assert len(chunks) >= 4
+        assert server.state.total_requests() == len(chunks)
+        # Serial would take len(chunks) * latency
+        assert elapsed < len(chunks) * 0.3 * 0.75
+        assert df.index.is_monotonic_increasing and df.index.is_unique
+        assert str(df.index[0].date()) == "2024-01-01" and str(df.index[-1].date()) == "2024-06-30"
+        assert len(df) == 182 * 24
+
+        df_again = fetcher.fetch_crypto_data("BTCUSD", timespan="hour", from_date="2024-02-01",
+                                             to_date="2024-06-30")
+        assert server.state.total_requests() == len(chunks)
+        assert str(df_again.index[0].date()) == "2024-02-01"
+        assert fetcher.backfill_stats["cached"] >= 4
+    finally:
+        server.shutdown()
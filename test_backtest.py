@@ -0,0 +1,99 @@
+"""Checks the vectorized backtester against pandas indicators and a bar-by-bar loop."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from backtest import (STRATEGIES, ema, evaluate_positions, make_grid, rolling_mean, rolling_std,
+                      rsi, sweep)
+from data_fetcher import calculate_technical_indicators
+
+
+@pytest.fixture
+def close():
+    rng = np.random.default_rng(5)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 600)))
+
+
+def test_indicators_match_pandas(close):
+    series = pd.Series(close)
+    np.testing.assert_allclose(rolling_mean(close, [20])[:, 0], series.rolling(20).mean(), rtol=1e-9)
+    np.testing.assert_allclose(rolling_std(close, [20])[:, 0], series.rolling(20).std(), rtol=1e-7)
+    np.testing.assert_allclose(ema(close, [12])[:, 0], series.ewm(span=12, adjust=False).mean(), rtol=1e-12)
+    frame = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1.0})
+    np.testing.assert_allclose(rsi(close, [14])[:, 0], calculate_technical_indicators(frame)["RSI"],
+                               rtol=1e-9)
+
+
+def test_sma_cross_matches_bar_by_bar_loop(close):
+    commission = 0.001
+    result = sweep(close, "sma_cross", grid={"fast": [10], "slow": [30]}, commission=commission).best
+
+    fast = pd.Series(close).rolling(10).mean().to_numpy()
+    slow = pd.Series(close).rolling(30).mean().to_numpy()
+    equity, position, trades = 1.0, 0.0, 0
+    for t in range(1, len(close)):
+        previous = position
+        position = 1.0 if fast[t - 1] > slow[t - 1] else 0.0
+        if position != previous:
+            trades += 1
+            equity *= 1 - commission
+        equity *= 1 + position * (close[t] / close[t - 1] - 1)
+    # Commission is taken from the same bar's return rather than compounded
+    # separately, so allow a tiny difference
+    assert result["trades"] == trades
+    assert result["total_return"] == pytest.approx(equity - 1, rel=1e-3)
+
+
+def test_commission_only_lowers_returns(close):
+    positions = np.where(np.arange(len(close)) % 10 < 5, 1.0, 0.0)[:, None]
+    free = evaluate_positions(close, positions, commission=0.0)
+    paid = evaluate_positions(close, positions, commission=0.001)
+    assert paid["total_return"][0] < free["total_return"][0]
+    assert paid["trades"][0] == free["trades"][0]
+
+
+def test_batching_does_not_change_results(close):
+    grid = {"fast": range(5, 40), "slow": range(10, 80, 5)}
+    whole = sweep(close, "sma_cross", grid=grid).results
+    batched = sweep(close, "sma_cross", grid=grid, max_cells=len(close) * 7).results
+    pd.testing.assert_frame_equal(whole, batched)
+    # Batches on pool workers (fork server or spawn, never a fork of this process)
+    pooled = sweep(close, "sma_cross", grid=grid, max_cells=len(close) * 100, processes=2).results
+    pd.testing.assert_frame_equal(whole, pooled)
+
+
+@pytest.mark.parametrize("strategy", ["rsi", "bollinger"])
+def test_mean_reversion_strategies_short_the_opposite_signal(close, strategy):
+    params = make_grid(strategy)
+    positions = STRATEGIES[strategy]["positions"]
+    long_only, both = positions(close, params), positions(close, params, short=True)
+    assert set(np.unique(long_only)) == {0.0, 1.0}
+    assert set(np.unique(both)) == {-1.0, 0.0, 1.0}
+    # Long legs are unchanged; shorts only replace time spent flat
+    np.testing.assert_array_equal(both == 1.0, long_only == 1.0)
+
+    # Bar-by-bar for one parameter set
+    column = len(params) // 2
+    if strategy == "rsi":
+        values = rsi(close, [params[column, 0]])[:, 0]
+        signals = values < params[column, 1], values > params[column, 2], \
+            values > params[column, 2], values < params[column, 1]
+    else:
+        series = pd.Series(close).rolling(int(params[column, 0]))
+        middle, width = series.mean().to_numpy(), params[column, 1] * series.std().to_numpy()
+        signals = close < middle - width, close > middle, close > middle + width, close < middle
+    position, expected = 0.0, []
+    for enter, exit, enter_short, exit_short in zip(*signals):
+        if (position > 0 and exit) or (position < 0 and exit_short):
+            position = 0.0
+        if position == 0 and enter:
+            position = 1.0
+        elif position == 0 and enter_short:
+            position = -1.0
+        expected.append(position)
+    np.testing.assert_array_equal(both[:, column], expected)
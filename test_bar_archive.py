@@ -0,0 +1,120 @@
+"""Checks the memory-mapped bar archive: range slicing, appends, merges and serving DataFetcher ranges without API calls."""
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from bar_archive import BarArchive
+from market_calendar import get_calendar
+
+
+def minute_bars(start, end):
+    index = pd.date_range(start, end, freq="min", inclusive="left", unit="ms", name="datetime")
+    close = np.arange(len(index), dtype=np.float64)
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close,
+                         "volume": 100.0, "vwap": np.nan, "transactions": 3}, index=index)
+
+
+def test_ranges_are_zero_copy_slices(tmp_path):
+    archive = BarArchive(str(tmp_path))
+    bars = minute_bars("2024-01-01", "2024-01-11")
+    assert archive.store("X:BTCUSD", "minute", bars, "2024-01-01", "2024-01-10") == len(bars)
+
+    view, archived_to = archive.read("X:BTCUSD", "minute", "2024-01-03", "2024-01-04")
+    df = view.to_dataframe()
+    pd.testing.assert_frame_equal(df, bars.loc["2024-01-03":"2024-01-04"], check_freq=False)
+    assert archived_to == "2024-01-04"
+    assert np.shares_memory(df["close"].to_numpy(), archive._maps[("X:BTCUSD", "minute")].records)
+    # Ranges past the archive stop at its last day; ranges before it miss
+    assert archive.read("X:BTCUSD", "minute", "2024-01-09", "2024-02-01")[1] == "2024-01-10"
+    assert archive.read("X:BTCUSD", "minute", "2023-12-31", "2024-01-02") is None
+
+
+def test_appends_and_merges_keep_one_contiguous_series(tmp_path):
+    archive = BarArchive(str(tmp_path))
+    archive.store("X:BTCUSD", "minute", minute_bars("2024-01-05", "2024-01-08"), "2024-01-05", "2024-01-07")
+    # Overlapping newer range: only bars past the last one are appended
+    assert archive.store("X:BTCUSD", "minute", minute_bars("2024-01-07", "2024-01-09"),
+                         "2024-01-07", "2024-01-08") == 1440
+    assert archive.stats["rewrites"] == 1
+    # Older range: merged in by a rewrite
+    assert archive.store("X:BTCUSD", "minute", minute_bars("2024-01-03", "2024-01-06"),
+                         "2024-01-03", "2024-01-05") == 2 * 1440
+    assert archive.coverage("X:BTCUSD", "minute") == ("2024-01-03", "2024-01-08")
+    t = archive.read("X:BTCUSD", "minute", "2024-01-03", "2024-01-08")[0].t
+    assert len(t) == 6 * 1440 and np.all(np.diff(t) == 60_000)
+
+    # Bytes past the published count (an interrupted append) are invisible
+    with open(archive._path("X:BTCUSD", "minute"), "ab") as f:
+        f.write(b"\xff" * 100)
+    assert len(BarArchive(str(tmp_path)).read("X:BTCUSD", "minute", "2024-01-03", "2024-01-08")[0]) == 6 * 1440
+
+
+def test_stock_days_end_with_the_post_market_session(tmp_path):
+    archive, calendar = BarArchive(str(tmp_path)), get_calendar("stock")
+    # Friday 2024-01-05, 04:00 to 20:00 Eastern (EST): 09:00 to 01:00 UTC the next day
+    sessions = pd.concat([minute_bars("2024-01-05 09:00", "2024-01-06 01:00"),
+                          minute_bars("2024-01-08 09:00", "2024-01-09 01:00")])
+    assert archive.store("AAPL", "minute", sessions, "2024-01-05", "2024-01-08", calendar) == 2 * 16 * 60
+
+    df = archive.read("AAPL", "minute", "2024-01-05", "2024-01-05", calendar)[0].to_dataframe()
+    assert df.index[-1] == pd.Timestamp("2024-01-06 00:59")  # 19:59 Eastern
+    df = archive.read("AAPL", "minute", "2024-01-05", "2024-01-08", calendar)[0].to_dataframe()
+    assert len(df) == 2 * 16 * 60 and df.index[0] == pd.Timestamp("2024-01-05 09:00")
+
+@pytest.fixture
+def archived_fetcher(make_stub_fetcher, tmp_path):
+    return make_stub_fetcher(bars=500, archive_dir=str(tmp_path / "bars"))
+
+
+def test_fetcher_reads_archived_days_and_fetches_only_the_rest(archived_fetcher):
+    fetcher, server = archived_fetcher
+    first = fetcher.fetch_crypto_data("BTCUSD", timespan="day", from_date="2024-01-01", to_date="2024-03-31")
+    assert fetcher.archive.coverage("X:BTCUSD", "day") == ("2024-01-01", "2024-03-31")
+    fetcher.client.cache.clear()
+
+    calls = server.state.total_requests()
+    again = fetcher.fetch_crypto_data("BTCUSD", timespan="day", from_date="2024-02-01", to_date="2024-03-31")
+    assert server.state.total_requests() == calls
+    pd.testing.assert_frame_equal(again, first.loc["2024-02-01":])
+
+    # Only April is fetched, then appended
+    later = fetcher.fetch_crypto_data("BTCUSD", timespan="day", from_date="2024-03-01", to_date="2024-04-30")
+    assert server.state.total_requests() == calls + 1
+    assert len(later) == 61 and later.index.is_monotonic_increasing
+    assert fetcher.archive.coverage("X:BTCUSD", "day") == ("2024-01-01", "2024-04-30")
+    assert fetcher.pending_requests("crypto", "BTCUSD", 30, "day") == 1  # The unsettled tail
+
+
+def test_weekends_do_not_break_stock_coverage(archived_fetcher):
+    fetcher, _ = archived_fetcher
+    fetcher.fetch_stock_data("AAPL", timespan="day", from_date="2024-01-02", to_date="2024-01-05")
+    fetcher.fetch_stock_data("AAPL", timespan="day", from_date="2024-01-08", to_date="2024-01-12")
+    assert fetcher.archive.coverage("AAPL", "day") == ("2024-01-02", "2024-01-12")
+    assert fetcher.archive.stats["rewrites"] == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs fork")
+def test_a_child_forked_mid_write_can_still_write(tmp_path):
+    archive = BarArchive(str(tmp_path))
+    with archive._lock:  # Another thread is storing bars at the time of the fork
+        pid = os.fork()
+        if pid == 0:
+            bars = minute_bars("2024-01-01", "2024-01-02")
+            os._exit(0 if archive.store("X:BTCUSD", "minute", bars, "2024-01-01", "2024-01-01") else 1)
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            assert os.waitstatus_to_exitcode(status) == 0
+            return
+        time.sleep(0.01)
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+    raise AssertionError("The forked process waited on the parent's lock")
@@ -0,0 +1,133 @@
+"""Checks ETag revalidation, gzip negotiation, the response cache and query validation in the bars API."""
+import gzip
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from bars_api import MAX_DAYS, ResponseCache, accepts_gzip, create_bars_api
+
+
+class FakeFetcher:
+    def __init__(self):
+        self.calls = 0
+        index = pd.date_range("2024-01-02", periods=30, freq="D", name="datetime")
+        close = np.linspace(100, 130, 30)
+        self.df = pd.DataFrame({
+            "open": close - 1, "high": close + 1, "low": close - 2, "close": close,
+            "volume": np.full(30, 1000.0), "vwap": close, "transactions": np.full(30, 10.0)
+        }, index=index)
+
+    def fetch_data(self, asset_type, ticker, days_back, timespan, from_date=None, to_date=None):
+        self.calls += 1
+        return self.df
+
+    def calculate_technical_indicators(self, df):
+        return df.assign(SMA_20=df["close"].rolling(window=20, min_periods=1).mean())
+
+
+def make_client():
+    fetcher = FakeFetcher()
+    server = Flask(__name__)
+    server.register_blueprint(create_bars_api(fetcher))
+    return server.test_client(), fetcher
+
+
+URL = "/api/v1/bars/stock/AAPL?from=2024-01-02&to=2024-01-31"
+
+
+def test_etag_revalidation():
+    client, fetcher = make_client()
+    first = client.get(URL)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('"')
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        again = client.get(URL, headers={"If-None-Match": header})
+        assert again.status_code == 304 and again.data == b""
+        assert again.headers["ETag"] == etag and again.headers["Vary"] == "Accept-Encoding"
+
+    # New bars mean a new tag
+    fetcher.df.loc[fetcher.df.index[-1], "close"] += 1
+    changed = client.get(URL, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    # Bars and indicators of the same data are different bodies
+    indicators = client.get(URL.replace("/bars/", "/indicators/"))
+    assert indicators.headers["ETag"] != changed.headers["ETag"]
+
+
+def test_gzip_is_negotiated_with_its_own_etag():
+    client, _ = make_client()
+    plain = client.get(URL)
+    zipped = client.get(URL, headers={"Accept-Encoding": "gzip, deflate"})
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert plain.headers["Vary"] == zipped.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert json.loads(plain.data)["columns"]["close"][0] == 100.0
+
+    plain_tag, zipped_tag = plain.headers["ETag"], zipped.headers["ETag"]
+    assert zipped_tag == plain_tag[:-1] + '-gzip"'
+    # A tag only revalidates the encoding it was issued for
+    assert client.get(URL, headers={"If-None-Match": plain_tag}).status_code == 304
+    assert client.get(URL, headers={"If-None-Match": plain_tag,
+                                    "Accept-Encoding": "gzip"}).status_code == 200
+    assert client.get(URL, headers={"If-None-Match": zipped_tag,
+                                    "Accept-Encoding": "gzip"}).status_code == 304
+
+
+def test_accept_encoding_quality_values_are_honoured():
+    assert accepts_gzip("gzip") and accepts_gzip("deflate, gzip;q=0.5") and accepts_gzip("*")
+    assert accepts_gzip("GZIP ; Q=1.0") and accepts_gzip("x-gzip")
+    assert not accepts_gzip(None) and not accepts_gzip("") and not accepts_gzip("identity")
+    assert not accepts_gzip("gzip;q=0") and not accepts_gzip("gzip;q=0.000, deflate")
+    # An explicit coding overrides the wildcard either way
+    assert not accepts_gzip("*, gzip;q=0") and accepts_gzip("*;q=0, gzip")
+    assert not accepts_gzip("*;q=0")
+
+    client, _ = make_client()
+    refused = client.get(URL, headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "Content-Encoding" not in refused.headers
+    assert json.loads(refused.data)["columns"]["close"][0] == 100.0
+
+
+def test_response_cache_is_bounded_by_body_size():
+    cache = ResponseCache(max_bytes=100)
+    cache.set("a", b"x" * 40)
+    cache.set("b", b"x" * 40)
+    assert cache.get("a") is not None  # a is now the most recent
+    cache.set("c", b"x" * 40)
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+    assert cache.total_bytes == 80
+    # Replacing an entry does not count it twice; oversized bodies are not kept
+    cache.set("c", b"x" * 50)
+    assert cache.total_bytes == 90
+    cache.set("huge", b"x" * 101)
+    assert cache.get("huge") is None and cache.total_bytes == 90
+
+
+def test_invalid_queries_are_rejected_before_fetching():
+    client, fetcher = make_client()
+    cases = {
+        "/api/v1/bars/bonds/AAPL": 404,
+        "/api/v1/bars/stock/AAPL?timespan=year": 400,
+        "/api/v1/bars/stock/AAPL?days=0": 400,
+        f"/api/v1/bars/stock/AAPL?timespan=minute&days={MAX_DAYS['minute'] + 1}": 400,
+        "/api/v1/bars/stock/AAPL?timespan=minute&from=2023-01-01&to=2023-12-31": 400,
+        "/api/v1/bars/stock/AAPL?timespan=minute&from=2023-01-01": 400,
+        "/api/v1/bars/stock/AAPL?from=2024-13-01": 400,
+        "/api/v1/bars/stock/AAPL?format=csv": 400,
+    }
+    for url, status in cases.items():
+        response = client.get(url)
+        assert response.status_code == status, url
+        assert "error" in response.get_json()
+    assert fetcher.calls == 0
+
+    assert client.get(f"/api/v1/bars/stock/AAPL?timespan=day&days={MAX_DAYS['day']}").status_code == 200
+    assert client.get("/api/v1/bars/stock/AAPL?timespan=minute&from=2024-01-01&to=2024-01-30").status_code == 200
@@ -0,0 +1,54 @@
+"""Checks that both cache backends honor expiry, final entries and invalidation."""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from polygon_client import CacheManager
+
+PARAMS = {"adjusted": "true", "sort": "asc", "limit": 50000}
+
+
+def aggs_url(ticker, timespan="day", to_date="2024-01-31"):
+    return f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/1/{timespan}/2024-01-01/{to_date}"
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def cache(request, tmp_path):
+    return CacheManager(cache_dir=str(tmp_path), ttl_minutes=5, backend=request.param)
+
+
+def test_round_trip_and_expiry(cache):
+    cache.set(aggs_url("AAPL"), PARAMS, {"results": [1, 2, 3]})
+    assert cache.get(aggs_url("AAPL"), PARAMS) == {"results": [1, 2, 3]}
+    assert cache.get(aggs_url("AAPL"), {"limit": 1}) is None
+
+    cache.ttl_minutes = -1  # Entries written now are already expired
+    cache.set(aggs_url("MSFT"), PARAMS, {"results": []})
+    assert cache.get(aggs_url("MSFT"), PARAMS) is None
+    assert cache.get(aggs_url("MSFT"), PARAMS, allow_stale=True) == {"results": []}
+
+
+def test_final_entries_never_expire_and_survive_sweeps(cache):
+    cache.ttl_minutes = -1
+    cache.set(aggs_url("AAPL", to_date="2023-12-29"), PARAMS, {"final": True}, final=True)
+    cache.set(aggs_url("AAPL"), PARAMS, {"final": False})
+    assert cache.get(aggs_url("AAPL", to_date="2023-12-29"), PARAMS) == {"final": True}
+
+    assert cache.sweep(grace_minutes=0) == 1
+    assert cache.get(aggs_url("AAPL", to_date="2023-12-29"), PARAMS) == {"final": True}
+    assert cache.get(aggs_url("AAPL"), PARAMS, allow_stale=True) is None
+
+
+def test_invalidate_by_ticker_and_timespan(cache):
+    for ticker in ("AAPL", "X:BTCUSD"):
+        for timespan in ("day", "minute"):
+            cache.set(aggs_url(ticker, timespan), PARAMS, {"t": ticker})
+    assert cache.invalidate("X:BTCUSD", "minute") == 1
+    assert cache.get(aggs_url("X:BTCUSD", "day"), PARAMS) == {"t": "X:BTCUSD"}
+    assert cache.invalidate("AAPL") == 2
+    assert cache.get(aggs_url("AAPL"), PARAMS) is None
+    assert cache.clear() == 1
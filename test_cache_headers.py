@@ -0,0 +1,96 @@
+"""Checks the Cache-Control headers the bars API sends for each range type."""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from bars_api import create_bars_api
+from cache_policy import IMMUTABLE, bars_cache_control
+
+
+class FakeFetcher:
+    """Returns the same frame for any query and records what was asked"""
+
+    def __init__(self):
+        self.calls = []
+        index = pd.date_range("2024-01-02", periods=30, freq="D", name="datetime")
+        close = np.linspace(100, 130, 30)
+        self.df = pd.DataFrame({
+            "open": close - 1, "high": close + 1, "low": close - 2, "close": close,
+            "volume": np.full(30, 1000.0), "vwap": close, "transactions": np.full(30, 10.0)
+        }, index=index)
+
+    def fetch_data(self, asset_type, ticker, days_back, timespan, from_date=None, to_date=None):
+        self.calls.append((asset_type, ticker, days_back, timespan, from_date, to_date))
+        return self.df
+
+    def calculate_technical_indicators(self, df):
+        df = df.copy()
+        df["SMA_20"] = df["close"].rolling(window=20, min_periods=1).mean()
+        return df
+
+
+def make_client():
+    server = Flask(__name__)
+    server.register_blueprint(create_bars_api(FakeFetcher()))
+    return server.test_client()
+
+
+def max_age(header):
+    for part in header.split(","):
+        part = part.strip()
+        if part.startswith("max-age="):
+            return int(part.split("=")[1])
+    return None
+
+
+def test_closed_historical_range_is_immutable():
+    response = make_client().get("/api/v1/bars/stock/AAPL?from=2020-01-01&to=2020-02-01")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE
+
+
+def test_relative_range_lives_until_midnight():
+    response = make_client().get("/api/v1/bars/stock/AAPL?days=30")
+    header = response.headers["Cache-Control"]
+    assert "immutable" not in header
+    assert "stale-while-revalidate" in header
+    assert 60 <= max_age(header) <= 86400
+
+
+def test_current_session_tail_is_short_lived():
+    today = datetime.now().strftime("%Y-%m-%d")
+    week_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+    response = make_client().get(f"/api/v1/bars/crypto/BTCUSD?timespan=minute&from={week_ago}&to={today}")
+    header = response.headers["Cache-Control"]
+    assert max_age(header) <= 60
+    assert "s-maxage" in header and "stale-while-revalidate" in header
+
+
+def test_not_modified_keeps_cache_control():
+    client = make_client()
+    first = client.get("/api/v1/bars/stock/AAPL?from=2020-01-01&to=2020-02-01")
+    again = client.get("/api/v1/bars/stock/AAPL?from=2020-01-01&to=2020-02-01",
+                       headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["Cache-Control"] == IMMUTABLE
+
+
+def test_errors_are_not_cached():
+    response = make_client().get("/api/v1/bars/stock/AAPL?timespan=year")
+    assert response.status_code == 400
+    assert response.headers["Cache-Control"] == "no-store"
+
+
+def test_relative_range_ttl_counts_down_to_midnight():
+    now = datetime(2024, 5, 1, 23, 0, 0)
+    header = bars_cache_control("day", None, None, now=now)
+    assert max_age(header) == 3600
+    # An explicit end in the past with an open start still shifts daily
+    header = bars_cache_control("day", None, (now - timedelta(days=3)).strftime("%Y-%m-%d"), now=now)
+    assert "immutable" not in header
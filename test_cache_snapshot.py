@@ -0,0 +1,90 @@
+"""Checks that cache snapshots hold only final entries, seed cold caches and reference data, and reject bad files."""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from cache_snapshot import CacheSnapshot, export_snapshot, load_snapshot
+from data_fetcher import DataFetcher
+from polygon_client import CacheManager
+from polygon_stub import start_stub
+from reference_data import TickerIndex
+
+PARAMS = {"adjusted": "true", "sort": "asc", "limit": 50000}
+
+
+def aggs_url(ticker, to_date):
+    return f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/1/day/2024-01-01/{to_date}"
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def warm_cache(request, tmp_path):
+    cache = CacheManager(cache_dir=str(tmp_path / "warm"), backend=request.param, snapshot=False)
+    for i in range(50):
+        cache.set(aggs_url(f"T{i}", "2024-01-31"), PARAMS, {"results": [i] * 100}, final=True)
+    cache.set(aggs_url("LIVE", "2099-01-01"), PARAMS, {"results": ["forming"]})
+    reference = tmp_path / "warm" / "reference"
+    reference.mkdir()
+    (reference / "tickers-stock.json").write_text(json.dumps(
+        {"fetched_at": 1.0, "fields": [], "rows": [["ZZZT", "Zeta Test Corp.", "CS", "XNAS", "usd"]]}))
+    return cache, str(reference)
+
+
+def test_only_final_entries_are_exported(warm_cache, tmp_path):
+    cache, reference = warm_cache
+    stats = export_snapshot(cache, str(tmp_path / "seed.snap"), reference)
+    assert stats["entries"] == 50
+    assert stats["bytes"] < stats["payload_bytes"]  # Compressed
+
+    snapshot = CacheSnapshot(str(tmp_path / "seed.snap"))
+    cold = CacheManager(cache_dir=str(tmp_path / "cold"), snapshot=snapshot)
+    assert cold.get(aggs_url("T7", "2024-01-31"), PARAMS) == {"results": [7] * 100}
+    assert cold.get(aggs_url("LIVE", "2099-01-01"), PARAMS) is None
+    assert cold.get(aggs_url("T7", "2024-02-29"), PARAMS) is None
+    # The first hit is copied into the local cache as a final entry
+    assert len(cold.backend) == 1 and snapshot.hits == 1
+    cold.get(aggs_url("T7", "2024-01-31"), PARAMS)
+    assert snapshot.hits == 1
+
+    index = TickerIndex(cache_dir=str(tmp_path / "cold" / "reference"), snapshot=snapshot)
+    assert index.details("stock", "ZZZT")["name"] == "Zeta Test Corp."
+
+
+def test_read_only_instances_still_use_the_snapshot(warm_cache, tmp_path):
+    cache, _ = warm_cache
+    export_snapshot(cache, str(tmp_path / "seed.snap"))
+    readonly = CacheManager(cache_dir=str(tmp_path / "cold"), snapshot=CacheSnapshot(str(tmp_path / "seed.snap")))
+    readonly.backend = None  # As when the cache directory can't be created
+    assert readonly.get(aggs_url("T3", "2024-01-31"), PARAMS) == {"results": [3] * 100}
+
+
+def test_seeded_fetch_makes_no_api_calls(tmp_path):
+    server, url = start_stub(bars=50)
+    try:
+        warm = DataFetcher(["key"], cache=CacheManager(cache_dir=str(tmp_path / "warm"), snapshot=False))
+        warm.client.base_url = url
+        warm.client.scheduler.min_interval = 0
+        history = warm.fetch_crypto_data("BTCUSD", timespan="day", from_date="2024-01-01", to_date="2024-03-31")
+        export_snapshot(warm.client.cache, str(tmp_path / "seed.snap"))
+        calls = server.state.total_requests()
+
+        cold = DataFetcher(["key"], cache=CacheManager(cache_dir=str(tmp_path / "cold"),
+                                                       snapshot=CacheSnapshot(str(tmp_path / "seed.snap"))))
+        cold.client.base_url = url
+        seeded = cold.fetch_crypto_data("BTCUSD", timespan="day", from_date="2024-01-01", to_date="2024-03-31")
+        assert server.state.total_requests() == calls
+        assert seeded.equals(history)
+    finally:
+        server.shutdown()
+
+
+def test_bad_files_are_rejected(tmp_path):
+    bad = tmp_path / "bad.snap"
+    bad.write_bytes(b"not a snapshot at all, just some bytes to fill a header")
+    with pytest.raises(ValueError):
+        CacheSnapshot(str(bad))
+    assert load_snapshot(str(bad)) is None
+    assert load_snapshot(str(tmp_path / "missing.snap")) is None
@@ -0,0 +1,107 @@
+"""Multithreaded stress test for PolygonClient against a local Polygon stub.
+
+Run directly (python test_client_stress.py) to print throughput numbers, or
+through pytest for the correctness checks only.
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from polygon_client import PolygonClient, CacheManager
+from polygon_stub import start_stub
+
+KEYS = [f"stress-key-{i}" for i in range(4)]
+
+
+def run_load(base_url, threads=32, requests_per_thread=25, max_concurrent_per_key=4):
+    cache = CacheManager(cache_dir=tempfile.mkdtemp(prefix="stress-cache-"))
+    client = PolygonClient(KEYS, rate_limit_per_minute=60_000_000,
+                           max_concurrent_per_key=max_concurrent_per_key,
+                           base_url=base_url, cache=cache)
+
+    def worker(thread_id):
+        ok = 0
+        for i in range(requests_per_thread):
+            # Unique dates per call so every request misses the cache
+            data = client.get_aggregates(f"T{thread_id}", 1, "minute",
+                                         "2024-01-01", f"2024-01-{i:04d}")
+            ok += data is not None
+        return ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        successes = sum(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    return client, successes, elapsed
+
+
+def test_no_lost_updates_and_per_key_cap():
+    server, base_url = start_stub(latency=0.002)
+    try:
+        threads, per_thread = 32, 25
+        client, successes, _ = run_load(base_url, threads, per_thread)
+        total = threads * per_thread
+        state = server.state
+
+        assert successes == total
+        assert sum(client.request_counts) == total
+        assert state.total_requests() == total
+        # The client's per-key counters must agree with what the server saw
+        for index, key in enumerate(KEYS):
+            assert client.request_counts[index] == state.requests_per_key[key]
+            assert state.max_in_flight_per_key[key] <= client.max_concurrent_per_key
+        # Keep-alive pools: far fewer connections than requests
+        assert state.connections <= len(KEYS) * client.max_concurrent_per_key
+    finally:
+        server.shutdown()
+
+
+
+def test_forked_children_open_their_own_connections(tmp_path):
+    server, base_url = start_stub()
+    try:
+        client = PolygonClient(KEYS[:1], rate_limit_per_minute=60_000_000, base_url=base_url,
+                               cache=CacheManager(cache_dir=str(tmp_path)))
+        assert client.get_aggregates("AAPL", 1, "day", "2024-01-01", "2024-01-02") is not None
+        pid = os.fork()
+        if pid == 0:
+            # Reusing the parent's pooled socket would interleave the two processes' responses
+            data = client.get_aggregates("AAPL", 1, "day", "2024-01-01", "2024-01-03")
+            os._exit(0 if data is not None else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert client.get_aggregates("AAPL", 1, "day", "2024-01-01", "2024-01-04") is not None
+        assert server.state.connections == 2  # The parent's, kept alive, and the child's
+    finally:
+        server.shutdown()
+
+
+def test_fork_hook_does_not_keep_clients_alive(tmp_path):
+    client = PolygonClient(KEYS, cache=CacheManager(cache_dir=str(tmp_path)))
+    collected = weakref.ref(client)
+    del client
+    gc.collect()
+    assert collected() is None
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    test_no_lost_updates_and_per_key_cap()
+    print("Correctness checks passed")
+
+    for cap in (1, 4, 8):
+        server, base_url = start_stub(latency=0.005)
+        # The client logs every request; keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            client, successes, elapsed = run_load(base_url, max_concurrent_per_key=cap)
+        print(f"max_concurrent_per_key={cap}: {successes} requests in {elapsed:.2f}s "
+              f"({successes / elapsed:.0f} req/s, {server.state.connections} connections)")
+        server.shutdown()
@@ -0,0 +1,61 @@
+"""Checks dependency resolution, minimal evaluation and memoization in the indicator engine."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from indicators import INDICATORS, IndicatorEngine, indicator, public_indicators, resolve
+from data_fetcher import calculate_technical_indicators
+
+
+@pytest.fixture
+def bars():
+    rng = np.random.default_rng(2)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 400)))
+    return pd.DataFrame({"open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+                         "volume": 1000.0}, index=pd.date_range("2024-01-01", periods=400, freq="h"))
+
+
+def test_resolve_orders_dependencies_first():
+    assert resolve(["MACD_histogram"]) == ["EMA_12", "EMA_26", "MACD", "MACD_signal", "MACD_histogram"]
+    assert resolve(["BB_upper", "BB_lower"]) == ["BB_middle", "_BB_std", "BB_upper", "BB_lower"]
+    with pytest.raises(KeyError):
+        resolve(["NOPE"])
+
+
+def test_full_set_keeps_the_dashboard_columns(bars):
+    df = calculate_technical_indicators(bars)
+    assert list(df.columns) == list(bars.columns) + public_indicators()
+    assert "_BB_std" not in df.columns
+    np.testing.assert_allclose(df["BB_upper"] - df["BB_middle"], 2 * bars["close"].rolling(20).std())
+
+
+def test_only_requested_columns_are_computed_and_memoized(bars):
+    engine = IndicatorEngine()
+    df = engine.compute(bars, ["SMA_20", "RSI"], version="v1")
+    assert list(df.columns) == list(bars.columns) + ["SMA_20", "RSI"]
+    assert engine.computed == 2
+
+    # MACD reuses nothing yet; asking again for RSI costs nothing
+    engine.compute(bars, ["MACD", "RSI"], version="v1")
+    assert engine.computed == 5
+    # A new data version starts over
+    engine.compute(bars, ["RSI"], version="v2")
+    assert engine.computed == 6
+
+
+def test_new_indicators_plug_in(bars):
+    @indicator("SMA_20_slope", "SMA_20")
+    def sma_20_slope(c):
+        return c["SMA_20"].diff()
+
+    try:
+        df = IndicatorEngine().compute(bars, ["SMA_20_slope"])
+        np.testing.assert_allclose(df["SMA_20_slope"].iloc[1:],
+                                   bars["close"].rolling(20, min_periods=1).mean().diff().iloc[1:])
+    finally:
+        del INDICATORS["SMA_20_slope"]
@@ -0,0 +1,76 @@
+"""Checks that background callback jobs run on server threads, report progress and stop when cancelled."""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import diskcache
+from dash import callback_context
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from job_manager import ThreadedJobManager
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_jobs_share_the_server_process(tmp_path):
+    manager = ThreadedJobManager(diskcache.Cache(str(tmp_path)))
+    seen = []
+    release = threading.Event()
+
+    def callback(set_progress, value):
+        set_progress((50, "Halfway"))
+        release.wait(5)
+        seen.append(value)  # Visible here: no copy of the process
+        return value * 2
+
+    job_fn = manager.make_job_fn(callback, progress=True)
+    job = manager.call_job_fn("result-key", job_fn, [21], {})
+    assert manager.job_running(str(job))  # Dash hands job ids back as strings
+    wait_for(lambda: manager.get_progress("result-key") is not None or seen)
+    release.set()
+    wait_for(lambda: manager.result_ready("result-key"))
+    assert manager.get_result("result-key", str(job)) == 42
+    assert seen == [21]
+    wait_for(lambda: not manager.job_running(job))
+    assert manager.handle.get(manager._cancel_key(job)) is None
+
+
+def test_cancelled_jobs_stop_at_their_next_progress_report(tmp_path):
+    manager = ThreadedJobManager(diskcache.Cache(str(tmp_path)))
+    stages, errors = [], []
+
+    def callback(set_progress):
+        try:
+            for stage in range(100):
+                set_progress((stage, ""))
+                stages.append(stage)
+                time.sleep(0.01)
+        except Exception as e:  # As update_dashboard reports errors
+            errors.append(e)
+            return "error"
+        return "finished"
+
+    job = manager.call_job_fn("result-key", manager.make_job_fn(callback, progress=True), [], {})
+    wait_for(lambda: len(stages) >= 3)
+    manager.terminate_job(str(job))
+    wait_for(lambda: not manager.job_running(job))
+    assert len(stages) < 100 and errors == []
+    # Nothing is left behind for the superseded job
+    assert not manager.result_ready("result-key")
+    assert manager.get_progress("result-key") is None
+
+
+def test_jobs_see_the_callback_request(tmp_path):
+    # app.request_session() queues a job's API requests under its client's address
+    manager = ThreadedJobManager(diskcache.Cache(str(tmp_path)))
+    job_fn = manager.make_job_fn(lambda: callback_context.remote, progress=False)
+    manager.call_job_fn("result-key", job_fn, [], {"remote": "10.0.0.7", "updated_props": {}})
+    wait_for(lambda: manager.result_ready("result-key"))
+    assert manager.get_result("result-key", None) == "10.0.0.7"
@@ -0,0 +1,123 @@
+"""Checks the per-key circuit breaker, jittered backoff and probe handling in the key scheduler and PolygonClient."""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from key_scheduler import CircuitBreaker, KeyScheduler
+from polygon_client import CacheManager, PolygonClient
+from polygon_stub import start_stub
+
+
+def test_breaker_opens_then_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    breaker.record_failure(0.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(0.0)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.available_at(5.0) == 10.0
+
+    breaker.on_dispatch(10.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.available_at(11.0) == float("inf")  # The probe is out
+    breaker.record_failure(11.0)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.available_at(11.0) == 21.0
+
+    breaker.on_dispatch(21.0)
+    breaker.release_probe()  # Never sent: the next request may probe
+    assert breaker.available_at(21.0) == 21.0
+    breaker.on_dispatch(21.0)
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_failures_back_off_with_full_jitter():
+    keys = KeyScheduler(1, 0.0, failure_threshold=10, backoff_base=1.0, backoff_cap=4.0)
+    for failures in range(1, 6):
+        before = time.time()
+        backoff = keys.record_failure(0)
+        # 1, 2, 4, then capped at 4 seconds
+        assert 0 <= backoff <= min(4.0, 2 ** (failures - 1))
+        assert keys.next_free[0] >= before + backoff - 0.01
+    keys.next_free[0] = 0.0
+    keys.record_rate_limited(0, 30.0)
+    assert 30.0 <= keys.estimated_wait() <= 33.0
+
+
+def test_open_keys_are_skipped_until_they_recover():
+    keys = KeyScheduler(2, 0.0, failure_threshold=1, reset_timeout=0.05)
+    keys.record_failure(0)
+    keys.next_free[0] = 0.0  # Leave only the breaker in the way
+    assert keys.acquire()[0] == 1
+    assert keys.acquire(deadline=time.time() + 0.01)[0] == 1
+    time.sleep(0.06)
+    keys.next_free[1] = time.time() + 60
+    index, _ = keys.acquire()
+    assert index == 0 and keys.states()[0] == CircuitBreaker.HALF_OPEN
+    # A reservation that is never sent hands the probe back
+    assert keys.acquire(deadline=time.time() + 0.01) is None
+    keys.release(0)
+    assert keys.acquire(deadline=time.time() + 0.01)[0] == 0
+
+
+def make_client(url, tmp_path, **kwargs):
+    client = PolygonClient(["key"], base_url=url,
+                           cache=CacheManager(cache_dir=str(tmp_path), snapshot=False), **kwargs)
+    client.scheduler.min_interval = 0
+    return client
+
+
+def test_rejected_requests_neither_retry_nor_open_the_breaker(tmp_path):
+    server, url = start_stub(bars=10)
+    try:
+        server.state.statuses["NOPE"] = 404
+        client = make_client(url, tmp_path)
+        assert client.get_aggregates("NOPE", 1, "day", "2024-01-01", "2024-01-05") is None
+        assert server.state.total_requests() == 1
+        assert client.scheduler.states() == [CircuitBreaker.CLOSED]
+        assert client.get_aggregates("AAPL", 1, "day", "2024-01-01", "2024-01-05") is not None
+
+        # Server errors do count, and are retried
+        server.state.statuses["DOWN"] = 503
+        client.scheduler.backoff_cap = 0.0
+        assert client.get_aggregates("DOWN", 1, "day", "2024-01-01", "2024-01-05") is None
+        assert server.state.total_requests() == 2 + 3
+        assert client.scheduler.states() == [CircuitBreaker.OPEN]
+    finally:
+        server.shutdown()
+
+
+
+def test_refused_keys_are_rotated_away_from(tmp_path):
+    server, url = start_stub(bars=10)
+    try:
+        client = PolygonClient(["revoked", "good"], base_url=url,
+                               cache=CacheManager(cache_dir=str(tmp_path), snapshot=False))
+        client.scheduler.min_interval = 0
+        server.state.statuses["revoked"] = 401
+        for day in range(2, 6):
+            assert client.get_aggregates("AAPL", 1, "day", "2024-01-01", f"2024-01-0{day}") is not None
+        # Refused once, then left out until its breaker lets a probe through
+        assert server.state.requests_per_key["revoked"] == 1
+        assert server.state.requests_per_key["good"] == 4
+        assert client.scheduler.states() == [CircuitBreaker.OPEN, CircuitBreaker.CLOSED]
+    finally:
+        server.shutdown()
+
+def test_expired_deadline_hands_the_probe_back(tmp_path):
+    server, url = start_stub(bars=10)
+    try:
+        client = make_client(url, tmp_path, max_concurrent_per_key=1)
+        breaker = client.scheduler.breakers[0]
+        breaker.state, breaker.open_until = CircuitBreaker.OPEN, time.time()
+        # The key's only in-flight slot is taken, so the probe can't be sent in time
+        client._key_slots[0].acquire()
+        assert client.get_aggregates("AAPL", 1, "day", "2024-01-01", "2024-01-05",
+                                     budget_seconds=0.05) is None
+        client._key_slots[0].release()
+        assert server.state.total_requests() == 0
+        assert not breaker.probe_in_flight
+        assert client.get_aggregates("AAPL", 1, "day", "2024-01-01", "2024-01-05") is not None
+        assert breaker.state == CircuitBreaker.CLOSED
+    finally:
+        server.shutdown()
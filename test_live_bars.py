@@ -0,0 +1,86 @@
+"""Checks the live view's snapshot ticks and that history in front of a stream is refreshed."""
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+
+def clear_of_minute_boundary():
+    # The snapshot's forming minute must not roll over mid-test
+    if time.time() % 60 > 55:
+        time.sleep(60 - time.time() % 60 + 0.1)
+
+
+def test_snapshot_ticks_refetch_only_when_the_minute_rolls_over(stub_fetcher):
+    fetcher, server = stub_fetcher
+    clear_of_minute_boundary()
+    bars = fetcher.fetch_live_bars("crypto", "BTCUSD")
+    assert len(bars) == 51  # 50 aggregate bars plus the forming candle
+    assert bars.index[-1] == pd.Timestamp(int(time.time()) // 60 * 60, unit="s")
+    assert server.state.total_requests() == 2
+
+    fetcher.fetch_live_bars("crypto", "BTCUSD")
+    assert server.state.total_requests() == 3  # Only the snapshot
+    assert fetcher.live_stats == {"snapshots": 2, "aggregate_refetches": 1, "closed_skips": 0}
+
+    fetcher._live_state[("crypto", "BTCUSD")]["minute"] -= 60_000  # A later minute has started
+    assert len(fetcher.fetch_live_bars("crypto", "BTCUSD")) == 51
+    assert fetcher.live_stats["aggregate_refetches"] == 2
+
+
+class FakeStream:
+    asset_type = "crypto"
+
+    def __init__(self, start):
+        self.frame = self.bars_from(start)
+        self.stats = {"connected_at": 1.0}
+
+    @staticmethod
+    def bars_from(start, count=5):
+        index = pd.date_range(start, periods=count, freq="min", name="datetime")
+        return pd.DataFrame({"open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1.0,
+                             "vwap": 1.0, "transactions": 1}, index=index)
+
+    def subscribe(self, tickers):
+        pass
+
+    def bars_frame(self, ticker):
+        return self.frame
+
+    def is_fresh(self, max_age):
+        return True
+
+
+def test_stream_history_is_refreshed_on_a_ttl_and_each_new_day(stub_fetcher):
+    fetcher, server = stub_fetcher
+    stream = FakeStream(pd.Timestamp.now().floor("min"))
+    fetcher.attach_stream(stream)
+
+    bars = fetcher.fetch_live_bars("crypto", "BTCUSD")
+    assert len(bars) == 55 and bars.index.is_monotonic_increasing
+    fetcher.fetch_live_bars("crypto", "BTCUSD")
+    assert fetcher.live_stats["aggregate_refetches"] == 1
+    assert server.state.total_requests() == 1  # No snapshots while streaming
+
+    fetcher.live_history_seconds = 0
+    fetcher.fetch_live_bars("crypto", "BTCUSD")
+    assert fetcher.live_stats["aggregate_refetches"] == 2
+
+    fetcher.live_history_seconds = 300
+    stream.frame = FakeStream.bars_from(stream.frame.index[0] + pd.Timedelta(days=1))
+    fetcher.fetch_live_bars("crypto", "BTCUSD")
+    assert fetcher.live_stats["aggregate_refetches"] == 3
+
+    # So do reconnects: history covers the bars the stream missed
+    stream.stats["connected_at"] = 2.0
+    fetcher.fetch_live_bars("crypto", "BTCUSD")
+    assert fetcher.live_stats["aggregate_refetches"] == 4
+
+    # A failed refresh keeps serving the history already loaded
+    fetcher.live_history_seconds = 0
+    server.state.statuses["X:BTCUSD"] = 404
+    assert len(fetcher.fetch_live_bars("crypto", "BTCUSD")) == 55
+    assert fetcher.live_stats["aggregate_refetches"] == 4
@@ -0,0 +1,89 @@
+"""Checks that live sessions share one poller per ticker and that it stops when unwatched."""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from live_hub import LiveHub
+
+
+class CountingCompute:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, asset_type, ticker):
+        with self.lock:
+            self.calls.append((asset_type, ticker))
+            return {"ticker": ticker, "n": len(self.calls)}
+
+
+def test_sessions_share_one_poller():
+    compute = CountingCompute()
+    hub = LiveHub(compute, interval_seconds=0.05, lease_seconds=0.2)
+    key = ("crypto", "BTCUSD")
+    for session in range(50):
+        hub.subscribe(key, f"s{session}")
+
+    version, payload = hub.wait_for_update(key, 0, timeout=2)
+    assert version >= 1 and payload["ticker"] == "BTCUSD"
+    time.sleep(0.3)
+    # Fifty watchers, but computes track the interval, not the session count
+    assert len(compute.calls) < 15
+    assert hub.stats["pollers_started"] == 1
+
+
+def test_poller_stops_when_leases_lapse():
+    compute = CountingCompute()
+    hub = LiveHub(compute, interval_seconds=0.02, lease_seconds=0.1)
+    key = ("stock", "AAPL")
+    hub.subscribe(key, "a")
+    hub.subscribe(key, "b")
+    hub.unsubscribe(key, "a")
+    hub.wait_for_update(key, 0, timeout=2)
+
+    deadline = time.time() + 2
+    while hub.stats["pollers_stopped"] == 0 and time.time() < deadline:
+        time.sleep(0.02)
+    assert hub.stats["pollers_stopped"] == 1
+    calls = len(compute.calls)
+    time.sleep(0.1)
+    assert len(compute.calls) == calls
+    assert hub.latest(key) == (0, None)
+
+
+def test_inline_mode_refreshes_once_per_interval():
+    compute = CountingCompute()
+    hub = LiveHub(compute, interval_seconds=60, threaded=False)
+    key = ("forex", "EURUSD")
+    results = [hub.latest(key) for _ in range(20)]
+    assert len(compute.calls) == 1
+    assert all(version == 1 for version, _ in results)
+
+
+def test_unchanged_results_keep_the_version():
+    hub = LiveHub(lambda asset_type, ticker: {"bars": 10}, interval_seconds=0, threaded=False,
+                  unchanged=lambda old, new: old["bars"] == new["bars"])
+    key = ("stock", "AAPL")
+    versions = {hub.latest(key)[0] for _ in range(5)}
+    assert versions == {1}
+
+
+def test_refresh_brings_the_next_compute_forward():
+    compute = CountingCompute()
+    hub = LiveHub(compute, interval_seconds=60, min_refresh_seconds=0.1)
+    key = ("crypto", "ETHUSD")
+    hub.subscribe(key, "a")
+    version, _ = hub.wait_for_update(key, 0, timeout=2)
+
+    started = time.time()
+    for _ in range(20):
+        hub.refresh(key)  # A burst of stream flushes
+    version, payload = hub.wait_for_update(key, version, timeout=2)
+    assert payload["n"] == 2 and time.time() - started < 2
+    time.sleep(0.3)
+    assert len(compute.calls) <= 3  # Not one compute per refresh
+    hub.refresh(("crypto", "unwatched"))  # No feed is started for it
+    assert hub.latest(("crypto", "unwatched")) == (0, None)
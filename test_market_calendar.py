@@ -0,0 +1,72 @@
+"""Checks the market calendar's sessions and the fetcher's use of it for ranges, caching and live mode."""
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import market_calendar
+from market_calendar import get_calendar, us_equity_early_closes, us_equity_holidays
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_us_equity_holidays():
+    assert sorted(us_equity_holidays(2024)) == [
+        date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29),
+        date(2024, 5, 27), date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2),
+        date(2024, 11, 28), date(2024, 12, 25),
+    ]
+    # Observed days and one-off closures
+    assert date(2021, 12, 24) in us_equity_holidays(2021)      # Christmas on a Saturday
+    assert date(2021, 12, 31) not in us_equity_holidays(2021)  # New Year 2022 on a Saturday
+    assert date(2025, 1, 9) in us_equity_holidays(2025)
+    assert set(us_equity_early_closes(2024)) == {date(2024, 7, 3), date(2024, 11, 29),
+                                                 date(2024, 12, 24)}
+
+
+def test_sessions_per_asset_type():
+    stock, forex, crypto = get_calendar("stock"), get_calendar("forex"), get_calendar("crypto")
+    # Monday 2024-03-11, after the DST switch: 13:30 UTC is 9:30 EDT
+    assert stock.is_open(utc(2024, 3, 11, 13, 30))
+    assert not stock.is_open(utc(2024, 3, 11, 7, 59))   # 3:59 EDT, before pre-market
+    assert not stock.is_open(utc(2024, 3, 9, 15))        # Saturday
+    assert not stock.is_open(utc(2024, 7, 4, 15))        # Independence Day
+    assert not stock.is_open(utc(2024, 11, 29, 22, 30))  # Early close: post-market ends 17:00 EST
+    # Forex: Friday 17:00 to Sunday 17:00 Eastern is closed
+    assert forex.is_open(utc(2024, 1, 5, 21, 59)) and not forex.is_open(utc(2024, 1, 5, 22))
+    assert not forex.is_open(utc(2024, 1, 7, 21, 59)) and forex.is_open(utc(2024, 1, 7, 22))
+    assert crypto.is_open(utc(2024, 12, 25, 12))
+
+    assert stock.clip_range("2024-03-29", "2024-04-07") == ("2024-04-01", "2024-04-05")
+    assert stock.clip_range("2024-03-30", "2024-03-31") is None
+    assert crypto.clip_range("2024-03-30", "2024-03-31") == ("2024-03-30", "2024-03-31")
+    assert stock.last_session(utc(2024, 4, 1, 7)) == date(2024, 3, 28)  # Before Monday pre-market
+
+    assert stock.is_final("2024-03-28", utc(2024, 3, 29, 12))
+    assert not stock.is_final("2024-03-28", utc(2024, 3, 29, 0, 30))  # Not yet settled
+    assert not crypto.is_final("2024-03-28", utc(2024, 3, 28, 23))
+
+
+def test_closed_ranges_skip_requests_and_cache_as_final(stub_fetcher):
+    fetcher, server = stub_fetcher
+    assert fetcher.fetch_stock_data("AAPL", from_date="2024-03-30", to_date="2024-03-31") is None
+    assert server.state.total_requests() == 0
+
+    fetcher.fetch_stock_data("AAPL", from_date="2024-03-01", to_date="2024-03-31")
+    url, params = fetcher.client._aggregates_request("AAPL", 1, "day", "2024-03-01", "2024-03-28")
+    _, _, expires_at = fetcher.client.cache.backend.get(fetcher.client.cache._get_cache_key(url, params))
+    assert expires_at is None
+
+
+def test_live_mode_stops_polling_while_closed(stub_fetcher, monkeypatch):
+    fetcher, server = stub_fetcher
+    monkeypatch.setattr(market_calendar, "_now", lambda: utc(2024, 3, 30, 15))  # Saturday
+    first = fetcher.fetch_live_bars("stock", "AAPL")
+    requests = server.state.total_requests()
+    for _ in range(5):
+        assert fetcher.fetch_live_bars("stock", "AAPL") is first
+    assert server.state.total_requests() == requests == 1
+    assert fetcher.live_stats["closed_skips"] == 5 and fetcher.live_stats["snapshots"] == 0
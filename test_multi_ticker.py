@@ -0,0 +1,86 @@
+"""Checks close alignment across tickers and the incremental rolling correlation against pandas."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from multi_ticker import CorrelationCache, RollingCorrelation, align_closes
+
+
+def closes(values, start="2024-01-01", freq="D", skip=()):
+    index = pd.date_range(start, periods=len(values), freq=freq, name="datetime")
+    df = pd.DataFrame({"close": np.asarray(values, dtype=float)}, index=index)
+    return df.drop(index[list(skip)])
+
+
+def test_align_closes_fills_gaps_or_drops_them():
+    data = {"B": closes([10, 11, 12, 13, 14], skip=[2]),
+            "A": closes([1, 2, 3, 4], start="2024-01-02")}
+
+    filled = align_closes(data)
+    assert filled.tickers == ["A", "B"]
+    # Jan 1 goes (A hasn't traded yet); B's missing Jan 3 carries Jan 2 forward
+    assert filled.to_frame().to_dict("list") == {"A": [1.0, 2.0, 3.0, 4.0],
+                                                 "B": [11.0, 11.0, 13.0, 14.0]}
+
+    dropped = align_closes(data, fill="drop").to_frame()
+    assert list(dropped.index.day) == [2, 4, 5]
+    assert dropped["B"].tolist() == [11.0, 13.0, 14.0]
+
+
+def random_walks(rows=300, cols=4, seed=3):
+    rng = np.random.default_rng(seed)
+    return 100 + rng.normal(0, 1, (rows, cols)).cumsum(axis=0) + rng.normal(0, 5, cols)
+
+
+def pandas_corr(values, window):
+    return pd.DataFrame(values[-window:]).corr().to_numpy()
+
+
+def test_rolling_correlation_matches_pandas_as_rows_arrive():
+    values, window = random_walks(), 30
+    rolling = RollingCorrelation(window, values.shape[1], resync_every=50)
+    rolling.push(values[:window])
+    expected = pd.DataFrame(values).rolling(window).corr()
+    end = window
+    for size in [1, 1, 7, 1, 29, 3] * 20:
+        if end + size > len(values):
+            break
+        rolling.push(values[end:end + size])
+        end += size
+        np.testing.assert_allclose(rolling.matrix(), expected.loc[end - 1].to_numpy(), atol=1e-9)
+    # A push of a whole window or more starts over from those rows
+    rolling.push(values[:window + 5])
+    np.testing.assert_allclose(rolling.matrix(), pandas_corr(values[:window + 5], window), atol=1e-9)
+
+
+def panel_for(values, start=0):
+    index = pd.date_range("2024-01-01", periods=len(values), freq="min")[start:]
+    return align_closes({f"T{col}": pd.DataFrame({"close": values[start:, col]}, index=index)
+                         for col in range(values.shape[1])})
+
+
+def test_cache_pushes_new_bars_and_rebuilds_on_revisions():
+    values, window = random_walks(), 20
+    cache = CorrelationCache()
+    first = cache.get(panel_for(values[:200]), "minute", window)
+    np.testing.assert_allclose(first.to_numpy(), pandas_corr(values[:200], window), atol=1e-9)
+
+    # One more bar, and a panel that starts later: only the new row is pushed
+    second = cache.get(panel_for(values[:201], start=50), "minute", window)
+    assert cache.stats == {"updates": 1, "rebuilds": 1}
+    np.testing.assert_allclose(second.to_numpy(), pandas_corr(values[:201], window), atol=1e-9)
+
+    revised = values[:201].copy()
+    revised[-1] += 5.0  # The forming bar moved
+    third = cache.get(panel_for(revised), "minute", window)
+    assert cache.stats["rebuilds"] == 2
+    np.testing.assert_allclose(third.to_numpy(), pandas_corr(revised, window), atol=1e-9)
+
+    # Each (tickers, timeframe, window) has its own state
+    cache.get(panel_for(values[:201]), "minute", window + 1)
+    cache.get(panel_for(values[:201]), "hour", window)
+    assert cache.stats["rebuilds"] == 4
@@ -0,0 +1,73 @@
+"""Checks that selections are prefetched, clicks on them hit, and unused prefetches count as waste."""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from prefetcher import Prefetcher
+
+
+def wait_idle(prefetcher, timeout=5):
+    deadline = time.time() + timeout
+    while (prefetcher._pending or prefetcher._in_flight) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_selection_and_neighbors_are_warmed(stub_fetcher):
+    fetcher, server = stub_fetcher
+    prefetcher = Prefetcher(fetcher, ttl_seconds=0.5).start()
+    prefetcher.select("crypto", "btcusd", 30, "hour")
+    wait_idle(prefetcher)
+    assert prefetcher.stats["prefetched"] == 3  # hour, then 15minute and day
+    assert fetcher.pending_requests("crypto", "BTCUSD", 30, "day") == 0
+
+    calls = server.state.total_requests()
+    assert prefetcher.record_use("crypto", "BTCUSD", 30, "hour") == "hits"
+    assert fetcher.fetch_data("crypto", "BTCUSD", 30, "hour") is not None
+    assert server.state.total_requests() == calls
+
+    assert prefetcher.record_use("crypto", "ETHUSD", 30, "hour") == "misses"
+    assert prefetcher.hit_rate() == 0.5
+
+    # The two neighbors were never used
+    time.sleep(0.6)
+    prefetcher.record_use("crypto", "ETHUSD", 30, "day")
+    assert prefetcher.stats["wasted"] == 2
+    assert prefetcher.stats["wasted_calls"] == prefetcher.stats["calls"] - 1
+
+    # Selecting it again is free: it is already in the cache
+    prefetcher.select("crypto", "BTCUSD", 30, "week")
+    wait_idle(prefetcher)
+    assert prefetcher.stats["skipped_warm"] == 1  # day, week's neighbor
+    # A click on it owes nothing to the prefetcher
+    rate = prefetcher.hit_rate()
+    assert prefetcher.record_use("crypto", "BTCUSD", 30, "day") == "already_cached"
+    assert prefetcher.hit_rate() == rate and prefetcher.stats["hits"] == 1
+
+
+def test_no_prefetch_without_spare_quota(stub_fetcher):
+    fetcher, server = stub_fetcher
+    fetcher.client.scheduler.min_interval = 60  # One request per key per minute
+    fetcher.fetch_data("crypto", "BTCUSD", 30, "day")
+    prefetcher = Prefetcher(fetcher).start()
+    prefetcher.select("crypto", "ETHUSD", 30, "week")
+    wait_idle(prefetcher)
+    assert server.state.total_requests() == 1
+    assert prefetcher.stats["skipped_busy"] == 2
+
+
+def test_worker_sweeps_long_expired_cache_entries(stub_fetcher):
+    fetcher, _ = stub_fetcher
+    backend = fetcher.client.cache.backend
+    now = time.time()
+    backend.set("old", b"{}", {}, now - 2 * 86400)     # Past the one-day stale grace
+    backend.set("recent", b"{}", {}, now - 3600)       # Still a stale fallback
+    backend.set("final", b"{}", {}, None)
+    prefetcher = Prefetcher(fetcher, sweep_interval_seconds=0.2).start()
+    deadline = time.time() + 5
+    while prefetcher.stats["sweeps"] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert prefetcher.stats["sweeps"] >= 2 and prefetcher.stats["swept"] == 1
+    assert backend.get("old") is None
+    assert backend.get("recent") is not None and backend.get("final") is not None
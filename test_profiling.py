@@ -0,0 +1,103 @@
+"""Checks opt-in profiling: spans and sampled stacks across threads, header and rate sampling, and the slowest-requests route."""
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from profiling import Profiler, create_profiles_blueprint, profiled
+from request_scheduler import propagate
+
+
+@profiled
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_spans_and_stacks_cover_pool_threads(tmp_path):
+    profiler = Profiler(str(tmp_path), sample_rate=1.0)
+
+    @profiler.callback
+    def handler():
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(propagate(busy), [0.05, 0.05]))
+        busy(0.05)
+        return "done"
+
+    assert handler() == "done"
+    busy(0.01)  # Outside a profiled call: not recorded
+    [summary] = profiler.slowest()
+    assert summary["name"] == "handler" and summary["reason"] == "sampled"
+    assert summary["spans"]["busy"]["calls"] == 3
+    assert summary["spans"]["busy"]["ms"] >= 150 > summary["ms"]  # Two ran in parallel
+
+    stacks = (tmp_path / f"{summary['id']}.collapsed").read_text()
+    # The pool threads were sampled too, with their own stacks
+    assert any("thread.py:_worker" in line and line.rsplit(";", 1)[-1].startswith("test_profiling.py:busy")
+               for line in stacks.splitlines())
+    assert (tmp_path / "collapsed.txt").read_text() == stacks
+
+
+def test_header_token_and_sampling(tmp_path):
+    def handler():
+        return 1
+
+    assert Profiler(str(tmp_path)).callback(handler) is handler  # Disabled: not even wrapped
+
+    profiler = Profiler(str(tmp_path), token="secret")
+    wrapped = profiler.callback(handler)
+    app = Flask(__name__)
+    with app.test_request_context(headers={"X-Profile": "wrong"}):
+        wrapped()
+    assert profiler.slowest() == []
+    with app.test_request_context(headers={"X-Profile": "secret"}):
+        wrapped()
+    assert [summary["reason"] for summary in profiler.slowest()] == ["header"]
+
+
+def test_route_lists_the_slowest_kept_requests(tmp_path):
+    profiler = Profiler(str(tmp_path), sample_rate=1.0, token="secret", keep=3)
+    for seconds in (0.01, 0.04, 0.02, 0.03):
+        profiler.callback(busy)(seconds)
+    app = Flask(__name__)
+    app.register_blueprint(create_profiles_blueprint(profiler))
+    client = app.test_client()
+
+    assert client.get("/_profiles").status_code == 403
+    listing = client.get("/_profiles", headers={"X-Profile": "secret"}).get_json()
+    assert listing["kept"] == 3  # The oldest was pruned
+    durations = [summary["ms"] for summary in listing["slowest"]]
+    assert durations == sorted(durations, reverse=True)
+    assert min(durations) >= 20  # Each took at least its busy time, and the 10 ms call is gone
+    stacks = client.get(f"/_profiles/{listing['slowest'][0]['id']}?token=secret")
+    assert stacks.mimetype == "text/plain" and "test_profiling.py:busy" in stacks.get_data(as_text=True)
+    assert client.get("/_profiles/nope?token=secret").status_code == 404
+    aggregate = client.get("/_profiles/collapsed.txt?token=secret").get_data(as_text=True)
+    assert len(aggregate.splitlines()) >= 4
+
+
+def test_routes_are_refused_without_a_token(tmp_path):
+    profiler = Profiler(str(tmp_path), sample_rate=1.0)
+    profiler.callback(busy)(0.01)
+    app = Flask(__name__)
+    app.register_blueprint(create_profiles_blueprint(profiler))
+    client = app.test_client()
+    for path in ("/_profiles", "/_profiles/collapsed.txt", f"/_profiles/{profiler.slowest()[0]['id']}"):
+        assert client.get(path).status_code == 403
+        assert client.get(path, headers={"X-Profile": ""}).status_code == 403
+
+
+def test_fetch_profile_counts_every_api_call(make_stub_fetcher, tmp_path):
+    fetcher, server = make_stub_fetcher(bars=500)
+    profiler = Profiler(str(tmp_path / "profiles"), sample_rate=1.0)
+    # Chunked: the requests run on pool threads
+    profiler.callback(fetcher.fetch_data)("crypto", "ETHUSD", 120, "minute")
+    [summary] = profiler.slowest()
+    assert summary["spans"]["PolygonClient._make_request"]["calls"] == server.state.total_requests() > 1
+    assert json.loads((tmp_path / "profiles" / f"{summary['id']}.json").read_text()) == summary
@@ -0,0 +1,59 @@
+"""Checks the ticker reference index: paginated bulk load, persistence and prefix search."""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from polygon_client import CacheManager, PolygonClient
+from polygon_stub import start_stub
+from reference_data import TickerIndex
+
+
+def test_seeds_serve_before_any_load(tmp_path):
+    index = TickerIndex(cache_dir=str(tmp_path))
+    assert [m["ticker"] for m in index.search("stock", "")][:2] == ["AAPL", "MSFT"]
+    assert index.search("stock", "ms")[0]["ticker"] == "MSFT"
+    # Name words match too: "Platforms" -> META
+    assert [m["ticker"] for m in index.search("stock", "platf")] == ["META"]
+    assert index.options("forex", "eur", include=["GBPUSD"])[0]["value"] == "GBPUSD"
+    assert index.is_stale("crypto")
+
+
+def test_bulk_load_paginates_persists_and_searches_fast(tmp_path):
+    server, url = start_stub()
+    server.state.reference_tickers = 2500
+    try:
+        client = PolygonClient(["key"], base_url=url, cache=CacheManager(cache_dir=str(tmp_path)))
+        client.scheduler.min_interval = 0
+        index = TickerIndex(client, cache_dir=str(tmp_path / "reference"))
+        assert index.refresh("forex") == 2500
+        assert server.state.total_requests() == 3  # 1000 per page
+    finally:
+        server.shutdown()
+
+    # Prefixes are stripped, so forex symbols match what the dashboard uses
+    assert index.details("forex", "AAAA")["name"] == "Aaaa Holdings 0"
+    assert [m["ticker"] for m in index.search("forex", "ad", limit=3)] == ["ADAA", "ADAB", "ADAC"]
+    # Every word of a name query must prefix-match: 249 and 2490-2499
+    assert len(index.search("forex", "holdings 249", limit=50)) == 11
+    assert not index.is_stale("forex")
+
+    reloaded = TickerIndex(cache_dir=str(tmp_path / "reference"))
+    assert reloaded.details("forex", "CRQZ") == index.details("forex", "CRQZ")
+
+    start = time.perf_counter()
+    for query in ("A", "B", "CR", "DZ", "HOLD", "XYZ") * 100:
+        reloaded.search("forex", query, limit=20)
+    assert (time.perf_counter() - start) / 600 < 0.001
+
+
+def test_typed_symbols_come_first_in_the_dropdown(tmp_path):
+    # What the ticker dropdown shows as the user types (see test_app.py's choose_ticker)
+    index = TickerIndex(cache_dir=str(tmp_path))
+    for asset_type, ticker in (("stock", "AAPL"), ("forex", "EURUSD"), ("crypto", "BTCUSD")):
+        for typed in (ticker, ticker.lower()):
+            assert index.options(asset_type, typed)[0]["value"] == ticker, (asset_type, typed)
+    # The current value stays selectable whatever the search
+    options = index.options("stock", "zzz", include=["AAPL"])
+    assert [option["value"] for option in options] == ["AAPL"]
@@ -0,0 +1,78 @@
+"""Checks the render pipeline's one-pass stats and its per-version stage caching."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from render_pipeline import RenderPipeline, summary_stats
+from data_fetcher import calculate_technical_indicators
+from visualization import ChartVisualizer
+
+
+def make_frame(bars=300, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    index = pd.date_range("2024-01-02", periods=bars, freq="min")
+    return pd.DataFrame({"open": close, "high": close * 1.01, "low": close * 0.99,
+                         "close": close, "volume": rng.integers(100, 1000, bars).astype(float)},
+                        index=index)
+
+
+class FrameFetcher:
+    def __init__(self, df):
+        self.df = df
+        self.calls = 0
+
+    def fetch_data(self, asset_type, ticker, days_back, timespan):
+        self.calls += 1
+        return self.df
+
+
+def test_summary_stats_match_pandas():
+    df = calculate_technical_indicators(make_frame())
+    summary = summary_stats(df)
+    assert summary["latest_price"] == df["close"].iloc[-1]
+    assert summary["price_change_pct"] == pytest.approx(
+        (df["close"].iloc[-1] - df["close"].iloc[0]) / df["close"].iloc[0] * 100)
+    assert summary["high"] == df["high"].max() and summary["low"] == df["low"].min()
+    assert summary["avg_volume"] == pytest.approx(df["volume"].mean())
+    assert summary["latest_rsi"] == pytest.approx(df["RSI"].iloc[-1])
+
+
+def test_stages_reuse_work_until_the_data_changes():
+    fetcher = FrameFetcher(make_frame())
+    pipeline = RenderPipeline(fetcher, ChartVisualizer())
+
+    first = pipeline.run("stock", "AAPL", 1, "minute", "candlestick")
+    again = pipeline.run("stock", "AAPL", 1, "minute", "candlestick")
+    assert fetcher.calls == 2  # Fetching is left to the HTTP cache
+    assert again.chart is first.chart
+    assert pipeline.stage_stats["indicators"]["hits"] == 1
+    assert set(first.timings) == {"fetch", "indicators", "stats", "figure", "components"}
+
+    # Another chart type reuses indicators and stats but renders its own figure
+    technical = pipeline.run("stock", "AAPL", 1, "minute", "technical")
+    assert technical.summary is first.summary and technical.chart is not first.chart
+
+    # The live path renders the same bars: only the annotated figure is new
+    live = pipeline.render(fetcher.df, ("stock", "AAPL", "minute"), "AAPL", "candlestick",
+                           annotation="Live Update #1")
+    assert live.df is first.df and live.chart is not first.chart
+
+    # A change to the forming bar is a new version
+    fetcher.df = fetcher.df.copy()
+    fetcher.df.iloc[-1, fetcher.df.columns.get_loc("close")] += 1.0
+    updated = pipeline.run("stock", "AAPL", 1, "minute", "candlestick")
+    assert updated.version != first.version
+    assert updated.summary["latest_price"] == first.summary["latest_price"] + 1.0
+
+    # So is a revision of an earlier bar, with the span and latest bar unchanged
+    fetcher.df = fetcher.df.copy()
+    fetcher.df.iloc[len(fetcher.df) // 2, fetcher.df.columns.get_loc("high")] = fetcher.df["high"].max() + 5.0
+    revised = pipeline.run("stock", "AAPL", 1, "minute", "candlestick")
+    assert revised.version != updated.version
+    assert revised.summary["high"] == updated.summary["high"] + 5.0
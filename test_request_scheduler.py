@@ -0,0 +1,123 @@
+"""Checks priority order, fair queuing between sessions, deadlines and key headroom in the request scheduler."""
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from key_scheduler import KeyScheduler
+from request_scheduler import RequestScheduler, request_priority
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def grant_order(futures):
+    order = []
+    for label, future in futures:
+        future.add_done_callback(lambda f, label=label: order.append(label))
+    for _, future in futures:
+        assert future.result(timeout=5) is not None
+    return order
+
+
+def test_higher_classes_go_first():
+    scheduler = RequestScheduler(KeyScheduler(1, 0.05))
+    assert scheduler.acquire() == (0, 0.0)  # The key is now busy for 50ms
+    futures = [(priority, scheduler.submit(priority=priority))
+               for priority in ("backfill", "prefetch", "live", "interactive")]
+    assert grant_order(futures) == ["interactive", "live", "prefetch", "backfill"]
+
+
+def test_sessions_take_turns_within_a_class():
+    scheduler = RequestScheduler(KeyScheduler(1, 0.02))
+    scheduler.acquire()
+    futures = [("a", scheduler.submit(session="a")) for _ in range(3)]
+    futures.append(("b", scheduler.submit(session="b")))
+    assert grant_order(futures) == ["a", "b", "a", "a"]
+
+
+def test_deadlines_fail_instead_of_waiting():
+    scheduler = RequestScheduler(KeyScheduler(1, 10.0))
+    scheduler.acquire()
+    # No key frees up within the deadline: fails without queuing
+    assert scheduler.acquire(deadline=time.time() + 1) is None
+    # Queued behind a higher class until its deadline passes
+    scheduler.keys.next_free[0] = time.time() + 0.05
+    blocker = scheduler.submit(priority="interactive")
+    late = scheduler.submit(deadline=time.time() + 0.1, priority="backfill")
+    assert blocker.result(timeout=5) is not None
+    assert late.result(timeout=5) is None
+    assert scheduler.stats["backfill"]["expired"] == 1
+
+
+def test_background_work_leaves_a_key_free():
+    scheduler = RequestScheduler(KeyScheduler(2, 0.2))
+    first = scheduler.acquire(priority="backfill")
+    second = scheduler.submit(priority="backfill")
+    time.sleep(0.05)
+    assert not second.done()  # Only one key is ready, and it is held back
+    start = time.time()
+    assert scheduler.acquire(priority="interactive")[0] != first[0]
+    assert time.time() - start < 0.05
+    assert second.result(timeout=5) is not None
+
+
+def test_cancelled_requests_give_their_turn_away():
+    scheduler = RequestScheduler(KeyScheduler(1, 0.2))
+    start = time.time()
+    scheduler.acquire()
+    cancelled = scheduler.submit()
+    assert cancelled.cancel()
+    assert scheduler.acquire() is not None
+    # The key was reserved once more, not twice: the cancelled request never took a slot
+    assert scheduler.keys.next_free[0] < start + 0.5
+    assert scheduler.stats["interactive"] == {"granted": 2, "expired": 0, "cancelled": 1}
+
+    # Cancelled while its key is being reserved: the reservation is given back
+    released, reserve = [], scheduler.keys.acquire
+
+    def reserve_while_cancelling(deadline=None):
+        late.cancel()
+        return reserve(deadline)
+    scheduler.keys.acquire = reserve_while_cancelling
+    scheduler.keys.release = released.append
+    late = scheduler.submit()
+    wait_for(lambda: released)
+    assert released == [0] and scheduler.stats["interactive"]["cancelled"] == 2
+
+
+def test_forked_processes_start_their_own_dispatcher():
+    scheduler = RequestScheduler(KeyScheduler(1, 0.05))
+    scheduler.acquire()
+    assert scheduler.acquire() is not None  # Queued, so the dispatcher thread is running
+    pid = os.fork()
+    if pid == 0:
+        # As in a background job process: this request has to queue too
+        os._exit(0 if scheduler.acquire() is not None else 1)
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            assert os.waitstatus_to_exitcode(status) == 0
+            return
+        time.sleep(0.01)
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+    raise AssertionError("The forked process never got a key")
+
+
+def test_client_requests_queue_in_the_callers_class(stub_fetcher):
+    fetcher, server = stub_fetcher
+    stats = fetcher.client.requests.stats
+    fetcher.fetch_data("crypto", "BTCUSD", 30, "day")
+    assert stats["interactive"]["granted"] == 1
+    # Chunked fetches carry the class into their pool threads
+    with request_priority("prefetch", session="test"):
+        fetcher.fetch_data("crypto", "ETHUSD", 120, "minute")
+    assert stats["prefetch"]["granted"] == server.state.total_requests() - 1 > 1
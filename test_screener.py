@@ -0,0 +1,113 @@
+"""Checks screener rules against per-ticker indicators and incremental rescans."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from data_fetcher import calculate_technical_indicators
+from screener import COLUMN_INDEX, SCREENER_PRESETS, Screener, parse_rule
+
+
+def make_frame(closes):
+    closes = np.asarray(closes, dtype=float)
+    index = pd.date_range("2024-01-01", periods=len(closes), freq="D", name="datetime")
+    return pd.DataFrame({
+        "open": closes, "high": closes + 1, "low": closes - 1, "close": closes,
+        "volume": np.full(len(closes), 1000.0), "vwap": closes,
+        "transactions": np.full(len(closes), 10)
+    }, index=index)
+
+
+class FakeFetcher:
+    def __init__(self, data):
+        self.data = data
+
+    def fetch_multiple(self, asset_type, tickers, days_back=30, timespan="day"):
+        return {ticker: self.data[ticker] for ticker in tickers if ticker in self.data}
+
+
+def universe(count=60, seed=3):
+    rng = np.random.default_rng(seed)
+    return {f"T{i}": make_frame(100 + np.cumsum(rng.normal(0, 1, 120))) for i in range(count)}
+
+
+@pytest.mark.parametrize("preset", list(SCREENER_PRESETS))
+def test_matches_agree_with_per_ticker_evaluation(preset):
+    data = universe()
+    rule = parse_rule(SCREENER_PRESETS[preset]["rule"])
+    result = Screener(FakeFetcher(data), processes=0).scan("stock", list(data), rule)
+
+    expected = set()
+    for ticker, df in data.items():
+        ind = calculate_technical_indicators(df)
+        (left, op, right) = (rule.conditions[0].left, rule.conditions[0].op, rule.conditions[0].right)
+        a = ind[left]
+        b = ind[right] if isinstance(right, str) else pd.Series(right, index=ind.index)
+        if op == "<":
+            hit = a.iloc[-1] < b.iloc[-1]
+        elif op == ">":
+            hit = a.iloc[-1] > b.iloc[-1]
+        elif op == "crosses_above":
+            hit = a.iloc[-2] <= b.iloc[-2] and a.iloc[-1] > b.iloc[-1]
+        else:
+            hit = a.iloc[-2] >= b.iloc[-2] and a.iloc[-1] < b.iloc[-1]
+        if hit:
+            expected.add(ticker)
+    assert set(result["ticker"]) == expected
+    assert result["score"].is_monotonic_decreasing
+
+
+def test_rescan_recomputes_only_changed_tickers():
+    data = universe(count=10)
+    screener = Screener(FakeFetcher(data), processes=0)
+    rule = parse_rule("RSI < 30 and close > 0")
+    screener.scan("stock", list(data), rule)
+    assert screener.stats["recomputed"] == 10
+
+    df = data["T3"]
+    data["T3"] = pd.concat([df, make_frame([df["close"].iloc[-1] - 5]).set_axis(
+        [df.index[-1] + pd.Timedelta(days=1)])])
+    screener.scan("stock", list(data), rule)
+    assert screener.stats["recomputed"] == 11
+    assert screener.stats["reused"] == 9
+
+
+def test_parse_rule_rejects_unknown_columns():
+    with pytest.raises(ValueError):
+        parse_rule("RSI < 30 and FOO > 1")
+    with pytest.raises(ValueError):
+        parse_rule("RSI <")
+
+
+def test_only_the_rule_columns_are_computed():
+    data = universe(count=5)
+    screener = Screener(FakeFetcher(data), processes=0, max_entries=3)
+    screener.scan("stock", list(data), parse_rule("RSI < 30"))
+    assert len(screener._latest) == 3  # The least recently scanned go first
+    version, columns, rows = screener._latest[("stock", "T4", "day", 120)]
+    assert columns == {"close", "RSI"}
+    assert np.isnan(rows[-1, COLUMN_INDEX["SMA_50"]]) and not np.isnan(rows[-1, COLUMN_INDEX["RSI"]])
+
+    # Another column of the same bars: recomputed once, then reused for both rules
+    screener.scan("stock", ["T4"], parse_rule("close > SMA_50"))
+    screener.scan("stock", ["T4"], parse_rule("RSI < 30"))
+    assert screener.stats["recomputed"] == 6 and screener.stats["reused"] == 1
+    assert screener._latest[("stock", "T4", "day", 120)][1] == {"close", "RSI", "SMA_50"}
+
+
+def test_pool_workers_give_the_same_matches():
+    data = universe(count=12)
+    rule = parse_rule("close > SMA_20 and RSI > 50")
+    pooled = Screener(FakeFetcher(data), processes=2, pool_threshold=4)
+    try:
+        assert pooled._pool is None  # Started by the first batch big enough for it
+        result = pooled.scan("stock", list(data), rule)
+        assert pooled._pool._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        pooled.close()
+    expected = Screener(FakeFetcher(data), processes=0).scan("stock", list(data), rule)
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,89 @@
+"""Replays trades through the stub WebSocket server into bars, listeners and the live view."""
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+pytest.importorskip("websockets")
+
+from data_fetcher import DataFetcher
+from polygon_client import CacheManager
+from polygon_stub import make_trade_messages, start_stub, start_ws_replay
+from streaming import PolygonStream
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def expected_bars(messages, symbol):
+    trades = pd.DataFrame([event for message in messages for event in json.loads(message)
+                           if event["sym"] == symbol])
+    trades.index = pd.to_datetime(trades["t"], unit="ms")
+    bars = trades["p"].resample("1min").ohlc()
+    bars["volume"] = trades["s"].resample("1min").sum().astype(float)
+    return bars.dropna()
+
+
+def test_replayed_trades_become_bars_and_reach_listeners():
+    messages = make_trade_messages(12_000, per_message=200)
+    stop, url = start_ws_replay(messages)
+    stream = PolygonStream("key", "stock", url=url, flush_interval=0.05)
+    touched = {}
+    stream.add_listener(lambda update: [touched.setdefault(symbol, set()).update(starts)
+                                        for symbol, starts in update.items()])
+    stream.subscribe(["AAPL", "MSFT", "NVDA"])
+    stream.start()
+    try:
+        wait_for(lambda: stream.stats["events"] == 12_000)
+        wait_for(lambda: sum(map(len, touched.values())) == 9)  # Three minutes of three symbols
+    finally:
+        stream.stop()
+        stop()
+
+    assert stream.stats["messages"] == len(messages) + 1  # And the subscription ack
+    for symbol in ("AAPL", "MSFT", "NVDA"):
+        bars, expected = stream.bars_frame(symbol), expected_bars(messages, symbol)
+        pd.testing.assert_frame_equal(bars[["open", "high", "low", "close", "volume"]], expected,
+                                      check_names=False, check_freq=False)
+        assert touched[symbol] == {int(start.value // 1_000_000) for start in expected.index}
+
+
+def test_live_view_falls_back_to_rest_while_the_stream_is_silent(tmp_path):
+    server, rest_url = start_stub(bars=50)
+    now_ms = int(time.time() * 1000)
+    stop, ws_url = start_ws_replay(make_trade_messages(300, symbols=("BTC-USD",), channel="XT",
+                                                       start_ms=now_ms - 3_000))
+    fetcher = DataFetcher(["key"], cache=CacheManager(cache_dir=str(tmp_path), snapshot=False))
+    fetcher.client.base_url = rest_url
+    fetcher.client.scheduler.min_interval = 0
+    fetcher.stream_stale_seconds = 0.5
+    stream = PolygonStream("key", "crypto", url=ws_url, flush_interval=0.05)
+    fetcher.attach_stream(stream)
+    stream.subscribe(["BTCUSD"])
+    stream.start()
+    try:
+        wait_for(lambda: stream.has_data("BTCUSD"))
+        streamed = fetcher.fetch_live_bars("crypto", "BTCUSD")
+        last_trade_ms = now_ms - 10
+        assert streamed.index[-1] == pd.Timestamp(last_trade_ms // 60_000 * 60_000, unit="ms")
+        assert fetcher.live_stats["snapshots"] == 0
+        assert server.state.total_requests() == 1  # History only
+
+        # The replay is over and the socket goes quiet: REST snapshots take over
+        time.sleep(0.6)
+        assert fetcher.fetch_live_bars("crypto", "BTCUSD") is not None
+        assert fetcher.live_stats["snapshots"] == 1
+        assert fetcher.live_stats["aggregate_refetches"] == 2
+    finally:
+        stream.stop()
+        stop()
+        server.shutdown()
@@ -0,0 +1,75 @@
+"""Checks volume spreading across bar ranges and that cached session histograms merge to the full-range profile."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from volume_profile import (NS_PER_DAY, VolumeProfileEngine, merge_histograms, rebin,
+                            session_histogram)
+
+
+def test_volume_is_spread_over_each_bar_range():
+    high, low = np.array([10.6, 11.0, 12.1]), np.array([10.1, 11.0, 12.1])
+    close, volume = np.array([10.5, 11.0, 12.1]), np.array([100.0, 40.0, 7.0])
+
+    first, counts = session_histogram(high, low, close, volume, step=0.25)
+    assert first == 40  # 10.1 falls in [10.0, 10.25)
+    by_bin = dict(zip(range(first, first + len(counts)), counts))
+    # 10.1-10.6 over [10, 10.25), [10.25, 10.5) and [10.5, 10.75)
+    assert np.allclose([by_bin[40], by_bin[41], by_bin[42]], [30.0, 50.0, 20.0])
+    # Bars without a range stay whole in their own bin
+    assert by_bin[44] == 40.0 and by_bin[48] == 7.0
+    assert np.isclose(counts.sum(), volume.sum())
+
+    first, counts = session_histogram(high, low, close, volume, step=0.25, spread=False)
+    assert first == 42 and counts[0] == 100.0 and counts.sum() == volume.sum()
+
+
+def session_bars(days=60, per_day=26, seed=11):
+    rng = np.random.default_rng(seed)
+    # One session of per_day 15-minute bars on each of `days` days
+    index = pd.DatetimeIndex([day + pd.Timedelta(minutes=15 * i)
+                              for day in pd.date_range("2024-03-01 14:30", periods=days, freq="D")
+                              for i in range(per_day)])
+    close = 150 + rng.normal(0, 0.4, len(index)).cumsum()
+    spread = rng.uniform(0, 1.5, len(index))
+    return pd.DataFrame({"open": close, "high": close + spread, "low": close - spread[::-1],
+                         "close": close, "volume": rng.integers(100, 5000, len(index)).astype(float)},
+                        index=index)
+
+
+def test_merged_sessions_equal_one_full_range_histogram():
+    df = session_bars()
+    args = [df[column].to_numpy() for column in ("high", "low", "close", "volume")]
+    step = 0.05
+    whole = session_histogram(*args, step=step)
+
+    days = df.index.values.view("i8") // NS_PER_DAY
+    sessions = [session_histogram(*[a[days == day] for a in args], step=step) for day in np.unique(days)]
+    merged = merge_histograms(sessions)
+    assert merged[0] == whole[0]
+    np.testing.assert_allclose(merged[1], whole[1], atol=1e-6)
+
+    engine = VolumeProfileEngine()
+    mids, volumes = engine.profile(df, "TEST", bins=30, step=step)
+    expected_mids, expected_volumes = rebin(*whole, step, 30)
+    np.testing.assert_allclose(mids, expected_mids)
+    np.testing.assert_allclose(volumes, expected_volumes, rtol=1e-9)
+
+
+def test_rerender_only_bins_the_changed_session():
+    df = session_bars()
+    engine = VolumeProfileEngine()
+    engine.profile(df.iloc[:-1], "TEST", step=0.05)
+    assert engine.stats == {"hits": 0, "binned": 60}
+
+    # A new bar in the last session: the other 59 come from the cache
+    engine.profile(df, "TEST", step=0.05)
+    assert engine.stats == {"hits": 59, "binned": 61}
+    # A different ticker or grid never shares sessions
+    engine.profile(df, "OTHER", step=0.05)
+    engine.profile(df, "TEST", step=0.1)
+    assert engine.stats["binned"] == 181